@@ -1,42 +1,116 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, Optional, Union
+import asyncio
+import json
+import math
 import uuid
+import orjson
 import logging
 from datetime import datetime
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.core.concurrency import run_stage
+from app.core.metrics import register_collector
 from app.services.stock_service import StockService
-from app.db.database import get_db
+from app.services.llm_scheduler import LLMBusyError, llm_scheduler
+from app.services.prewarm import prewarmer
+from app.services.live_quotes import LiveConnection, live_hub
+from app.services.screener import screener
+from app.services.response_encoding import ARROW, MSGPACK, encode_response
+from app.db.database import get_db, SessionLocal
 from app.repositories.analysis_repository import AnalysisRepository
-from app.api.models import StockAnalysisRequest, StockAnalysisResponse
+from app.repositories.analysis_writer import analysis_writer
+from app.services.share_responses import (
+    PreparedResponse, ShareResponseCache, SHARE_CACHE_CONTROL, choose_encoding, etag_matches
+)
+from app.api.models import (
+    StockAnalysisRequest, StockAnalysisResponse, FundamentalsWarmRequest,
+    StockComparisonRequest, StockComparisonResponse, StockScreenRequest, StockScreenResponse
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+_share_cache = ShareResponseCache(settings.SHARE_CACHE_MAX_ENTRIES)
+
+async def _store_analysis(
+    db: Session,
+    analysis_id: str,
+    price_data: Union[list, dict],
+    stats: Dict[str, Any],
+    analysis: Dict[str, Any]
+):
+    # Price data is stored columnar and deduplicated in either shape
+    record = dict(
+        analysis_id=analysis_id,
+        stock_data=price_data,
+        technical_metrics=stats['technical'],
+        fundamental_metrics=stats['fundamental'],
+        analysis_text=analysis,
+        timestamp=datetime.now()
+    )
+    if settings.DB_WRITE_BEHIND:
+        committed = analysis_writer.submit(record)
+        if committed is not None:
+            # The share ID is only returned once it can be read back
+            await asyncio.wrap_future(committed)
+            return
+    repository = AnalysisRepository(db)
+    await run_stage('db', repository.create_analysis, **record)
+
+def _llm_busy(error: LLMBusyError) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=str(error),
+        headers={"Retry-After": str(math.ceil(error.retry_after))}
+    )
+
+def _ndjson(event: str, data: Any) -> str:
+    # Stats hold numpy scalars
+    return orjson.dumps(
+        {"event": event, "data": data}, default=jsonable_encoder, option=orjson.OPT_SERIALIZE_NUMPY
+    ).decode() + "\n"
+
 @router.get("")
 async def get_stock_endpoint():
     try:
-        price_data, stats = StockService.get_stock_data()
-        analysis = StockService.generate_analysis_text(stats)
+        price_data, stats, analysis = await StockService.analyze_async()
         return {
             "stockData": price_data,
             "analysisText": analysis,
             "timestamp": datetime.now().isoformat()
         }
+    except LLMBusyError as e:
+        raise _llm_busy(e)
     except Exception as e:
         logger.exception("Error in get_stock_endpoint")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("", response_model=StockAnalysisResponse)
-async def analyze_stock(request: StockAnalysisRequest, db: Session = Depends(get_db)):
+@router.post(
+    "",
+    response_model=StockAnalysisResponse,
+    responses={200: {"content": {MSGPACK: {}, ARROW: {}}}}
+)
+async def analyze_stock(request: StockAnalysisRequest, http_request: Request, db: Session = Depends(get_db)):
+    """Analysis of the stock in the message, with its price data and share ID.
+
+    The body is JSON, MessagePack or an Arrow IPC stream (stockData as the
+    table, always columnar; the other fields as JSON schema metadata) by
+    the Accept header, compressed by Accept-Encoding when large.
+    """
     try:
         logger.info(f"Analyzing stock with message: {request.message}")
         
-        # Pass the user's message to get_stock_data
-        price_data, stats = StockService.get_stock_data(request.message)
+        # Identical concurrent requests share one computation
+        price_data, stats, analysis = await StockService.analyze_async(
+            request.message,
+            columnar=request.columnar,
+            max_points=request.max_points
+        )
         logger.debug(f"Got stock data: {stats}")
-        
-        analysis = StockService.generate_analysis_text(stats)
         logger.debug(f"Generated analysis: {analysis}")
         
         # Generate a unique ID for this analysis
@@ -44,40 +118,251 @@ async def analyze_stock(request: StockAnalysisRequest, db: Session = Depends(get
         
         # Store the analysis in database
         try:
-            repository = AnalysisRepository(db)
-            repository.create_analysis(
-                analysis_id=analysis_id,
-                stock_data=price_data,
-                technical_metrics=stats['technical'],
-                fundamental_metrics=stats['fundamental'],
-                analysis_text=analysis
-            )
+            await _store_analysis(db, analysis_id, price_data, stats, analysis)
         except Exception as db_error:
             logger.exception("Database error while storing analysis")
             raise HTTPException(status_code=500, detail=f"Database error: {str(db_error)}")
         
-        return StockAnalysisResponse(
-            stockData=price_data,
-            analysisText=analysis,
-            shareId=analysis_id
+        # Encoded directly rather than validated through the response model
+        encoded = await run_stage(
+            'encode',
+            encode_response,
+            {"stockData": price_data, "analysisText": analysis, "shareId": analysis_id},
+            http_request.headers.get("accept"),
+            http_request.headers.get("accept-encoding"),
+            settings.RESPONSE_COMPRESSION_MIN_BYTES
         )
+        headers = {"Vary": "Accept, Accept-Encoding"}
+        if encoded.encoding is not None:
+            headers["Content-Encoding"] = encoded.encoding
+        return Response(content=encoded.content, media_type=encoded.media_type, headers=headers)
+    except LLMBusyError as e:
+        raise _llm_busy(e)
     except Exception as e:
         logger.exception("Error in analyze_stock")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/stream")
+async def analyze_stock_stream(request: StockAnalysisRequest):
+    """Streaming analyze_stock, as NDJSON lines of {"event": ..., "data": ...}.
+
+    Parts are sent as soon as they are ready: "symbol", "stockData",
+    "stats", "analysis" (fundamental factors first, then the LLM fields)
+    and finally "shareId". A failure ends the stream with an "error" line.
+    """
+    async def events():
+        parts: Dict[str, Any] = {"analysis": {}}
+        try:
+            logger.info(f"Streaming analysis for message: {request.message}")
+            async for event, data in StockService.analyze_stream(
+                request.message, columnar=request.columnar, max_points=request.max_points
+            ):
+                if event == "analysis":
+                    parts["analysis"].update(data)
+                else:
+                    parts[event] = data
+                yield _ndjson(event, data)
+
+            analysis_id = str(uuid.uuid4())
+            # The request's dependencies are closed once streaming starts
+            db = SessionLocal()
+            try:
+                await _store_analysis(
+                    db, analysis_id, parts["stockData"], parts["stats"], parts["analysis"]
+                )
+            finally:
+                db.close()
+            yield _ndjson("shareId", analysis_id)
+        except LLMBusyError as e:
+            yield _ndjson("error", {"detail": str(e), "status": 429, "retryAfter": math.ceil(e.retry_after)})
+        except Exception as e:
+            logger.exception("Error in analyze_stock_stream")
+            yield _ndjson("error", {"detail": str(e)})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@router.post("/compare", response_model=StockComparisonResponse)
+async def compare_stocks(request: StockComparisonRequest):
+    """Compare several symbols over one period with a single LLM analysis."""
+    try:
+        logger.info(f"Comparing stocks with message: {request.message}")
+        stocks, comparison, analysis = await StockService.compare_async(request.message, request.symbols)
+        return StockComparisonResponse(
+            stocks=stocks,
+            comparison=comparison,
+            analysisText=analysis
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LLMBusyError as e:
+        raise _llm_busy(e)
+    except Exception as e:
+        logger.exception("Error in compare_stocks")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/screen", response_model=StockScreenResponse)
+async def screen_stocks(request: StockScreenRequest):
+    """Symbols whose latest indicators pass every filter, from locally stored bars.
+
+    Filters compare a field with a number or another field, e.g.
+    {"field": "rsi", "op": "<", "value": 30} or
+    {"field": "ma50", "op": "crosses_above", "value": "ma200"}. Fields are
+    listed in panel_indicators.PANEL_FIELDS; bb_position is the close's
+    place in the Bollinger Bands in percent.
+    """
+    try:
+        return await run_stage(
+            'screen',
+            screener.screen,
+            request.interval,
+            [condition.model_dump() for condition in request.filters],
+            symbols=request.symbols,
+            sectors=request.sectors,
+            sort_by=request.sort_by,
+            descending=request.descending,
+            limit=request.limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error in screen_stocks")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _service_stats() -> Dict[str, Any]:
+    return {
+        "extraction": StockService.extraction_stats(),
+        **StockService.cache_stats(),
+        "share_cache": _share_cache.stats(),
+        "analysis_writer": analysis_writer.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "prewarm": prewarmer.stats(),
+        "live": live_hub.stats(),
+        "screener": screener.stats()
+    }
+
+# Also exported as gauges on /metrics
+register_collector('service', _service_stats)
+
+@router.get("/stats")
+async def get_stats():
+    """Runtime counters, e.g. how many queries skipped the LLM extractor."""
+    return _service_stats()
+
+@router.post("/fundamentals/warm")
+async def warm_fundamentals(request: FundamentalsWarmRequest):
+    """Refresh cached fundamentals for a list of symbols in a worker pool."""
+    results = await run_stage('fundamentals', StockService.warm_fundamentals, request.symbols)
+    return {
+        "refreshed": [symbol for symbol, ok in results.items() if ok],
+        "failed": [symbol for symbol, ok in results.items() if not ok]
+    }
+
+@router.post("/prewarm")
+async def run_prewarm():
+    """Warm the most requested symbols now instead of waiting for the next scheduled run."""
+    return await prewarmer.run()
+
+def _live_command(connection: LiveConnection, message: Any) -> Dict[str, Any]:
+    """Apply a subscribe/unsubscribe message and return the reply."""
+    if not isinstance(message, dict) or message.get("action") not in ("subscribe", "unsubscribe"):
+        return {"type": "error", "detail": "Expected {\"action\": \"subscribe\" | \"unsubscribe\", \"symbols\": [...]}"}
+    symbols = message.get("symbols") or []
+    try:
+        period = live_hub.check_period(message.get("period", "1y"))
+        keys = [live_hub.channel_key(symbol, message.get("interval", "1d")) for symbol in symbols]
+        for key in keys:
+            if message["action"] == "subscribe":
+                live_hub.subscribe(connection, key, period)
+            else:
+                live_hub.unsubscribe(connection, key)
+    except (ValueError, AttributeError) as e:
+        return {"type": "error", "detail": str(e)}
+    return {"type": f"{message['action']}d", "symbols": [key[0] for key in keys]}
+
+async def _send_live(websocket: WebSocket, connection: LiveConnection):
+    # The only writer to the socket, so a slow client stalls nobody else
+    while True:
+        message = await connection.next_message()
+        if message is None:
+            break
+        try:
+            await asyncio.wait_for(websocket.send_text(message), settings.LIVE_SEND_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            connection.close("slow consumer")
+            break
+    # 1013: try again later
+    await websocket.close(code=1013, reason=connection.close_reason)
+
+@router.websocket("/live")
+async def live_quotes(websocket: WebSocket):
+    """Live bar and indicator updates for subscribed symbols.
+
+    Clients send {"action": "subscribe" | "unsubscribe", "symbols": [...],
+    "period": "1y", "interval": "1d"}. The server sends the latest bar of
+    each new subscription, then {"type": "bars", ...} messages with only
+    new or revised bars (fields as in stockData) after each poll.
+    Clients that fall behind are disconnected with code 1013.
+    """
+    connection = live_hub.connect()
+    if connection is None:
+        await websocket.close(code=1013, reason="Too many live connections")
+        return
+    await websocket.accept()
+    sender = asyncio.create_task(_send_live(websocket, connection))
+    try:
+        while not sender.done():
+            try:
+                message = await websocket.receive_json()
+            except (ValueError, KeyError):
+                connection.offer(json.dumps({"type": "error", "detail": "Invalid JSON"}))
+                continue
+            connection.offer(json.dumps(_live_command(connection, message)))
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the sender already closed the socket
+        pass
+    finally:
+        live_hub.disconnect(connection)
+        sender.cancel()
+
+def _load_share_response(analysis_id: str) -> Optional[PreparedResponse]:
+    db = SessionLocal()
+    try:
+        return AnalysisRepository(db).get_share_response(analysis_id)
+    finally:
+        db.close()
+
 @router.get("/share/{analysis_id}")
-async def get_shared_analysis(analysis_id: str, db: Session = Depends(get_db)):
+async def get_shared_analysis(analysis_id: str, request: Request):
+    """Shared analysis, served from bytes serialized and compressed once per process.
+
+    The body is built from the stored series on the first read and kept in
+    an in-process LRU, so hot share IDs skip the database and compression.
+    Shares are immutable, so responses carry a strong ETag (suffixed with
+    the content coding, which changes the bytes) and an immutable
+    Cache-Control, and a matching If-None-Match gets a 304.
+    """
     try:
-        repository = AnalysisRepository(db)
-        analysis = repository.get_analysis(analysis_id)
-        if not analysis:
-            raise HTTPException(status_code=404, detail="Analysis not found")
-        
-        return {
-            "stockData": analysis.stock_data,
-            "analysisText": analysis.analysis_text,
-            "timestamp": analysis.timestamp.isoformat()
+        prepared = _share_cache.get(analysis_id)
+        if prepared is None:
+            prepared = await run_stage('db', _load_share_response, analysis_id)
+            if prepared is None:
+                raise HTTPException(status_code=404, detail="Analysis not found")
+            _share_cache.put(analysis_id, prepared)
+
+        encoding = choose_encoding(request.headers.get("accept-encoding"), prepared)
+        headers = {
+            "ETag": prepared.etag_for(encoding),
+            "Cache-Control": SHARE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
         }
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(content=prepared.body(encoding), media_type="application/json", headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error in get_shared_analysis")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
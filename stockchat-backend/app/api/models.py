@@ -1,9 +1,45 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Literal, Optional, Union
 
 class StockAnalysisRequest(BaseModel):
     message: str
+    columnar: bool = False  # Return stockData as one array per field
+    max_points: Optional[int] = Field(default=None, ge=3)  # Downsample stockData for charting
 
 class StockAnalysisResponse(BaseModel):
-    stockData: list
+    stockData: Union[list, dict]
     analysisText: dict
-    shareId: str 
\ No newline at end of file
+    shareId: str 
+
+class FundamentalsWarmRequest(BaseModel):
+    symbols: list[str]
+
+class StockComparisonRequest(BaseModel):
+    message: str
+    symbols: Optional[list[str]] = None  # Overrides the symbols found in message
+
+class StockComparisonResponse(BaseModel):
+    stocks: dict
+    comparison: dict
+    analysisText: dict
+
+class ScreenFilter(BaseModel):
+    field: str
+    op: Literal['<', '<=', '>', '>=', '==', '!=', 'crosses_above', 'crosses_below']
+    value: Union[float, str]  # A number or another field
+
+class StockScreenRequest(BaseModel):
+    filters: list[ScreenFilter] = []
+    interval: str = '1d'
+    symbols: Optional[list[str]] = None  # Screen only these symbols
+    sectors: Optional[list[str]] = None  # Sectors from the universe file
+    sort_by: Optional[str] = None
+    descending: bool = True
+    limit: int = Field(default=50, ge=1)
+
+class StockScreenResponse(BaseModel):
+    interval: str
+    as_of: Optional[str]
+    universe: int
+    matched: int
+    results: list
@@ -0,0 +1,24 @@
+"""Compile the DSPy programs offline and save them as versioned artifacts.
+
+Usage (from stockchat-backend):
+    python -m app.compile_dspy
+
+Runs BootstrapFewShot with the LLM-based metrics for the extractor and the
+analyzer and writes the results to DSPY_ARTIFACT_DIR, where DspyService
+loads them at startup.
+"""
+import logging
+import sys
+
+from app.services.dspy_service import DspyService
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    service = DspyService(compile_missing=False)
+    for path in service.compile():
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import anyio
+import anyio.to_thread
+
+from app.core.config import settings
+from app.core.metrics import observe_stage
+
+_limiters: Dict[str, anyio.CapacityLimiter] = {}
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def stage_limiter(stage: str) -> anyio.CapacityLimiter:
+    """Return the capacity limiter for a pipeline stage.
+
+    Limits come from settings.STAGE_CONCURRENCY; unknown stages share the
+    'default' entry. Limiters are created lazily inside the event loop.
+    """
+    if stage not in _limiters:
+        limits = settings.STAGE_CONCURRENCY
+        _limiters[stage] = anyio.CapacityLimiter(limits.get(stage, limits.get('default', 8)))
+    return _limiters[stage]
+
+
+async def run_stage(stage: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking pipeline stage in a worker thread without blocking the event loop.
+
+    The recorded stage time includes waiting for the stage's limiter.
+    """
+    start = time.perf_counter()
+    try:
+        return await anyio.to_thread.run_sync(
+            functools.partial(func, *args, **kwargs),
+            limiter=stage_limiter(stage)
+        )
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def process_pool() -> Optional[ProcessPoolExecutor]:
+    """Shared process pool for CPU-bound work, or None on a single core.
+
+    Sized by settings.PROCESS_POOL_WORKERS (0 means one per core). Workers
+    are spawned rather than forked, since the server process runs threads.
+    """
+    global _process_pool
+    workers = settings.PROCESS_POOL_WORKERS or os.cpu_count() or 1
+    if workers <= 1:
+        return None
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _process_pool
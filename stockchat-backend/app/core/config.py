@@ -5,4 +5,143 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "StockSage AI"
     BACKEND_CORS_ORIGINS: list[str] = ["http://localhost:5173"]
 
-settings = Settings() 
\ No newline at end of file
+    # Local OHLCV bar store. A series is re-checked upstream at most every
+    # BAR_STORE_MIN_REFRESH_SECONDS; requests in between get the stored bars
+    BAR_STORE_DIR: str = "./data/bars"
+    BAR_STORE_MIN_REFRESH_SECONDS: float = 5
+
+    # Fetch only the requested window plus the indicator warm-up bars.
+    # EMA-based indicators (MACD, RSI, ATR) match the full-history values
+    # up to this fraction of their seed error.
+    BOUNDED_HISTORY_FETCH: bool = True
+    INDICATOR_WARMUP_TOLERANCE: float = 1e-6
+
+    # Queries resolved locally below this confidence go to the LLM extractor
+    QUERY_RESOLVER_MIN_CONFIDENCE: float = 0.8
+
+    # Compiled DSPy programs (built by `python -m app.compile_dspy`)
+    DSPY_ARTIFACT_DIR: str = "./artifacts/dspy"
+    # Compile at startup when no artifact exists instead of running uncompiled
+    # (every worker compiles; prefer building artifacts with compile_dspy)
+    DSPY_COMPILE_ON_STARTUP: bool = False
+
+    # Generated analyses, keyed on quantized stats
+    ANALYSIS_CACHE_TTL_SECONDS: float = 900
+    ANALYSIS_CACHE_MAX_ENTRIES: int = 1024
+    # Serve expired entries this long while regenerating them (0 disables)
+    ANALYSIS_CACHE_STALE_SECONDS: float = 3600
+
+    # Fundamentals from ticker.info change at most daily
+    FUNDAMENTALS_CACHE_TTL_SECONDS: float = 6 * 3600
+    FUNDAMENTALS_CACHE_MAX_ENTRIES: int = 5000
+    FUNDAMENTALS_WARM_WORKERS: int = 8
+
+    # Pre-serialized share responses kept in memory for hot share IDs
+    SHARE_CACHE_MAX_ENTRIES: int = 512
+
+    # Analysis responses at least this large are brotli/gzip compressed
+    # when the client accepts it
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
+
+    # SQLite connection pool and pragmas
+    DB_POOL_SIZE: int = 8
+    DB_MAX_OVERFLOW: int = 8
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    SQLITE_MMAP_SIZE_BYTES: int = 256 * 1024 * 1024
+
+    # Analyses are inserted by a background writer in batched transactions.
+    # A request returns its share ID once its batch has committed; when the
+    # queued analyses' estimated size exceeds DB_WRITE_QUEUE_MAX_BYTES, the
+    # request writes its own instead.
+    DB_WRITE_BEHIND: bool = True
+    DB_WRITE_BATCH_SIZE: int = 64
+    DB_WRITE_QUEUE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # LLM admission control: per-provider token buckets (requests/minute,
+    # keyed by provider: "openai", "deepseek", "github", "gemini", or the
+    # model prefix of an LM configured directly), then per-lane limits.
+    # Callers that would exceed them get a 429 with Retry-After instead of
+    # waiting.
+    LLM_REQUESTS_PER_MINUTE: dict[str, float] = {"default": 15}
+    LLM_BURST: int = 3
+    LLM_MAX_QUEUE_DEPTH: dict[str, int] = {"interactive": 32, "background": 8}
+    LLM_MAX_WAIT_SECONDS: dict[str, float] = {"interactive": 20, "background": 300}
+
+    # Spread LLM calls over every provider with an API key. Members are
+    # picked by weight ("weight") or weight over observed latency
+    # ("latency"). A call running past the member's LLM_HEDGE_PERCENTILE
+    # latency (LLM_HEDGE_DELAY_SECONDS until measured) is duplicated to
+    # another member and the first answer wins; errors fail over.
+    LLM_POOL_ENABLED: bool = True
+    LLM_POOL_STRATEGY: str = "latency"
+    LLM_POOL_WEIGHTS: dict[str, float] = {}
+    LLM_HEDGE_PERCENTILE: float = 95
+    LLM_HEDGE_DELAY_SECONDS: float = 8
+    LLM_POOL_COOLDOWN_SECONDS: float = 30
+
+    # Computed price data and stats are reused for this long, or for
+    # intraday intervals PREPARED_DATA_INTRADAY_TTL_SECONDS (at most one
+    # bar), and never past an update of the stored bars
+    PREPARED_DATA_TTL_SECONDS: float = 300
+    PREPARED_DATA_INTRADAY_TTL_SECONDS: float = 15
+    PREPARED_DATA_MAX_ENTRIES: int = 512
+
+    # Background pre-warming of the most requested (symbol, period, interval)
+    # keys: every PREWARM_INTERVAL_MINUTES, and with a fundamentals refresh
+    # at PREWARM_MARKET_OPEN_CRON (crontab, US/Eastern). Analyses are only
+    # generated with PREWARM_ANALYSIS, using at most PREWARM_LLM_BUDGET LLM
+    # calls per run in the background lane.
+    PREWARM_ENABLED: bool = True
+    PREWARM_TOP_K: int = 20
+    PREWARM_INTERVAL_MINUTES: float = 4
+    PREWARM_MARKET_OPEN_CRON: str = "0 9 * * mon-fri"
+    PREWARM_CONCURRENCY: int = 4
+    PREWARM_ANALYSIS: bool = False
+    PREWARM_LLM_BUDGET: int = 10
+    # Request counts halve over this many hours
+    PREWARM_HALF_LIFE_HOURS: float = 24
+    PREWARM_MAX_TRACKED: int = 10000
+
+    # Live quotes over WebSocket: one upstream poll per (symbol, interval)
+    # every LIVE_POLL_SECONDS, shared by all its subscribers whatever their
+    # period.
+    # A connection buffers at most LIVE_SEND_QUEUE_SIZE messages; one that
+    # falls further behind, or takes longer than LIVE_SEND_TIMEOUT_SECONDS
+    # to accept a message, is disconnected.
+    LIVE_POLL_SECONDS: float = 15
+    LIVE_SEND_QUEUE_SIZE: int = 64
+    LIVE_SEND_TIMEOUT_SECONDS: float = 10
+    LIVE_MAX_CONNECTIONS: int = 5000
+    LIVE_MAX_SYMBOLS_PER_CONNECTION: int = 20
+    LIVE_MAX_DELTA_BARS: int = 50
+
+    # Screener over every symbol with stored bars, or only those listed in
+    # SCREENER_UNIVERSE_FILE (CSV with a symbol and an optional sector
+    # column) when it exists. Changed bar files are re-read at most every
+    # SCREENER_REFRESH_SECONDS, in chunks of SCREENER_CHUNK_SIZE symbols
+    # on the process pool. Symbols whose last bar is more than
+    # SCREENER_MAX_STALE_DAYS older than the newest one are left out.
+    SCREENER_UNIVERSE_FILE: str = "./data/universe.csv"
+    SCREENER_REFRESH_SECONDS: float = 30
+    SCREENER_CHUNK_SIZE: int = 500
+    SCREENER_MAX_STALE_DAYS: float = 5
+    SCREENER_MAX_RESULTS: int = 500
+
+    # Multi-symbol comparisons
+    COMPARE_MAX_SYMBOLS: int = 10
+    # Processes for CPU-bound indicator rebuilds (0 = one per core)
+    PROCESS_POOL_WORKERS: int = 0
+
+    # Max concurrent worker threads per request pipeline stage
+    STAGE_CONCURRENCY: dict[str, int] = {
+        "extract": 8,
+        "history": 16,
+        "fundamentals": 16,
+        "indicators": 4,
+        "analysis": 8,
+        "db": 4,
+        "default": 8,
+    }
+
+settings = Settings()
\ No newline at end of file
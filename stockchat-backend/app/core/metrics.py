@@ -0,0 +1,226 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Latency buckets in seconds, from cache hits to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry: List[Any] = []
+_collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with labels."""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labels: str):
+        # Per series: one count per bucket, then +Inf count, then sum
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                bucket_labels = _format_labels(self.label_names, labels, 'le="%g"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative:g}")
+            plain_labels = _format_labels(self.label_names, labels)
+            inf_labels = _format_labels(self.label_names, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf_labels} {series[-2]:g}")
+            lines.append(f"{self.name}_count{plain_labels} {series[-2]:g}")
+            lines.append(f"{self.name}_sum{plain_labels} {series[-1]:.6f}")
+        return lines
+
+
+class Counter:
+    """Prometheus-style monotonically increasing counter with labels."""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    'stockchat_stage_duration_seconds',
+    'Time spent in a pipeline stage, including waiting for its concurrency limit.',
+    ('stage',)
+)
+REQUEST_SECONDS = Histogram(
+    'stockchat_http_request_duration_seconds',
+    'HTTP request latency until the response body is complete.',
+    ('method', 'route', 'status')
+)
+LLM_REQUESTS = Counter('stockchat_llm_requests_total', 'LLM completions (cache hits excluded).', ('model',))
+LLM_TOKENS = Counter('stockchat_llm_tokens_total', 'LLM tokens used by completions.', ('model', 'type'))
+LLM_QUEUE_WAIT = Histogram(
+    'stockchat_llm_queue_wait_seconds',
+    'Time LLM calls waited for their provider budget.',
+    ('provider', 'lane')
+)
+LLM_REJECTED = Counter(
+    'stockchat_llm_rejected_total',
+    'LLM calls rejected because the provider queue was full or too slow.',
+    ('provider', 'lane')
+)
+
+# Stage durations of the current request, for its Server-Timing header
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar('request_timings', default=None)
+_timings_lock = threading.Lock()
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record a stage duration in the histogram and the current request's timings."""
+    STAGE_SECONDS.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        # Stages of one request can run in several worker threads
+        with _timings_lock:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time the enclosed block as a pipeline stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def record_llm_usage(model: str, prompt_tokens: int, completion_tokens: int):
+    LLM_REQUESTS.inc(1, model)
+    LLM_TOKENS.inc(prompt_tokens, model, 'prompt')
+    LLM_TOKENS.inc(completion_tokens, model, 'completion')
+
+
+def register_collector(prefix: str, collect: Callable[[], Dict[str, Any]]):
+    """Export the numeric values of collect() as gauges named stockchat_<prefix>_<key>.
+
+    Nested dicts are flattened with underscores; non-numeric values are skipped.
+    """
+    _collectors[prefix] = collect
+
+
+def _flatten(prefix: str, values: Dict[str, Any]) -> Iterator[Tuple[str, float]]:
+    for key, value in values.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for prefix, collect in list(_collectors.items()):
+        try:
+            values = collect()
+        except Exception:
+            # A failing collector must not break the scrape
+            continue
+        for name, value in _flatten(f"stockchat_{prefix}", values):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value:g}")
+    return '\n'.join(lines) + '\n'
+
+
+def server_timing(timings: Dict[str, float], total: float) -> str:
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(entries)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing requests and adding a Server-Timing header.
+
+    The header lists the stages that finished before the response started,
+    so streamed responses only show the stages before their first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                with _timings_lock:
+                    header = server_timing(timings, time.perf_counter() - start)
+                message.setdefault('headers', [])
+                message['headers'] = list(message['headers']) + [(b'server-timing', header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            # Label by route template so share IDs do not create new series
+            route = scope.get('route')
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                scope['method'],
+                getattr(route, 'path', 'unmatched'),
+                str(status)
+            )
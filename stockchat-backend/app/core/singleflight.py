@@ -0,0 +1,61 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from app.core.metrics import observe_stage
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls into one in-flight computation.
+
+    The first caller for a key starts the computation as a task; callers
+    arriving while it runs await the same task instead of starting their own.
+    The task is shielded, so a disconnecting caller does not cancel the work
+    for the others. The task's stages are timed in the first caller's
+    request; callers that join it record their wait as a 'coalesced' stage.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Return func()'s result, sharing it with concurrent calls for the same key."""
+        task = self._inflight.get(key)
+        joined = task is not None
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if joined:
+                observe_stage('coalesced', time.perf_counter() - start)
+            self._waiters[key] -= 1
+            if self._waiters[key] == 0:
+                del self._waiters[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Executions started, requests that joined one, and current load."""
+        return {
+            'executions': self.executions,
+            'coalesced_waiters': self.coalesced,
+            'in_flight': len(self._inflight),
+            'current_waiters': sum(self._waiters.values()),
+        }
@@ -0,0 +1,81 @@
+import logging
+import os
+from typing import Any, Dict
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app.db.database import SessionLocal
+from app.db.models import Analysis
+from app.repositories.analysis_repository import AnalysisRepository
+from app.services.serialization import rows_to_columns
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_schema(engine: Engine) -> None:
+    """Add columns that create_all does not add to existing tables."""
+    columns = {column['name'] for column in inspect(engine).get_columns('analyses')}
+    if 'series_id' not in columns:
+        logger.info("Adding analyses.series_id")
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE analyses ADD COLUMN series_id VARCHAR REFERENCES price_series (id)"))
+            connection.execute(text("CREATE INDEX IF NOT EXISTS ix_analyses_series_id ON analyses (series_id)"))
+
+
+def _database_size(engine: Engine) -> int:
+    path = engine.url.database
+    return os.path.getsize(path) if path and os.path.exists(path) else 0
+
+
+def migrate_inline_stock_data(engine: Engine, batch_size: int = 200, vacuum: bool = True) -> Dict[str, Any]:
+    """Move inline analyses.stock_data into deduplicated price_series blobs.
+
+    Rows are converted in batches; each analysis then references its series
+    and its inline column is cleared. VACUUM returns the freed pages to the
+    filesystem. Returns counts and the database size before and after.
+    """
+    ensure_schema(engine)
+    size_before = _database_size(engine)
+    migrated = 0
+    series_ids = set()
+
+    db = SessionLocal(bind=engine)
+    try:
+        repository = AnalysisRepository(db)
+        while True:
+            batch = (
+                db.query(Analysis)
+                .filter(Analysis.series_id.is_(None), Analysis.stock_data.isnot(None))
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            for analysis in batch:
+                technical = analysis.technical_metrics or {}
+                analysis.series_id = repository.get_or_create_series(
+                    rows_to_columns(analysis.stock_data),
+                    symbol=technical.get('ticker'),
+                    interval=technical.get('interval')
+                )
+                analysis.stock_data = None
+                series_ids.add(analysis.series_id)
+            db.commit()
+            migrated += len(batch)
+            logger.info(f"Migrated {migrated} analyses")
+    finally:
+        db.close()
+
+    if vacuum:
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+
+    size_after = _database_size(engine)
+    return {
+        'analyses_migrated': migrated,
+        'series_referenced': len(series_ids),
+        'bytes_before': size_before,
+        'bytes_after': size_after,
+        'savings_pct': round((1 - size_after / size_before) * 100, 1) if size_before else 0.0,
+    }
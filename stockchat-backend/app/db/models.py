@@ -1,13 +1,29 @@
-from sqlalchemy import Column, String, JSON, DateTime
+from sqlalchemy import Column, String, JSON, DateTime, Integer, LargeBinary, ForeignKey
 from datetime import datetime
 from .database import Base
 
+class PriceSeries(Base):
+    """Compressed columnar price data, shared by every analysis of the same series."""
+    __tablename__ = "price_series"
+
+    # Hash of (symbol, interval, content); the content covers the date range
+    id = Column(String, primary_key=True)
+    symbol = Column(String, index=True)
+    interval = Column(String)
+    start_date = Column(String)
+    end_date = Column(String)
+    points = Column(Integer)
+    data = Column(LargeBinary)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Analysis(Base):
     __tablename__ = "analyses"
 
     id = Column(String, primary_key=True)
+    # Inline rows from before price series were deduplicated; new rows use series_id
     stock_data = Column(JSON)
+    series_id = Column(String, ForeignKey("price_series.id"), index=True)
     technical_metrics = Column(JSON)
     fundamental_metrics = Column(JSON)
     analysis_text = Column(JSON)
-    timestamp = Column(DateTime, default=datetime.utcnow) 
\ No newline at end of file
+    timestamp = Column(DateTime, default=datetime.utcnow)
@@ -1,13 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.core.config import settings
+from app.core import metrics
 from app.api.endpoints import stock
+from app.services.stock_service import StockService
 from app.db.database import engine
 from app.db import models
+from app.db.migrations import ensure_schema
+from app.repositories.analysis_writer import analysis_writer
+from app.services.prewarm import prewarmer
+from app.services.live_quotes import live_hub
 import logging
 import sys
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
+ensure_schema(engine)
 
 app = FastAPI(title=settings.PROJECT_NAME)
 
@@ -18,7 +26,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# Per-stage timings as a Server-Timing header on every response
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.on_event("startup")
+def load_dspy_programs():
+    # Load compiled DSPy programs at server start rather than at import time
+    StockService.get_dspy_service()
+
+@app.on_event("startup")
+async def start_prewarmer():
+    # Scheduled on the server's event loop, next to the requests it warms for
+    if settings.PREWARM_ENABLED:
+        prewarmer.start(settings.PREWARM_INTERVAL_MINUTES, settings.PREWARM_MARKET_OPEN_CRON)
+
+@app.on_event("shutdown")
+def stop_prewarmer():
+    prewarmer.shutdown()
+
+@app.on_event("shutdown")
+async def stop_live_quotes():
+    await live_hub.shutdown()
+
+@app.on_event("shutdown")
+def flush_analysis_writer():
+    # Commit analyses still queued by the write-behind writer
+    analysis_writer.close()
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Stage latency histograms, LLM token counts and service counters for Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 # Include routers
 app.include_router(stock.router, prefix=f"{settings.API_V1_STR}/stock", tags=["stock"])
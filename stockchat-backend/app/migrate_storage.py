@@ -0,0 +1,34 @@
+"""Move inline analysis price data into deduplicated, compressed series.
+
+Usage (from stockchat-backend):
+    python -m app.migrate_storage [--no-vacuum]
+
+Converts every analyses row that still stores stock_data inline to a
+reference into price_series, then VACUUMs the database and prints the
+storage savings. Safe to re-run; migrated rows are skipped.
+"""
+import argparse
+import logging
+import sys
+
+from app.db import models
+from app.db.database import engine
+from app.db.migrations import migrate_inline_stock_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--no-vacuum', action='store_true', help="skip VACUUM after migrating")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    models.Base.metadata.create_all(bind=engine)
+    report = migrate_inline_stock_data(engine, batch_size=args.batch_size, vacuum=not args.no_vacuum)
+    print(f"Analyses migrated: {report['analyses_migrated']}")
+    print(f"Series referenced: {report['series_referenced']}")
+    print(f"Database size:     {report['bytes_before']:,} -> {report['bytes_after']:,} bytes ({report['savings_pct']}% saved)")
+
+
+if __name__ == "__main__":
+    main()
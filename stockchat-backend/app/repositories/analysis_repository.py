@@ -1,32 +1,134 @@
+import hashlib
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
-from app.db.models import Analysis
-from typing import Optional, Dict, Any
+from app.core.metrics import timed
+from app.db.models import Analysis, PriceSeries
+from app.services.serialization import pack_columns, unpack_columns, columns_to_rows
+from app.services.share_responses import PreparedResponse, prepare_response
+from typing import Optional, Dict, Any, List, Union
 from datetime import datetime
 
 class AnalysisRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def create_analysis(
-        self, 
-        analysis_id: str, 
-        stock_data: list[Dict[str, Any]], 
+    def get_or_create_series(
+        self,
+        stock_data: Union[List[Dict[str, Any]], Dict[str, List[Any]]],
+        symbol: Optional[str],
+        interval: Optional[str]
+    ) -> str:
+        """Store the price series unless an identical one exists; return its id.
+
+        Not committed; the caller commits it together with the analysis.
+        """
+        data_hash, blob = pack_columns(stock_data)
+        series_id = hashlib.sha256(f"{symbol}|{interval}|{data_hash}".encode()).hexdigest()
+        dates = stock_data['date'] if isinstance(stock_data, dict) else [row['date'] for row in stock_data]
+        # INSERT OR IGNORE, so concurrent writers of the same series do not conflict
+        self.db.execute(
+            insert(PriceSeries).values(
+                id=series_id,
+                symbol=symbol,
+                interval=interval,
+                start_date=dates[0] if dates else None,
+                end_date=dates[-1] if dates else None,
+                points=len(dates),
+                data=blob,
+                created_at=datetime.utcnow()
+            ).on_conflict_do_nothing(index_elements=['id'])
+        )
+        return series_id
+
+    def add_analysis(
+        self,
+        analysis_id: str,
+        stock_data: Union[List[Dict[str, Any]], Dict[str, List[Any]]],
         technical_metrics: Dict[str, Any],
         fundamental_metrics: Dict[str, Any],
-        analysis_text: Dict[str, Any]
+        analysis_text: Dict[str, Any],
+        timestamp: Optional[datetime] = None
     ) -> Analysis:
+        """Add an analysis and its price series without committing."""
+        with timed('db_write'):
+            return self._add_analysis(
+                analysis_id, stock_data, technical_metrics, fundamental_metrics, analysis_text, timestamp
+            )
+
+    def _add_analysis(
+        self,
+        analysis_id: str,
+        stock_data: Union[List[Dict[str, Any]], Dict[str, List[Any]]],
+        technical_metrics: Dict[str, Any],
+        fundamental_metrics: Dict[str, Any],
+        analysis_text: Dict[str, Any],
+        timestamp: Optional[datetime]
+    ) -> Analysis:
+        series_id = self.get_or_create_series(
+            stock_data,
+            symbol=technical_metrics.get('ticker'),
+            interval=technical_metrics.get('interval')
+        )
         db_analysis = Analysis(
             id=analysis_id,
-            stock_data=stock_data,
+            series_id=series_id,
             technical_metrics=technical_metrics,
             fundamental_metrics=fundamental_metrics,
             analysis_text=analysis_text,
-            timestamp=datetime.now()
+            timestamp=timestamp or datetime.now()
         )
         self.db.add(db_analysis)
-        self.db.commit()
+        return db_analysis
+
+    def create_analysis(
+        self, 
+        analysis_id: str, 
+        stock_data: Union[List[Dict[str, Any]], Dict[str, List[Any]]],
+        technical_metrics: Dict[str, Any],
+        fundamental_metrics: Dict[str, Any],
+        analysis_text: Dict[str, Any],
+        timestamp: Optional[datetime] = None
+    ) -> Analysis:
+        db_analysis = self.add_analysis(
+            analysis_id, stock_data, technical_metrics, fundamental_metrics, analysis_text, timestamp
+        )
+        with timed('db_commit'):
+            self.db.commit()
         self.db.refresh(db_analysis)
         return db_analysis
 
     def get_analysis(self, analysis_id: str) -> Optional[Analysis]:
-        return self.db.query(Analysis).filter(Analysis.id == analysis_id).first() 
\ No newline at end of file
+        return self.db.query(Analysis).filter(Analysis.id == analysis_id).first()
+
+    def get_stock_data(self, analysis: Analysis) -> List[Dict[str, Any]]:
+        """The analysis' price data as rows, from its series or the legacy inline column."""
+        if analysis.series_id is None:
+            return analysis.stock_data
+        series = self.db.get(PriceSeries, analysis.series_id)
+        return columns_to_rows(unpack_columns(series.data))
+
+    @staticmethod
+    def share_payload(
+        analysis_text: Dict[str, Any],
+        timestamp: datetime,
+        stock_data: Union[List[Dict[str, Any]], Dict[str, List[Any]]]
+    ) -> Dict[str, Any]:
+        """Body of GET /share/{analysis_id}; stock_data is always sent as rows."""
+        return {
+            "stockData": columns_to_rows(stock_data) if isinstance(stock_data, dict) else stock_data,
+            "analysisText": analysis_text,
+            "timestamp": timestamp.isoformat()
+        }
+
+    def get_share_response(self, analysis_id: str) -> Optional[PreparedResponse]:
+        """The share response of an analysis, serialized and compressed from its stored series.
+
+        Not stored: the price data is kept once per series, and prepared
+        responses are cached in memory by the caller.
+        """
+        with timed('db_read'):
+            analysis = self.get_analysis(analysis_id)
+            if analysis is None:
+                return None
+            stock_data = self.get_stock_data(analysis)
+        return prepare_response(self.share_payload(analysis.analysis_text, analysis.timestamp, stock_data))
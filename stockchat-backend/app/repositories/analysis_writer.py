@@ -0,0 +1,179 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import timed
+from app.db.database import SessionLocal
+from app.repositories.analysis_repository import AnalysisRepository
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# Rough in-memory size of a queued analysis: a boxed float and its list
+# slot per price value, plus the metrics and analysis text
+_BYTES_PER_VALUE = 32
+_RECORD_OVERHEAD_BYTES = 4096
+
+
+def _record_bytes(record: Dict[str, Any]) -> int:
+    stock_data = record['stock_data']
+    if isinstance(stock_data, dict):
+        values = sum(len(column) for column in stock_data.values())
+    else:
+        values = len(stock_data) * (len(stock_data[0]) if stock_data else 0)
+    return _RECORD_OVERHEAD_BYTES + values * _BYTES_PER_VALUE
+
+
+class AnalysisWriter:
+    """Group-commit persistence for analyses.
+
+    submit() queues the analysis and returns a future. One background
+    thread drains the queue and commits whatever has accumulated, up to
+    batch_size analyses, in a single transaction, then resolves each
+    analysis' future; one that could not be written gets the exception. A
+    share ID is handed out only once its future resolves, so it is always
+    readable from the database. The queue is bounded by the estimated
+    size of the queued analyses (max_queue_bytes), not their count.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = 64,
+        max_queue_bytes: int = 64 * 1024 * 1024
+    ):
+        self._session_factory = session_factory
+        self._batch_size = batch_size
+        self._max_queue_bytes = max_queue_bytes
+        self._queue: queue.Queue = queue.Queue()
+        self._queued_bytes = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._batches = 0
+        self._written = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def submit(self, record: Dict[str, Any]) -> Optional[Future]:
+        """Queue create_analysis keyword arguments.
+
+        Returns a future resolved once the analysis is committed (with the
+        error if it could not be), or None if the queue is full and the
+        caller should write it itself.
+        """
+        size = _record_bytes(record)
+        with self._lock:
+            if self._queued_bytes + size > self._max_queue_bytes:
+                self._rejected += 1
+                return None
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="analysis-writer", daemon=True)
+                self._thread.start()
+            self._queued_bytes += size
+        committed: Future = Future()
+        self._queue.put((record, committed, size))
+        return committed
+
+    def flush(self):
+        """Block until every queued analysis has been written."""
+        self._queue.join()
+
+    def close(self):
+        """Write the remaining queue and stop the writer thread."""
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join()
+        with self._lock:
+            self._thread = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "queued_bytes": self._queued_bytes,
+                "batches": self._batches,
+                "written": self._written,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+    def _run(self):
+        while True:
+            batch: List[Tuple[Dict[str, Any], Future, int]] = []
+            stop = False
+            item = self._queue.get()
+            while True:
+                if item is _STOP:
+                    stop = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+                if len(batch) >= self._batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch: List[Tuple[Dict[str, Any], Future, int]]):
+        # By position in the batch
+        errors: Dict[int, Exception] = {}
+        try:
+            db = self._session_factory()
+            try:
+                repository = AnalysisRepository(db)
+                try:
+                    for record, _, _ in batch:
+                        repository.add_analysis(**record)
+                    with timed('db_commit'):
+                        db.commit()
+                except Exception:
+                    db.rollback()
+                    logger.exception(f"Batch insert of {len(batch)} analyses failed, retrying one at a time")
+                    for position, (record, _, _) in enumerate(batch):
+                        try:
+                            repository.add_analysis(**record)
+                            db.commit()
+                        except Exception as e:
+                            db.rollback()
+                            errors[position] = e
+                            logger.exception(f"Dropping analysis {record['analysis_id']}")
+            finally:
+                db.close()
+        except Exception as e:
+            logger.exception(f"Could not write a batch of {len(batch)} analyses")
+            errors = {position: e for position in range(len(batch))}
+
+        with self._lock:
+            self._queued_bytes -= sum(size for _, _, size in batch)
+            self._batches += 1
+            self._written += len(batch) - len(errors)
+            self._failed += len(errors)
+        for position, (_, committed, _) in enumerate(batch):
+            error = errors.get(position)
+            if error is None:
+                committed.set_result(None)
+            else:
+                committed.set_exception(error)
+
+
+analysis_writer = AnalysisWriter(
+    SessionLocal,
+    batch_size=settings.DB_WRITE_BATCH_SIZE,
+    max_queue_bytes=settings.DB_WRITE_QUEUE_MAX_BYTES
+)
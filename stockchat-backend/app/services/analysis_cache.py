@@ -0,0 +1,174 @@
+import math
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from cachetools import LRUCache
+
+from .llm_scheduler import BACKGROUND, llm_priority
+
+logger = logging.getLogger(__name__)
+
+
+def _bucket(value: Optional[float], size: float) -> Optional[float]:
+    """Quantize a value to the nearest multiple of size."""
+    # NaN when the history is too short for an indicator (e.g. MA200)
+    if value is None or math.isnan(value):
+        return None
+    return round(round(value / size) * size, 6)
+
+
+def _pct_from(price: float, reference: Optional[float]) -> Optional[float]:
+    if not reference:
+        return None
+    return (price - reference) / reference * 100
+
+
+def _log_bucket(value: Optional[float], size: float) -> Optional[float]:
+    """Quantize a positive value on a log10 scale (size 0.1 is about 26% steps)."""
+    if value is None or not value > 0:
+        return None
+    return _bucket(math.log10(value), size)
+
+
+def _band_position(price: float, lower: Optional[float], upper: Optional[float]) -> Optional[float]:
+    """Where price sits in the Bollinger Bands, 0 at the lower and 100 at the upper band."""
+    if lower is None or upper is None or not upper > lower:
+        return None
+    return (price - lower) / (upper - lower) * 100
+
+
+# Fundamentals the prompt includes, with their bucket sizes (None: as is)
+_FUNDAMENTAL_BUCKETS = {
+    'sector': None,
+    'industry': None,
+    'trailingPE': 1.0,
+    'forwardPE': 1.0,
+    'priceToBook': 0.5,
+    'beta': 0.1,
+    'dividendYield': 0.1,
+    'trailingEps': 0.1,
+    'forwardEps': 0.1,
+    'profitMargins': 1.0,
+    'operatingMargins': 1.0,
+}
+
+
+def _fundamentals_fingerprint(fundamentals: Dict[str, Any]) -> Tuple:
+    key = [_log_bucket(fundamentals.get('marketCap'), 0.05)]
+    for name, size in _FUNDAMENTAL_BUCKETS.items():
+        value = fundamentals.get(name)
+        key.append(value if size is None or not isinstance(value, (int, float)) else _bucket(value, size))
+    return tuple(key)
+
+
+def stats_fingerprint(stats: Dict[str, Any]) -> Tuple:
+    """Canonical, quantized key for a stats dict.
+
+    Stats that only differ by small intraday moves map to the same key, so
+    their analyses are interchangeable: the trading date and interval, the
+    trend, the indicator readings and fundamentals the analysis talks
+    about, in coarse buckets.
+    """
+    technical = stats['technical']
+    price = technical['current_price']
+    return (
+        technical['ticker'],
+        technical.get('interval'),
+        technical.get('as_of'),
+        technical['trend'],
+        _bucket(technical['trend_strength'], 1.0),
+        _bucket(technical['rsi'], 5.0),
+        technical['macd'] > technical['macd_signal'],
+        _bucket(technical['macd'] / price * 100 if price else None, 0.25),
+        _bucket(_pct_from(price, technical['ma20']), 1.0),
+        _bucket(_pct_from(price, technical['ma50']), 1.0),
+        _bucket(_pct_from(price, technical['ma200']), 1.0),
+        _bucket(technical['daily_return'], 0.5),
+        # Range of the requested window, which differs between periods
+        _bucket(_pct_from(price, technical['yearly_high']), 1.0),
+        _bucket(_pct_from(price, technical['yearly_low']), 1.0),
+        _log_bucket(technical.get('daily_volume'), 0.1),
+        _bucket(_band_position(price, technical.get('bb_lower'), technical.get('bb_upper')), 10.0),
+        _bucket(technical.get('natr'), 0.25),
+        _fundamentals_fingerprint(stats.get('fundamental') or {}),
+    )
+
+
+class AnalysisCache:
+    """TTL + LRU cache of generated analyses keyed on stats_fingerprint.
+
+    Entries are fresh for ttl seconds. With stale_ttl > 0, an entry up to
+    stale_ttl seconds past its TTL is still returned immediately while a
+    background worker regenerates it (stale-while-revalidate).
+    """
+
+    def __init__(self, ttl: float, max_entries: int, stale_ttl: float = 0, refresh_workers: int = 2):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: LRUCache = LRUCache(maxsize=max_entries)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="analysis-refresh")
+        self._counts = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+    def _count(self, name: str):
+        self._counts[name] += 1
+
+    def _store(self, key: Tuple, analysis: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (analysis, time.monotonic())
+
+    def _refresh(self, key: Tuple, stats: Dict[str, Any], generate: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        try:
+            # Never ahead of requests waiting for their first analysis
+            with llm_priority(BACKGROUND):
+                self._store(key, generate(stats))
+            with self._lock:
+                self._count('refreshes')
+        except Exception as e:
+            logger.warning(f"Background analysis refresh failed for {key[0]}: {str(e)}")
+            with self._lock:
+                self._count('refresh_errors')
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_generate(
+        self,
+        stats: Dict[str, Any],
+        generate: Callable[[Dict[str, Any]], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Return a cached analysis for stats, or generate and cache one."""
+        key = stats_fingerprint(stats)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                analysis, created = entry
+                age = time.monotonic() - created
+                if age <= self.ttl:
+                    self._count('hits')
+                    return analysis
+                if age <= self.ttl + self.stale_ttl:
+                    self._count('stale_hits')
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._executor.submit(self._refresh, key, stats, generate)
+                    return analysis
+            self._count('misses')
+
+        analysis = generate(stats)
+        self._store(key, analysis)
+        return analysis
+
+    def is_fresh(self, stats: Dict[str, Any]) -> bool:
+        """Whether a cached analysis within its TTL exists for stats (not counted as a hit)."""
+        with self._lock:
+            entry = self._entries.get(stats_fingerprint(stats))
+        return entry is not None and time.monotonic() - entry[1] <= self.ttl
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counts, 'size': len(self._entries)}
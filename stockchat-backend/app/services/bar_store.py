@@ -0,0 +1,318 @@
+import os
+import re
+import threading
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import yfinance as yf
+
+from app.core.config import settings
+from app.core.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# yfinance only serves intraday bars for a limited trailing window
+_INTRADAY_LIMIT_DAYS = {
+    '1m': 7,
+    '2m': 60,
+    '5m': 60,
+    '15m': 60,
+    '30m': 60,
+    '60m': 730,
+    '90m': 60,
+    '1h': 730,
+}
+
+# Columns that signal a corporate action; any new non-zero value invalidates
+# the adjusted history we already stored.
+_ADJUSTMENT_COLUMNS = ('Dividends', 'Stock Splits')
+
+
+class BarStore:
+    """Persistent OHLCV store keyed by (symbol, interval).
+
+    Each series lives in its own Parquet file. Requests only download the bars
+    after the last stored timestamp and append them; a dividend or split in the
+    new bars (or a mismatch on the overlapping bar) triggers a full reload,
+    since yfinance back-adjusts the whole series.
+
+    A series may cover only the range after a start date. The start it was
+    downloaded from is kept in the file's attrs ('history_start', None for
+    the full history); a request for an earlier start reloads the series.
+
+    A series is fetched upstream at most every min_refresh seconds, and its
+    file is only rewritten when the fetch brought new or revised bars.
+    """
+
+    def __init__(self, root: str = settings.BAR_STORE_DIR, min_refresh: float = settings.BAR_STORE_MIN_REFRESH_SECONDS):
+        self.root = root
+        self.min_refresh = min_refresh
+        # Last upstream fetch (monotonic) per (symbol, interval)
+        self._refreshed: Dict[Tuple[str, str], float] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _lock_for(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    @staticmethod
+    def file_symbol(symbol: str) -> str:
+        """Symbol as it appears in bar file names."""
+        return re.sub(r'[^A-Za-z0-9.\-]', '_', symbol.upper())
+
+    def _path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, f"{self.file_symbol(symbol)}_{interval}.parquet")
+
+    def _load(self, symbol: str, interval: str) -> Optional[pd.DataFrame]:
+        path = self._path(symbol, interval)
+        if not os.path.exists(path):
+            return None
+        try:
+            return pd.read_parquet(path)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable bar file {path}: {str(e)}")
+            return None
+
+    def _save(self, symbol: str, interval: str, df: pd.DataFrame, start: Optional[pd.Timestamp]) -> None:
+        path = self._path(symbol, interval)
+        tmp_path = f"{path}.tmp"
+        df.attrs['history_start'] = start.isoformat() if start is not None else None
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+    def stored_series(self, interval: str) -> Dict[str, Tuple[str, float]]:
+        """Path and modification time of each series stored for interval, by symbol.
+
+        Symbols are as in the file names (see file_symbol).
+        """
+        suffix = f"_{interval}.parquet"
+        series = {}
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.name.endswith(suffix) and entry.is_file():
+                    series[entry.name[:-len(suffix)]] = (entry.path, entry.stat().st_mtime)
+        return series
+
+    def updated(self, symbol: str, interval: str) -> Optional[float]:
+        """Modification time of the stored series, or None if it is not stored."""
+        try:
+            return os.stat(self._path(symbol, interval)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _coverage_start(stored: pd.DataFrame) -> Optional[pd.Timestamp]:
+        """Start the stored series was downloaded from; files without it hold the full history."""
+        start = stored.attrs.get('history_start')
+        return pd.Timestamp(start) if start else None
+
+    @staticmethod
+    def _covers(stored_start: Optional[pd.Timestamp], start: Optional[pd.Timestamp]) -> bool:
+        return stored_start is None or (start is not None and start >= stored_start)
+
+    @staticmethod
+    def _clamp_start(start: Optional[pd.Timestamp], interval: str) -> Optional[pd.Timestamp]:
+        """Keep intraday starts inside the window yfinance serves."""
+        limit_days = _INTRADAY_LIMIT_DAYS.get(interval)
+        if start is None or limit_days is None:
+            return start
+        earliest = (pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=limit_days - 1)).ceil('D')
+        return max(start, earliest)
+
+    @staticmethod
+    def _is_too_old_for_incremental(last_timestamp: pd.Timestamp, interval: str) -> bool:
+        limit_days = _INTRADAY_LIMIT_DAYS.get(interval)
+        if limit_days is None:
+            return False
+        now = datetime.now(timezone.utc)
+        last = last_timestamp.to_pydatetime()
+        if last.tzinfo is None:
+            last = last.replace(tzinfo=timezone.utc)
+        return now - last > timedelta(days=limit_days)
+
+    def _recently_refreshed(self, key: Tuple[str, str]) -> bool:
+        return time.monotonic() - self._refreshed.get(key, -float('inf')) < self.min_refresh
+
+    @staticmethod
+    def _unchanged(stored: pd.DataFrame, fresh: pd.DataFrame) -> bool:
+        """Whether the fetched bars are all stored already, with the same values."""
+        if not fresh.index.isin(stored.index).all():
+            return False
+        return stored.loc[fresh.index].equals(fresh)
+
+    @staticmethod
+    def _needs_reload(stored: pd.DataFrame, fresh: pd.DataFrame) -> bool:
+        """Check whether the freshly fetched bars invalidate the stored series."""
+        new_bars = fresh[fresh.index > stored.index[-1]]
+        for column in _ADJUSTMENT_COLUMNS:
+            if column in new_bars.columns and (new_bars[column].fillna(0) != 0).any():
+                return True
+
+        # The first fetched bar overlaps a completed stored bar; if its close
+        # moved, yfinance has re-adjusted the history.
+        overlap = fresh.index[0]
+        if overlap in stored.index and overlap < stored.index[-1]:
+            stored_close = stored.at[overlap, 'Close']
+            fresh_close = fresh.at[overlap, 'Close']
+            if abs(stored_close - fresh_close) > 1e-6 * max(abs(stored_close), 1.0):
+                return True
+        return False
+
+    def _full_reload(self, ticker: yf.Ticker, interval: str, start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        if start is None:
+            logger.info(f"Full history download for {ticker.ticker} ({interval})")
+            with timed('yfinance_history'):
+                df = ticker.history(period='max', interval=interval)
+        else:
+            logger.info(f"History download for {ticker.ticker} ({interval}) from {start.date()}")
+            with timed('yfinance_history'):
+                df = ticker.history(start=start, interval=interval)
+        if len(df) > 0:
+            self._save(ticker.ticker, interval, df, start)
+        return df
+
+    def _needs_full_reload(self, stored: Optional[pd.DataFrame], start: Optional[pd.Timestamp], interval: str) -> bool:
+        return (
+            stored is None or len(stored) < 2
+            or not self._covers(self._coverage_start(stored), start)
+            or self._is_too_old_for_incremental(stored.index[-1], interval)
+        )
+
+    def _append(self, ticker: yf.Ticker, interval: str, stored: pd.DataFrame, fresh: pd.DataFrame) -> pd.DataFrame:
+        """Merge bars fetched from the last completed stored bar into the series."""
+        symbol = ticker.ticker
+        stored_start = self._coverage_start(stored)
+        if len(fresh) == 0:
+            return stored
+
+        if self._needs_reload(stored, fresh):
+            logger.info(f"Adjustment detected for {symbol} ({interval}), reloading series")
+            return self._full_reload(ticker, interval, stored_start)
+
+        fresh = fresh.reindex(columns=stored.columns)
+        if self._unchanged(stored, fresh):
+            return stored
+        df = pd.concat([stored[stored.index < fresh.index[0]], fresh])
+        df = df[~df.index.duplicated(keep='last')]
+        self._save(symbol, interval, df, stored_start)
+        logger.debug(f"Appended {len(df) - len(stored)} bars to {symbol} ({interval})")
+        return df
+
+    def get_history(self, ticker: yf.Ticker, interval: str, start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """Return the stored history for a ticker from at least start, refreshed incrementally.
+
+        With start None the full history is returned. The result may begin
+        earlier than start if a longer range is already stored.
+        """
+        symbol = ticker.ticker
+        start = self._clamp_start(start, interval)
+        key = (symbol.upper(), interval)
+        with self._lock_for(key):
+            stored = self._load(symbol, interval)
+            if self._needs_full_reload(stored, start, interval):
+                self._refreshed[key] = time.monotonic()
+                return self._full_reload(ticker, interval, start)
+            if self._recently_refreshed(key):
+                return stored
+
+            # Re-fetch from the last completed bar so the still-forming last
+            # bar is replaced and the overlap can be checked for re-adjustment.
+            try:
+                with timed('yfinance_history'):
+                    fresh = ticker.history(start=stored.index[-2], interval=interval)
+            except Exception as e:
+                logger.warning(f"Incremental fetch failed for {symbol} ({interval}): {str(e)}")
+                return stored
+
+            self._refreshed[key] = time.monotonic()
+            return self._append(ticker, interval, stored, fresh)
+
+    @staticmethod
+    def _download(symbols: List[str], interval: str, start: Optional[pd.Timestamp]) -> Dict[str, pd.DataFrame]:
+        """Fetch several symbols with one yf.download call, split per symbol.
+
+        Uses the same adjustment and timezone settings as Ticker.history, so
+        the frames can be merged with stored series.
+        """
+        kwargs = dict(
+            interval=interval, group_by='ticker', actions=True, auto_adjust=True,
+            ignore_tz=False, progress=False, threads=True
+        )
+        with timed('yfinance_history'):
+            if start is None:
+                data = yf.download(symbols, period='max', **kwargs)
+            else:
+                data = yf.download(symbols, start=start, **kwargs)
+
+        frames = {}
+        downloaded = set(data.columns.get_level_values(0)) if data is not None and len(data) > 0 else set()
+        for symbol in symbols:
+            if symbol not in downloaded:
+                frames[symbol] = pd.DataFrame()
+                continue
+            frame = data[symbol].dropna(subset=['Close']).copy()
+            frame.columns.name = None
+            for column in _ADJUSTMENT_COLUMNS:
+                if column in frame.columns:
+                    frame[column] = frame[column].fillna(0)
+            frames[symbol] = frame
+        return frames
+
+    def get_histories(
+        self,
+        symbols: List[str],
+        interval: str,
+        start: Optional[pd.Timestamp] = None
+    ) -> Dict[str, pd.DataFrame]:
+        """get_history for several symbols, downloading their bars in bulk.
+
+        Symbols needing a reload from start are fetched with one yf.download
+        call, and the ones only needing new bars with another, from the
+        earliest of their last completed bars (unless fetched within
+        min_refresh). Series found to be re-adjusted fall back to a
+        per-symbol reload.
+        """
+        symbols = [symbol.upper() for symbol in symbols]
+        start = self._clamp_start(start, interval)
+        stored = {symbol: self._load(symbol, interval) for symbol in symbols}
+        reloads = [symbol for symbol in symbols if self._needs_full_reload(stored[symbol], start, interval)]
+        appends = [
+            symbol for symbol in symbols
+            if symbol not in reloads and not self._recently_refreshed((symbol, interval))
+        ]
+
+        fetched: Dict[str, pd.DataFrame] = {}
+        if reloads:
+            logger.info(f"Bulk history download for {len(reloads)} symbols ({interval})")
+            fetched.update(self._download(reloads, interval, start))
+        if appends:
+            try:
+                fetched.update(self._download(appends, interval, min(stored[symbol].index[-2] for symbol in appends)))
+            except Exception as e:
+                logger.warning(f"Bulk incremental fetch failed ({interval}): {str(e)}")
+
+        histories = {}
+        now = time.monotonic()
+        for symbol in symbols:
+            with self._lock_for((symbol, interval)):
+                fresh = fetched.get(symbol)
+                if fresh is not None:
+                    self._refreshed[(symbol, interval)] = now
+                if symbol in reloads:
+                    if len(fresh) > 0:
+                        self._save(symbol, interval, fresh, start)
+                    histories[symbol] = fresh
+                elif fresh is None:
+                    histories[symbol] = stored[symbol]
+                else:
+                    series = stored[symbol]
+                    fresh = fresh[fresh.index >= series.index[-2]]
+                    histories[symbol] = self._append(yf.Ticker(symbol), interval, series, fresh)
+        return histories
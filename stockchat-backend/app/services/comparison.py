@@ -0,0 +1,46 @@
+import math
+from typing import Any, Dict
+
+import pandas as pd
+
+
+def cross_sectional_metrics(closes: Dict[str, pd.Series]) -> Dict[str, Any]:
+    """Metrics comparing several symbols over the same window.
+
+    Closes are aligned on their common timestamps. Relative strength is a
+    symbol's window return against the equal-weighted return of the group,
+    in percent; correlation is the Pearson correlation of bar returns.
+    """
+    prices = pd.DataFrame(closes).dropna()
+    symbols = list(closes)
+    if len(prices) < 2:
+        return {
+            'common_bars': len(prices),
+            'period_return': {symbol: None for symbol in symbols},
+            'relative_strength': {symbol: None for symbol in symbols},
+            'volatility': {symbol: None for symbol in symbols},
+            'ranking': [],
+            'correlation': {},
+        }
+
+    growth = prices.iloc[-1] / prices.iloc[0]
+    group_growth = growth.mean()
+    relative_strength = (growth / group_growth - 1) * 100
+    returns = prices.pct_change().iloc[1:]
+    correlation = returns.corr()
+
+    def clean(value: float):
+        return None if value is None or math.isnan(value) else round(float(value), 2)
+
+    return {
+        'common_bars': len(prices),
+        'period_return': {symbol: clean((growth[symbol] - 1) * 100) for symbol in symbols},
+        'relative_strength': {symbol: clean(relative_strength[symbol]) for symbol in symbols},
+        # Standard deviation of bar returns, in percent
+        'volatility': {symbol: clean(returns[symbol].std() * 100) for symbol in symbols},
+        'ranking': relative_strength.sort_values(ascending=False).index.tolist(),
+        'correlation': {
+            symbol: {other: clean(correlation.at[symbol, other]) for other in symbols}
+            for symbol in symbols
+        },
+    }
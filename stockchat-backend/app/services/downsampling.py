@@ -0,0 +1,74 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# Fields aggregated over each bucket instead of sampled at the chosen bar
+_ENVELOPE_FIELDS = {
+    "high": np.maximum,
+    "low": np.minimum,
+    "volume": np.add,
+}
+
+
+def lttb_indices(values: np.ndarray, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Largest-Triangle-Three-Buckets selection over evenly spaced points.
+
+    Returns the indices of the chosen points and the start index of the
+    bucket each one represents. The first and last points are always kept;
+    the rest are split into max_points - 2 buckets, and from each bucket
+    the point forming the largest triangle with the previously chosen point
+    and the next bucket's average is kept.
+    """
+    n = len(values)
+    if max_points >= n or max_points < 3:
+        indices = np.arange(n)
+        return indices, indices
+
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    bucket_starts = np.concatenate(([0], edges[:-1], [n - 1]))
+    # Centroid of every bucket, including the single-point last one
+    bucket_ends = np.append(bucket_starts[1:], n)
+    centroid_x = (bucket_starts + bucket_ends - 1) / 2
+    centroid_y = np.add.reduceat(values, bucket_starts) / (bucket_ends - bucket_starts)
+
+    positions = np.arange(n, dtype=np.float64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for bucket in range(1, max_points - 1):
+        start, end = bucket_starts[bucket], bucket_ends[bucket]
+        x0, y0 = positions[previous], values[previous]
+        areas = np.abs(
+            (x0 - centroid_x[bucket + 1]) * (values[start:end] - y0)
+            - (x0 - positions[start:end]) * (centroid_y[bucket + 1] - y0)
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket] = previous
+
+    return selected, bucket_starts
+
+
+def downsample_columns(columns: Dict[str, List[Any]], max_points: int) -> Dict[str, List[Any]]:
+    """Reduce columnar price data to at most max_points points.
+
+    Points are chosen by LTTB on the closing price, and every per-bar field
+    (date, open, indicators) is taken from the same bars so overlays stay
+    aligned with the price line. High and low are the min/max envelope of
+    each bucket and volume is its total, so spikes are not lost.
+    """
+    if len(columns["date"]) <= max_points:
+        return columns
+
+    price = np.asarray(columns["price"], dtype=np.float64)
+    selected, bucket_starts = lttb_indices(price, max_points)
+
+    sampled: Dict[str, List[Any]] = {}
+    for field, values in columns.items():
+        reduce = _ENVELOPE_FIELDS.get(field)
+        if reduce is not None:
+            sampled[field] = reduce.reduceat(np.asarray(values), bucket_starts).tolist()
+        else:
+            sampled[field] = [values[i] for i in selected]
+    return sampled
@@ -1,43 +1,125 @@
 import dspy
+import litellm
+from dspy.clients.base_lm import BaseLM
 import os
-from typing import Dict, Any, Tuple, List
+import json
+import hashlib
+import threading
+import logging
+from typing import Dict, Any, Tuple, List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
+from app.core.config import settings
+from app.core.metrics import timed, record_llm_usage, register_collector
+from .query_resolver import QueryResolver, ResolvedComparison
+from .llm_scheduler import llm_scheduler
+from .llm_pool import LMPool, PoolMember
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 # Configure DSPy
-def get_available_llm():
-    """Get the first available LLM based on environment variables."""
+def get_configured_llms(num_retries: int = 3) -> Dict[str, dspy.LM]:
+    """One LM per provider with an API key in the environment, in preference order."""
+    lms = {}
     if os.environ.get("OPENAI_API_KEY"):
-        return dspy.LM(
+        lms["openai"] = dspy.LM(
             model="openai/gpt-4o-mini",
-            api_key=os.environ["OPENAI_API_KEY"]
+            api_key=os.environ["OPENAI_API_KEY"],
+            num_retries=num_retries
         )
-    elif os.environ.get("DEEPSEEK_API_KEY"):
-        return dspy.LM(
+    if os.environ.get("DEEPSEEK_API_KEY"):
+        lms["deepseek"] = dspy.LM(
             model="deepseek/deepseek-chat",
-            api_key=os.environ["DEEPSEEK_API_KEY"]
+            api_key=os.environ["DEEPSEEK_API_KEY"],
+            num_retries=num_retries
         )
-    elif os.environ.get("GITHUB_TOKEN"):
-        return dspy.LM(
+    if os.environ.get("GITHUB_TOKEN"):
+        lms["github"] = dspy.LM(
             model="openai/gpt-4o-mini",
             api_base="https://models.inference.ai.azure.com",
-            api_key=os.environ["GITHUB_TOKEN"]
+            api_key=os.environ["GITHUB_TOKEN"],
+            num_retries=num_retries
         )
-    elif os.environ.get("GEMINI_API_KEY"):
-        return dspy.LM(
+    if os.environ.get("GEMINI_API_KEY"):
+        lms["gemini"] = dspy.LM(
             model="gemini/gemini-2.0-flash-exp",
-            api_key=os.environ["GEMINI_API_KEY"]
+            api_key=os.environ["GEMINI_API_KEY"],
+            num_retries=num_retries
         )
-    else:
+    for name, lm in lms.items():
+        lm.provider_name = name
+    return lms
+
+def llm_provider(lm: BaseLM) -> str:
+    """Scheduler budget key of an LM: its name in get_configured_llms, else its model's prefix.
+
+    Pools take budget under their members' names, which are the same keys.
+    """
+    name = getattr(lm, 'provider_name', None)
+    if name:
+        return name
+    return (getattr(lm, 'model', None) or 'default').split('/')[0]
+
+def get_available_llm() -> BaseLM:
+    """The LM to configure DSPy with.
+
+    With several providers configured (and LLM_POOL_ENABLED) this is an
+    LMPool over all of them; otherwise the first provider's LM.
+    """
+    lms = get_configured_llms()
+    if not lms:
         raise ValueError("No LLM API keys found in environment variables")
+    if not settings.LLM_POOL_ENABLED or len(lms) == 1:
+        return next(iter(lms.values()))
+
+    # Pool members retry once; failing over to another provider replaces retries
+    lms = get_configured_llms(num_retries=1)
 
-# Initialize the LLM and configure DSPy
-active_llm = get_available_llm()
-dspy.settings.configure(lm=active_llm, max_requests_per_minute=15, trace=[])
+    pool = LMPool(
+        [PoolMember(name, lm, settings.LLM_POOL_WEIGHTS.get(name, 1.0)) for name, lm in lms.items()],
+        strategy=settings.LLM_POOL_STRATEGY,
+        hedge_percentile=settings.LLM_HEDGE_PERCENTILE,
+        hedge_delay=settings.LLM_HEDGE_DELAY_SECONDS,
+        cooldown=settings.LLM_POOL_COOLDOWN_SECONDS
+    )
+    register_collector('llm_pool', pool.stats)
+    logger.info(f"LLM pool over {', '.join(lms)}")
+    return pool
+
+_configure_lock = threading.Lock()
+_configured = False
+
+def _record_llm_usage(kwargs, completion_response, start_time, end_time):
+    """litellm success callback counting the tokens of each completion."""
+    usage = getattr(completion_response, 'usage', None)
+    if kwargs.get('cache_hit') or usage is None:
+        return
+    record_llm_usage(kwargs.get('model') or 'unknown', usage.prompt_tokens or 0, usage.completion_tokens or 0)
+
+def configure_dspy(lm: Optional[BaseLM] = None):
+    """Initialize the LLM and configure DSPy.
+
+    Runs on first service construction rather than at import, so importing
+    the app needs no API keys. Passing an LM replaces the configured one.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured and lm is None:
+            return
+        # Request rates are enforced by llm_scheduler
+        dspy.settings.configure(lm=lm or get_available_llm(), trace=[])
+        if _record_llm_usage not in litellm.success_callback:
+            litellm.success_callback.append(_record_llm_usage)
+        _configured = True
+
+# Bump when a module or signature changes in a way the training-set
+# fingerprint in the artifact name does not capture
+PROGRAM_VERSION = 1
 
 # Pydantic Models
 class StockQuery(BaseModel):
@@ -57,6 +139,12 @@ class StockAnalysis(BaseModel):
     fundamental_factors: list[str] = Field(description="List of fundamental analysis points")
     outlook: str = Field(description="Future outlook and recommendations")
 
+class StockComparison(BaseModel):
+    """Generated comparison of several stocks."""
+    summary: str = Field(description="Brief summary of how the stocks compare")
+    comparison_factors: list[str] = Field(description="List of points comparing the stocks' performance, risk and fundamentals")
+    outlook: str = Field(description="Relative outlook and which stocks look stronger or weaker")
+
 # DSPy Signatures
 class ExtractStockInfoSignature(dspy.Signature):
     """Extracts stock symbol and yfinance parameters from user query."""
@@ -68,6 +156,11 @@ class GenerateAnalysisSignature(dspy.Signature):
     stats: Dict[str, Any] = dspy.InputField()
     output: StockAnalysis = dspy.OutputField()
 
+class GenerateComparisonSignature(dspy.Signature):
+    """Generates a structured comparison from several stocks' statistics and cross-sectional metrics."""
+    stats: Dict[str, Any] = dspy.InputField()
+    output: StockComparison = dspy.OutputField()
+
 class AnalysisEvaluator(dspy.Signature):
     """Evaluates the quality of generated stock analysis."""
     stats: Dict[str, Any] = dspy.InputField()
@@ -87,6 +180,23 @@ def analysis_metric(gold: Any, pred: Any, trace: Any = None) -> float:
     return (scores.accuracy_score + scores.completeness_score + 
             scores.insight_score + scores.readability_score) / 4
 
+def format_fundamental_factors(fundamental: Dict[str, Any]) -> List[str]:
+    """Fundamental factor lines, formatted from the stats without the LLM."""
+    return [
+        f"Market Cap: {fundamental['marketCap']:,.2f}" if fundamental['marketCap'] is not None else "Market Cap: N/A",
+        f"P/E Ratio (Trailing): {fundamental['trailingPE']:.2f}" if fundamental['trailingPE'] is not None else "P/E Ratio (Trailing): N/A",
+        f"P/E Ratio (Forward): {fundamental['forwardPE']:.2f}" if fundamental['forwardPE'] is not None else "P/E Ratio (Forward): N/A",
+        f"Price/Book Ratio: {fundamental['priceToBook']:.2f}" if fundamental['priceToBook'] is not None else "Price/Book Ratio: N/A",
+        f"Beta: {fundamental['beta']:.2f}" if fundamental['beta'] is not None else "Beta: N/A",
+        f"Dividend Yield: {fundamental['dividendYield']:.2f}%" if fundamental['dividendYield'] is not None else "Dividend Yield: N/A",
+        f"EPS (Trailing): {fundamental['trailingEps']:.2f}" if fundamental['trailingEps'] is not None else "EPS (Trailing): N/A",
+        f"EPS (Forward): {fundamental['forwardEps']:.2f}" if fundamental['forwardEps'] is not None else "EPS (Forward): N/A",
+        f"Profit Margin: {fundamental['profitMargins']:.2f}%" if fundamental['profitMargins'] is not None else "Profit Margin: N/A",
+        f"Operating Margin: {fundamental['operatingMargins']:.2f}%" if fundamental['operatingMargins'] is not None else "Operating Margin: N/A",
+        f"Sector: {fundamental['sector']}" if fundamental['sector'] is not None else "Sector: N/A",
+        f"Industry: {fundamental['industry']}" if fundamental['industry'] is not None else "Industry: N/A"
+    ]
+
 # DSPy Modules
 class ExtractStockInfo(dspy.Module):
     def __init__(self):
@@ -103,27 +213,22 @@ class GenerateAnalysis(dspy.Module):
     
     def forward(self, stats: Dict[str, Any]) -> StockAnalysis:
         """Generate comprehensive stock analysis."""
-        # Format fundamental factors with proper prefixes and values
-        fundamental_factors = [
-            f"Market Cap: {stats['fundamental']['marketCap']:,.2f}" if stats['fundamental']['marketCap'] is not None else "Market Cap: N/A",
-            f"P/E Ratio (Trailing): {stats['fundamental']['trailingPE']:.2f}" if stats['fundamental']['trailingPE'] is not None else "P/E Ratio (Trailing): N/A",
-            f"P/E Ratio (Forward): {stats['fundamental']['forwardPE']:.2f}" if stats['fundamental']['forwardPE'] is not None else "P/E Ratio (Forward): N/A",
-            f"Price/Book Ratio: {stats['fundamental']['priceToBook']:.2f}" if stats['fundamental']['priceToBook'] is not None else "Price/Book Ratio: N/A",
-            f"Beta: {stats['fundamental']['beta']:.2f}" if stats['fundamental']['beta'] is not None else "Beta: N/A",
-            f"Dividend Yield: {stats['fundamental']['dividendYield']:.2f}%" if stats['fundamental']['dividendYield'] is not None else "Dividend Yield: N/A",
-            f"EPS (Trailing): {stats['fundamental']['trailingEps']:.2f}" if stats['fundamental']['trailingEps'] is not None else "EPS (Trailing): N/A",
-            f"EPS (Forward): {stats['fundamental']['forwardEps']:.2f}" if stats['fundamental']['forwardEps'] is not None else "EPS (Forward): N/A",
-            f"Profit Margin: {stats['fundamental']['profitMargins']:.2f}%" if stats['fundamental']['profitMargins'] is not None else "Profit Margin: N/A",
-            f"Operating Margin: {stats['fundamental']['operatingMargins']:.2f}%" if stats['fundamental']['operatingMargins'] is not None else "Operating Margin: N/A",
-            f"Sector: {stats['fundamental']['sector']}" if stats['fundamental']['sector'] is not None else "Sector: N/A",
-            f"Industry: {stats['fundamental']['industry']}" if stats['fundamental']['industry'] is not None else "Industry: N/A"
-        ]
-        
+        fundamental_factors = format_fundamental_factors(stats['fundamental'])
+
         # Call predictor with the stats parameter
         result = self.predictor(stats=stats)
         result.output.fundamental_factors = fundamental_factors
         return result.output
 
+class GenerateComparison(dspy.Module):
+    def __init__(self):
+        super().__init__()
+        self.predictor = dspy.ChainOfThought(GenerateComparisonSignature)
+
+    def forward(self, stats: Dict[str, Any]) -> StockComparison:
+        """Generate one comparison across all symbols."""
+        return self.predictor(stats=stats).output
+
 # Evaluation Signatures and Functions
 class StockInfoEvaluator(dspy.Signature):
     """Evaluates the quality of extracted stock information."""
@@ -144,10 +249,14 @@ def stock_info_metric(gold: Any, pred: Any, trace: Any = None) -> float:
 
 # Main Service Class
 class DspyService:
-    def __init__(self):
+    def __init__(self, compile_missing: Optional[bool] = None):
+        configure_dspy()
+
         # Initialize modules
+        self.resolver = QueryResolver()
         self.extractor = ExtractStockInfo()
         self.analyzer = GenerateAnalysis()
+        self.comparator = GenerateComparison()
         
         # Configure teleprompters
         self.extract_teleprompter = dspy.teleprompt.BootstrapFewShot(
@@ -162,13 +271,78 @@ class DspyService:
             max_rounds=2
         )
         
-        # Compile modules separately
-        self._compile_extractor()
-        self._compile_analyzer()
-    
-    def _compile_extractor(self):
-        """Compile the stock info extractor."""
-        example_queries = [
+        # Extraction path counters ('resolver' vs 'llm')
+        self._extraction_counts = {'resolver': 0, 'llm': 0}
+        self._counts_lock = threading.Lock()
+        
+        # Load the programs compiled offline by `python -m app.compile_dspy`
+        if compile_missing is None:
+            compile_missing = settings.DSPY_COMPILE_ON_STARTUP
+        self._load_or_compile('extractor', self.extractor_trainset(), self._compile_extractor, compile_missing)
+        self._load_or_compile('analyzer', self.analyzer_trainset(), self._compile_analyzer, compile_missing)
+
+    @staticmethod
+    def artifact_path(name: str, trainset: List[dspy.Example]) -> str:
+        """Path of a compiled program; the name changes whenever its training set does."""
+        fingerprint = hashlib.sha256(
+            json.dumps([example.toDict() for example in trainset], sort_keys=True, default=str).encode()
+        ).hexdigest()[:12]
+        return os.path.join(settings.DSPY_ARTIFACT_DIR, f"{name}-v{PROGRAM_VERSION}-{fingerprint}.json")
+
+    def _load_or_compile(self, name: str, trainset: List[dspy.Example], compile_fn, compile_missing: bool):
+        path = self.artifact_path(name, trainset)
+        program = getattr(self, name)
+        if os.path.exists(path):
+            try:
+                program.load(path)
+            except Exception as e:
+                # A truncated or incompatible artifact must not keep the service from starting
+                logger.exception(f"Loading compiled {name} from {path} failed, using the uncompiled program: {str(e)}")
+                setattr(self, name, type(program)())
+                return
+            logger.info(f"Loaded compiled {name} from {path}")
+        elif compile_missing:
+            logger.info(f"No compiled {name} at {path}, compiling")
+            try:
+                compile_fn()
+            except Exception as e:
+                # Serve uncompiled rather than not at all; retried on the next start
+                logger.exception(f"Compiling {name} failed, using the uncompiled program: {str(e)}")
+                setattr(self, name, type(program)())
+                return
+            self._save_program(name, path)
+        else:
+            logger.warning(
+                f"No compiled {name} at {path}; using the uncompiled program. "
+                "Run `python -m app.compile_dspy` to build it."
+            )
+
+    def _save_program(self, name: str, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # save() picks the format from the extension; per process so
+        # concurrent writers never share a temp file
+        tmp_path = f"{os.path.splitext(path)[0]}.{os.getpid()}.tmp.json"
+        getattr(self, name).save(tmp_path)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved compiled {name} to {path}")
+
+    def compile(self) -> List[str]:
+        """Compile both programs with BootstrapFewShot and save them as artifacts."""
+        paths = []
+        for name, trainset, compile_fn in (
+            ('extractor', self.extractor_trainset(), self._compile_extractor),
+            ('analyzer', self.analyzer_trainset(), self._compile_analyzer),
+        ):
+            compile_fn()
+            path = self.artifact_path(name, trainset)
+            self._save_program(name, path)
+            paths.append(path)
+        return paths
+
+    @staticmethod
+    def extractor_trainset() -> List[dspy.Example]:
+        """Training examples for the stock info extractor."""
+        return [
             dspy.Example(
                 input=StockQuery(text="Show me Apple stock performance"),
                 output=ExtractedInfo(
@@ -210,15 +384,18 @@ class DspyService:
                 )
             ).with_inputs("input"),
         ]
-        
+    
+    def _compile_extractor(self):
+        """Compile the stock info extractor."""
         self.extractor = self.extract_teleprompter.compile(
-            self.extractor, 
-            trainset=example_queries
+            ExtractStockInfo(), 
+            trainset=self.extractor_trainset()
         )
-    
-    def _compile_analyzer(self):
-        """Compile the analysis generator."""
-        example_analyses = [
+
+    @staticmethod
+    def analyzer_trainset() -> List[dspy.Example]:
+        """Training examples for the analysis generator."""
+        return [
             dspy.Example(
                 stats={
                     'technical': {
@@ -365,16 +542,71 @@ class DspyService:
                 )
             ).with_inputs("stats")
         ]
-        
+    
+    def _compile_analyzer(self):
+        """Compile the analysis generator."""
         self.analyzer = self.analysis_teleprompter.compile(
-            self.analyzer, 
-            trainset=example_analyses
+            GenerateAnalysis(), 
+            trainset=self.analyzer_trainset()
         )
 
+    def _count_extraction(self, path: str):
+        with self._counts_lock:
+            self._extraction_counts[path] += 1
+
+    @staticmethod
+    def _acquire_llm():
+        """Wait for the configured LM's provider budget; raises LLMBusyError if it is exhausted."""
+        lm = dspy.settings.lm
+        if isinstance(lm, LMPool):
+            # Pools take budget per member call
+            return
+        llm_scheduler.acquire(llm_provider(lm))
+
+    def extraction_stats(self) -> Dict[str, Any]:
+        """Hit counts per extraction path and the share served without the LLM."""
+        with self._counts_lock:
+            counts = dict(self._extraction_counts)
+        total = counts['resolver'] + counts['llm']
+        return {
+            **counts,
+            'total': total,
+            'resolver_hit_rate': round(counts['resolver'] / total, 4) if total else 0.0
+        }
+
     def extract_stock_info(self, query: str) -> ExtractedInfo:
-        """Extract stock info from a text query."""
-        return self.extractor(input=StockQuery(text=query))
+        """Extract stock info from a text query.
+
+        Common queries are answered by the local resolver; the LLM extractor
+        only runs when the resolver's confidence is too low.
+        """
+        resolved = self.resolver.resolve(query)
+        if resolved is not None and resolved.confidence >= settings.QUERY_RESOLVER_MIN_CONFIDENCE:
+            self._count_extraction('resolver')
+            logger.debug(f"Resolved '{query}' locally: {resolved}")
+            return ExtractedInfo(
+                symbol=resolved.symbol,
+                yfinance_period=resolved.yfinance_period,
+                yfinance_interval=resolved.yfinance_interval
+            )
+
+        self._count_extraction('llm')
+        self._acquire_llm()
+        with timed('llm_extract'):
+            return self.extractor(input=StockQuery(text=query))
 
     def generate_analysis(self, stats: Dict[str, Any]) -> StockAnalysis:
         """Generate analysis from stock statistics."""
-        return self.analyzer(stats=stats) 
\ No newline at end of file
+        self._acquire_llm()
+        with timed('llm_analysis'):
+            return self.analyzer(stats=stats)
+
+    def extract_comparison(self, query: str) -> ResolvedComparison:
+        """Extract the symbols and shared period of a comparison query."""
+        return self.resolver.resolve_comparison(query)
+
+    def generate_comparison(self, stats: Dict[str, Any]) -> StockComparison:
+        """Generate one comparison from several stocks' statistics."""
+        self._acquire_llm()
+        with timed('llm_comparison'):
+            return self.comparator(stats=stats) 
\ No newline at end of file
@@ -0,0 +1,75 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class FundamentalsCache:
+    """TTL + size-bounded cache of per-symbol fundamentals.
+
+    Only the small fundamentals dict built from ticker.info is kept, not the
+    full info payload. Failed loads are not cached, so the next request
+    retries instead of serving empty fundamentals for a whole TTL.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Dict[str, Any]],
+        ttl: float,
+        max_entries: int,
+        warm_workers: int = 8
+    ):
+        self._loader = loader
+        self._entries: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self.warm_workers = warm_workers
+        self._counts = {'hits': 0, 'misses': 0}
+
+    def get(self, symbol: str) -> Dict[str, Any]:
+        """Return cached fundamentals for symbol, loading them on a miss."""
+        key = symbol.upper()
+        with self._lock:
+            fundamentals = self._entries.get(key)
+            if fundamentals is not None:
+                self._counts['hits'] += 1
+                return fundamentals
+            self._counts['misses'] += 1
+
+        fundamentals = self._loader(symbol)
+        with self._lock:
+            self._entries[key] = fundamentals
+        return fundamentals
+
+    def refresh(self, symbol: str) -> Dict[str, Any]:
+        """Reload fundamentals for symbol regardless of the cached entry."""
+        fundamentals = self._loader(symbol)
+        with self._lock:
+            self._entries[symbol.upper()] = fundamentals
+        return fundamentals
+
+    def warm(self, symbols: List[str]) -> Dict[str, bool]:
+        """Refresh fundamentals for many symbols in a worker pool.
+
+        Returns whether each symbol was loaded successfully.
+        """
+        def load(symbol: str) -> bool:
+            try:
+                self.refresh(symbol)
+                return True
+            except Exception as e:
+                logger.warning(f"Fundamentals warm-up failed for {symbol}: {str(e)}")
+                return False
+
+        unique_symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        if not unique_symbols:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.warm_workers, len(unique_symbols))) as pool:
+            return dict(zip(unique_symbols, pool.map(load, unique_symbols)))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counts, 'size': len(self._entries)}
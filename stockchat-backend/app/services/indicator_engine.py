@@ -0,0 +1,571 @@
+import copy
+import math
+import threading
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import talib
+
+logger = logging.getLogger(__name__)
+
+NAN = float('nan')
+
+# Output columns, in the order they are added to the price frame
+INDICATOR_COLUMNS = [
+    'Returns', 'MA20', 'MA50', 'MA200', 'RSI',
+    'MACD', 'MACD_Signal', 'MACD_Hist',
+    'BB_Upper', 'BB_Middle', 'BB_Lower',
+    'ATR', 'NATR', 'OBV', 'AD', 'MOM', 'ROC',
+]
+
+
+def _is_zero(value: float) -> bool:
+    """TA-Lib's TA_IS_ZERO."""
+    return -0.00000001 < value < 0.00000001
+
+
+# Streaming indicators. Each one reproduces the recurrence TA-Lib uses in its
+# batch implementation (same seeding, same operation order), so feeding the
+# bars one at a time yields exactly the values of the batch call.
+
+class _SMA:
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+
+    def update(self, value: float) -> float:
+        self.window.append(value)
+        self.total += value
+        if len(self.window) < self.period:
+            return NAN
+        result = self.total / self.period
+        self.total -= self.window.popleft()
+        return result
+
+
+class _EMA:
+    """EMA seeded with the SMA of its first `period` inputs."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.k = 2.0 / (period + 1)
+        self.seed: List[float] = []
+        self.value: Optional[float] = None
+
+    def update(self, value: float) -> float:
+        if self.value is None:
+            self.seed.append(value)
+            if len(self.seed) < self.period:
+                return NAN
+            total = 0.0
+            for seed_value in self.seed:
+                total += seed_value
+            self.value = total / self.period
+            self.seed = []
+            return self.value
+        self.value = ((value - self.value) * self.k) + self.value
+        return self.value
+
+
+class _MACD:
+    """MACD(12, 26, 9).
+
+    TA-Lib aligns both EMAs on the slow one: the fast EMA is seeded with the
+    SMA of the `fast` closes ending at the first slow output, and nothing is
+    emitted until the signal line exists.
+    """
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast_period = fast
+        self.slow_period = slow
+        self.warmup: List[float] = []
+        self.fast = _EMA(fast)
+        self.slow = _EMA(slow)
+        self.signal = _EMA(signal)
+        self.seeded = False
+
+    def update(self, value: float) -> Tuple[float, float, float]:
+        if not self.seeded:
+            self.warmup.append(value)
+            if len(self.warmup) < self.slow_period:
+                return NAN, NAN, NAN
+            for seed_value in self.warmup[-self.fast_period:]:
+                fast = self.fast.update(seed_value)
+            for seed_value in self.warmup:
+                slow = self.slow.update(seed_value)
+            self.warmup = []
+            self.seeded = True
+        else:
+            fast = self.fast.update(value)
+            slow = self.slow.update(value)
+
+        macd = fast - slow
+        signal = self.signal.update(macd)
+        if math.isnan(signal):
+            return NAN, NAN, NAN
+        return macd, signal, macd - signal
+
+
+class _RSI:
+    """Wilder RSI (TA-Lib default, non-Metastock compatibility)."""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev_value: Optional[float] = None
+        self.count = 0
+        self.gain = 0.0
+        self.loss = 0.0
+
+    def update(self, value: float) -> float:
+        if self.prev_value is None:
+            self.prev_value = value
+            return NAN
+        change = value - self.prev_value
+        self.prev_value = value
+        self.count += 1
+
+        if self.count <= self.period:
+            if change < 0:
+                self.loss -= change
+            else:
+                self.gain += change
+            if self.count < self.period:
+                return NAN
+            self.loss /= self.period
+            self.gain /= self.period
+        else:
+            self.loss *= (self.period - 1)
+            self.gain *= (self.period - 1)
+            if change < 0:
+                self.loss -= change
+            else:
+                self.gain += change
+            self.loss /= self.period
+            self.gain /= self.period
+
+        total = self.gain + self.loss
+        return 100.0 * (self.gain / total) if not _is_zero(total) else 0.0
+
+
+class _BBands:
+    """Bollinger Bands(5, 2, 2) on an SMA with population standard deviation."""
+
+    def __init__(self, period: int = 5, nb_dev_up: float = 2.0, nb_dev_down: float = 2.0):
+        self.period = period
+        self.nb_dev_up = nb_dev_up
+        self.nb_dev_down = nb_dev_down
+        self.sma = _SMA(period)
+        self.window = deque()
+        self.total_sq = 0.0
+
+    def update(self, value: float) -> Tuple[float, float, float]:
+        middle = self.sma.update(value)
+        self.window.append(value)
+        self.total_sq += value * value
+        if len(self.window) < self.period:
+            return NAN, NAN, NAN
+        mean_sq = self.total_sq / self.period
+        trailing = self.window.popleft()
+        self.total_sq -= trailing * trailing
+
+        variance = mean_sq - middle * middle
+        std_dev = math.sqrt(variance) if not _is_zero(variance) and variance > 0 else 0.0
+        return (
+            middle + std_dev * self.nb_dev_up,
+            middle,
+            middle - std_dev * self.nb_dev_down,
+        )
+
+
+class _ATR:
+    """Wilder ATR, seeded with the SMA of the first `period` true ranges."""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev_close: Optional[float] = None
+        self.seed: List[float] = []
+        self.value: Optional[float] = None
+
+    def update(self, high: float, low: float, close: float) -> float:
+        if self.prev_close is None:
+            self.prev_close = close
+            return NAN
+        true_range = high - low
+        true_range = max(true_range, abs(self.prev_close - high), abs(low - self.prev_close))
+        self.prev_close = close
+
+        if self.value is None:
+            self.seed.append(true_range)
+            if len(self.seed) < self.period:
+                return NAN
+            total = 0.0
+            for seed_value in self.seed:
+                total += seed_value
+            self.value = total / self.period
+            self.seed = []
+            return self.value
+
+        self.value *= (self.period - 1)
+        self.value += true_range
+        self.value /= self.period
+        return self.value
+
+
+class _Lookback:
+    """Fixed-size history of the last `period` closes, for MOM and ROC."""
+
+    def __init__(self, period: int):
+        self.window = deque(maxlen=period + 1)
+
+    def update(self, value: float) -> Optional[float]:
+        self.window.append(value)
+        if len(self.window) < self.window.maxlen:
+            return None
+        return self.window[0]
+
+
+class IndicatorState:
+    """Recurrence state for the full `get_stock_data` indicator set."""
+
+    def __init__(self):
+        self.returns = _Lookback(1)
+        self.ma20 = _SMA(20)
+        self.ma50 = _SMA(50)
+        self.ma200 = _SMA(200)
+        self.rsi = _RSI(14)
+        self.macd = _MACD(12, 26, 9)
+        self.bbands = _BBands(5, 2.0, 2.0)
+        self.atr = _ATR(14)
+        self.lookback10 = _Lookback(10)
+        self.obv: Optional[float] = None
+        self.ad = 0.0
+        self.prev_close: Optional[float] = None
+
+    def update(self, high: float, low: float, close: float, volume: float) -> Tuple[float, ...]:
+        """Consume one bar and return its indicator values (INDICATOR_COLUMNS order)."""
+        prev_close_1 = self.returns.update(close)
+        if prev_close_1 is None:
+            returns = NAN
+        else:
+            returns = ((close / prev_close_1) - 1.0) * 100.0 if prev_close_1 != 0.0 else 0.0
+
+        macd, macd_signal, macd_hist = self.macd.update(close)
+        bb_upper, bb_middle, bb_lower = self.bbands.update(close)
+
+        atr = self.atr.update(high, low, close)
+        if math.isnan(atr):
+            natr = NAN
+        else:
+            natr = (atr / close) * 100.0 if not _is_zero(close) else 0.0
+
+        if self.obv is None:
+            self.obv = volume
+        elif close > self.prev_close:
+            self.obv += volume
+        elif close < self.prev_close:
+            self.obv -= volume
+        self.prev_close = close
+
+        bar_range = high - low
+        if bar_range > 0.0:
+            self.ad += (((close - low) - (high - close)) / bar_range) * volume
+
+        prev_close_10 = self.lookback10.update(close)
+        if prev_close_10 is None:
+            mom = roc = NAN
+        else:
+            mom = close - prev_close_10
+            roc = ((close / prev_close_10) - 1.0) * 100.0 if prev_close_10 != 0.0 else 0.0
+
+        return (
+            returns,
+            self.ma20.update(close),
+            self.ma50.update(close),
+            self.ma200.update(close),
+            self.rsi.update(close),
+            macd, macd_signal, macd_hist,
+            bb_upper, bb_middle, bb_lower,
+            atr, natr,
+            self.obv, self.ad,
+            mom, roc,
+        )
+
+
+class _Series:
+    """Cached indicator output for one (symbol, interval) series."""
+
+    def __init__(self):
+        self.state = IndicatorState()
+        # State before the last bar, which may still be forming and get revised
+        self.state_before_last: Optional[IndicatorState] = None
+        self.first_index = None
+        self.last_index = None
+        self.prev_bar: Optional[Tuple[float, float, float, float]] = None
+        # Output rows (INDICATOR_COLUMNS) in a buffer with spare capacity, so
+        # new bars are written in place rather than copying the whole output
+        self.values = np.empty((0, len(INDICATOR_COLUMNS)))
+        self.length = 0
+
+    def write(self, position: int, rows: np.ndarray) -> None:
+        """Replace the output from position on with rows."""
+        stop = position + len(rows)
+        if stop > len(self.values):
+            grown = np.empty((max(stop, 2 * len(self.values)), len(INDICATOR_COLUMNS)))
+            grown[:position] = self.values[:position]
+            self.values = grown
+        self.values[position:stop] = rows
+        self.length = stop
+
+    def frame(self, index: pd.Index) -> pd.DataFrame:
+        """The output as a new frame; later writes do not change it."""
+        return pd.DataFrame(self.values[:self.length].copy(), index=index, columns=INDICATOR_COLUMNS)
+
+
+def _bars(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    return (
+        df['High'].to_numpy(dtype=np.float64),
+        df['Low'].to_numpy(dtype=np.float64),
+        df['Close'].to_numpy(dtype=np.float64),
+        df['Volume'].to_numpy(dtype=np.float64),
+    )
+
+
+def _run(state: IndicatorState, high, low, close, volume, start: int, stop: int) -> List[Tuple[float, ...]]:
+    rows = []
+    for i in range(start, stop):
+        rows.append(state.update(high[i], low[i], close[i], volume[i]))
+    return rows
+
+
+# Below this many bars a series is streamed bar by bar: MA200 and the other
+# recurrences are not all past their seeding yet, and streaming is cheap.
+_BATCH_MIN_BARS = 256
+
+
+def _batch_outputs(high, low, close, volume) -> np.ndarray:
+    """INDICATOR_COLUMNS for every bar from the TA-Lib batch functions."""
+    macd, macd_signal, macd_hist = talib.MACD(close, fastperiod=12, slowperiod=26, signalperiod=9)
+    bb_upper, bb_middle, bb_lower = talib.BBANDS(close, timeperiod=5, nbdevup=2.0, nbdevdn=2.0, matype=0)
+    return np.column_stack([
+        talib.ROC(close, timeperiod=1),
+        talib.SMA(close, timeperiod=20),
+        talib.SMA(close, timeperiod=50),
+        talib.SMA(close, timeperiod=200),
+        talib.RSI(close, timeperiod=14),
+        macd, macd_signal, macd_hist,
+        bb_upper, bb_middle, bb_lower,
+        talib.ATR(high, low, close, timeperiod=14),
+        talib.NATR(high, low, close, timeperiod=14),
+        talib.OBV(close, volume),
+        talib.AD(high, low, close, volume),
+        talib.MOM(close, timeperiod=10),
+        talib.ROC(close, timeperiod=10),
+    ])
+
+
+def _seed_window(sma: _SMA, values: List[float]) -> None:
+    sma.window = deque(values)
+    sma.total = 0.0
+    for value in values:
+        sma.total += value
+
+
+def _rsi_averages(rsi: _RSI, closes: List[float]) -> None:
+    """Run the RSI recurrence over closes, without computing its outputs."""
+    period = rsi.period
+    gain = loss = 0.0
+    for i in range(1, len(closes)):
+        change = closes[i] - closes[i - 1]
+        if i > period:
+            loss *= (period - 1)
+            gain *= (period - 1)
+        if change < 0:
+            loss -= change
+        else:
+            gain += change
+        if i >= period:
+            loss /= period
+            gain /= period
+    rsi.prev_value = closes[-1]
+    rsi.count = len(closes) - 1
+    rsi.gain = gain
+    rsi.loss = loss
+
+
+def _seeded_state(high, low, close, volume, outputs: np.ndarray, stop: int) -> IndicatorState:
+    """State after the first `stop` bars, taken from the batch outputs at stop - 1.
+
+    Windowed indicators get the closes they still need. The EMA-type ones
+    get their last value, except the RSI averages, which TA-Lib does not
+    return and are recomputed with a plain loop over the closes.
+    """
+    last = stop - 1
+    columns = {column: outputs[last, i] for i, column in enumerate(INDICATOR_COLUMNS)}
+    closes = close[:stop].tolist()
+    state = IndicatorState()
+
+    state.returns.window.extend(closes[-2:])
+    state.lookback10.window.extend(closes[-11:])
+    for sma in (state.ma20, state.ma50, state.ma200):
+        _seed_window(sma, closes[-(sma.period - 1):])
+    _rsi_averages(state.rsi, closes)
+
+    macd = state.macd
+    macd.seeded = True
+    # The fast EMA is seeded on the closes ending at the first slow output
+    offset = macd.slow_period - macd.fast_period
+    macd.fast.value = float(talib.EMA(close[offset:stop], timeperiod=macd.fast_period)[-1])
+    macd.slow.value = float(talib.EMA(close[:stop], timeperiod=macd.slow_period)[-1])
+    macd.signal.value = float(columns['MACD_Signal'])
+
+    bbands = state.bbands
+    _seed_window(bbands.sma, closes[-(bbands.period - 1):])
+    bbands.window = deque(closes[-(bbands.period - 1):])
+    for value in bbands.window:
+        bbands.total_sq += value * value
+
+    state.atr.prev_close = closes[-1]
+    state.atr.value = float(columns['ATR'])
+    state.obv = float(columns['OBV'])
+    state.ad = float(columns['AD'])
+    state.prev_close = closes[-1]
+    return state
+
+
+def build_series(df: pd.DataFrame) -> _Series:
+    """Compute a series' indicators and state from scratch.
+
+    Long series take their output from the TA-Lib batch calls and seed the
+    streaming state from its tail; later bars streamed from that state
+    match a batch rerun up to floating-point rounding of the window sums.
+    Module-level and picklable, so rebuilds can run in a process pool.
+    """
+    series = _Series()
+    high, low, close, volume = _bars(df)
+    if len(df) >= _BATCH_MIN_BARS:
+        outputs = _batch_outputs(high, low, close, volume)
+        series.state = _seeded_state(high, low, close, volume, outputs, len(df) - 1)
+        series.state_before_last = copy.deepcopy(series.state)
+        _run(series.state, high, low, close, volume, len(df) - 1, len(df))
+    else:
+        rows = _run(series.state, high, low, close, volume, 0, len(df) - 1)
+        series.state_before_last = copy.deepcopy(series.state)
+        rows += _run(series.state, high, low, close, volume, len(df) - 1, len(df))
+        outputs = np.array(rows, dtype=np.float64).reshape(len(rows), len(INDICATOR_COLUMNS))
+    series.write(0, outputs)
+    series.first_index = df.index[0]
+    series.last_index = df.index[-1]
+    series.prev_bar = (high[-2], low[-2], close[-2], volume[-2]) if len(df) > 1 else None
+    return series
+
+
+class IndicatorEngine:
+    """Incremental indicator computation that carries state between requests.
+
+    State is kept per (symbol, interval). When a request arrives with one new
+    bar, only that bar (and the previously last, possibly revised bar) is
+    pushed through the recurrences instead of recomputing the full history.
+    Results match the TA-Lib batch functions. Rebuilds run outside the lock,
+    so one long series does not hold up requests for the others.
+    """
+
+    def __init__(self, max_series: int = 256):
+        self.max_series = max_series
+        self._series: "OrderedDict[Tuple[str, str], _Series]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _can_extend(series: _Series, df: pd.DataFrame) -> Optional[int]:
+        """Return the position of the cached last bar in df if df extends the cached series."""
+        if series.state_before_last is None or df.index[0] != series.first_index:
+            return None
+        position = df.index.searchsorted(series.last_index)
+        if position >= len(df) or df.index[position] != series.last_index or position < 1:
+            return None
+        # The bar before the cached last one was final; if it changed, the
+        # history has been re-adjusted and the state is no longer valid.
+        prev = df.iloc[position - 1]
+        if series.prev_bar != (prev['High'], prev['Low'], prev['Close'], prev['Volume']):
+            return None
+        return position
+
+    def _extend(self, series: _Series, df: pd.DataFrame, position: int) -> None:
+        high, low, close, volume = _bars(df)
+        # Roll back the cached last bar and replay from it
+        series.state = series.state_before_last
+        rows = _run(series.state, high, low, close, volume, position, len(df) - 1)
+        series.state_before_last = copy.deepcopy(series.state)
+        rows += _run(series.state, high, low, close, volume, len(df) - 1, len(df))
+        series.write(position, np.array(rows, dtype=np.float64))
+        series.last_index = df.index[-1]
+        series.prev_bar = (high[-2], low[-2], close[-2], volume[-2])
+
+    def compute(self, symbol: str, interval: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Return the indicator columns for df, reusing state from earlier calls."""
+        key = (symbol.upper(), interval)
+        with self._lock:
+            series = self._series.get(key)
+            position = self._can_extend(series, df) if series is not None else None
+            if position is not None:
+                self._extend(series, df, position)
+                self._touch(key)
+                return series.frame(df.index)
+
+        logger.debug(f"Rebuilding indicator state for {symbol} ({interval})")
+        series = build_series(df)
+        output = series.frame(df.index)
+        with self._lock:
+            self._series[key] = series
+            self._touch(key)
+        return output
+
+    def _touch(self, key: Tuple[str, str]) -> None:
+        self._series.move_to_end(key)
+        while len(self._series) > self.max_series:
+            self._series.popitem(last=False)
+
+    def compute_many(
+        self,
+        interval: str,
+        frames: Dict[str, pd.DataFrame],
+        executor: Optional[Executor] = None
+    ) -> Dict[str, pd.DataFrame]:
+        """compute() for several symbols at once.
+
+        Series that extend their cached state are updated in place; the ones
+        that need a full rebuild are built in parallel on executor (e.g. a
+        process pool), or inline without one.
+        """
+        results: Dict[str, pd.DataFrame] = {}
+        rebuilds: Dict[str, pd.DataFrame] = {}
+        with self._lock:
+            for symbol, df in frames.items():
+                key = (symbol.upper(), interval)
+                series = self._series.get(key)
+                position = self._can_extend(series, df) if series is not None else None
+                if position is None:
+                    rebuilds[symbol] = df
+                    continue
+                self._extend(series, df, position)
+                self._touch(key)
+                results[symbol] = series.frame(df.index)
+
+        if executor is not None and len(rebuilds) > 1:
+            futures = {symbol: executor.submit(build_series, df) for symbol, df in rebuilds.items()}
+            built = {symbol: future.result() for symbol, future in futures.items()}
+        else:
+            built = {symbol: build_series(df) for symbol, df in rebuilds.items()}
+
+        for symbol, series in built.items():
+            results[symbol] = series.frame(rebuilds[symbol].index)
+        with self._lock:
+            for symbol, series in built.items():
+                key = (symbol.upper(), interval)
+                self._series[key] = series
+                self._touch(key)
+        return {symbol: results[symbol] for symbol in frames}
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from app.core.config import settings
+from app.core.concurrency import run_stage
+from .dspy_service import ExtractedInfo
+from .lookback import trim_to_period
+from .serialization import price_data_columns
+from .stock_service import StockService
+
+logger = logging.getLogger(__name__)
+
+# Fields of each pushed bar, named as in stockData so clients can merge them
+LIVE_FIELDS = (
+    'date', 'price', 'open', 'high', 'low', 'volume',
+    'ma20', 'ma50', 'ma200', 'rsi', 'macd', 'macd_signal', 'bb_upper', 'bb_lower',
+)
+VALID_INTERVALS = {'1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h', '1d', '5d', '1wk', '1mo', '3mo'}
+VALID_PERIODS = {'1d', '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max'}
+_SYMBOL = re.compile(r'^[A-Z0-9.\-^=]{1,15}$')
+# Bars remembered per channel to detect revisions of the in-progress bar
+_TRACKED_BARS = 3
+# Window channels fetch (plus the indicator warm-up); the bar store returns
+# any longer range it already holds
+_FETCH_PERIOD = '1y'
+
+_CLOSE = object()
+
+# (symbol, interval): the period only decides which bars a connection gets
+ChannelKey = Tuple[str, str]
+
+
+class LiveConnection:
+    """One client's subscriptions and bounded queue of outgoing messages."""
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # Period of each subscribed channel
+        self.channels: Dict[ChannelKey, str] = {}
+        self.close_reason: Optional[str] = None
+
+    def offer(self, message: str) -> bool:
+        """Queue a message without waiting; a full queue closes the connection."""
+        if self.close_reason is not None:
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.close("slow consumer")
+            return False
+
+    def close(self, reason: str):
+        """Discard queued messages and make the close the next thing sent."""
+        if self.close_reason is not None:
+            return
+        self.close_reason = reason
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_CLOSE)
+
+    async def next_message(self) -> Optional[str]:
+        """The next message to send, or None once the connection is closed."""
+        message = await self.queue.get()
+        return None if message is _CLOSE else message
+
+
+class _Channel:
+    def __init__(self, key: ChannelKey):
+        self.key = key
+        self.subscribers: Set[LiveConnection] = set()
+        self.task: Optional[asyncio.Task] = None
+        # Latest bar, sent to new subscribers right away
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.last: Optional[pd.Timestamp] = None
+        self.sent: Dict[pd.Timestamp, tuple] = {}
+
+
+class LiveQuoteHub:
+    """Fans out live bar updates from one upstream poll per symbol.
+
+    Each subscribed (symbol, interval) has one poll task fetching new bars
+    through the bar store and updating indicators incrementally, however
+    many connections subscribe to it and whatever their periods. Each
+    poll's update is trimmed to each subscribed period and serialized once
+    per period, then queued to the subscribers without waiting; a
+    connection whose queue is full is closed instead of slowing the
+    others. Updates carry only new bars and revisions of recent ones.
+    """
+
+    def __init__(
+        self,
+        poll_seconds: float,
+        send_queue_size: int,
+        max_connections: int,
+        max_symbols_per_connection: int,
+        max_delta_bars: int
+    ):
+        self.poll_seconds = poll_seconds
+        self.send_queue_size = send_queue_size
+        self.max_connections = max_connections
+        self.max_symbols_per_connection = max_symbols_per_connection
+        self.max_delta_bars = max_delta_bars
+        self._connections: Set[LiveConnection] = set()
+        self._channels: Dict[ChannelKey, _Channel] = {}
+        self._counts = {'polls': 0, 'poll_errors': 0, 'messages': 0, 'slow_consumers': 0}
+
+    def connect(self) -> Optional[LiveConnection]:
+        """A new connection, or None at max_connections."""
+        if len(self._connections) >= self.max_connections:
+            return None
+        connection = LiveConnection(self.send_queue_size)
+        self._connections.add(connection)
+        return connection
+
+    def disconnect(self, connection: LiveConnection):
+        for key in list(connection.channels):
+            self.unsubscribe(connection, key)
+        self._connections.discard(connection)
+
+    @staticmethod
+    def channel_key(symbol: str, interval: str = '1d') -> ChannelKey:
+        """Validated channel key; raises ValueError for an unknown symbol format or interval."""
+        symbol = symbol.strip().upper()
+        if not _SYMBOL.match(symbol):
+            raise ValueError(f"Invalid symbol '{symbol}'")
+        if interval not in VALID_INTERVALS:
+            raise ValueError(f"Invalid interval '{interval}'")
+        return symbol, interval
+
+    @staticmethod
+    def check_period(period: str) -> str:
+        """period, or ValueError if it is not a yfinance period."""
+        if period not in VALID_PERIODS:
+            raise ValueError(f"Invalid period '{period}'")
+        return period
+
+    def subscribe(self, connection: LiveConnection, key: ChannelKey, period: str = '1y'):
+        """Add connection to key's channel, starting its poll if it is the first subscriber.
+
+        Subscribing again with another period only changes the period.
+        """
+        if key in connection.channels:
+            connection.channels[key] = period
+            return
+        if len(connection.channels) >= self.max_symbols_per_connection:
+            raise ValueError(f"At most {self.max_symbols_per_connection} subscriptions per connection")
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = self._channels[key] = _Channel(key)
+            channel.task = asyncio.get_running_loop().create_task(self._poll(channel))
+        channel.subscribers.add(connection)
+        connection.channels[key] = period
+        if channel.snapshot is not None:
+            connection.offer(json.dumps(self._message(key, period, [channel.snapshot])))
+
+    def unsubscribe(self, connection: LiveConnection, key: ChannelKey):
+        """Remove connection from key's channel, stopping its poll after the last subscriber."""
+        connection.channels.pop(key, None)
+        channel = self._channels.get(key)
+        if channel is None:
+            return
+        channel.subscribers.discard(connection)
+        if not channel.subscribers:
+            del self._channels[key]
+            channel.task.cancel()
+
+    async def shutdown(self):
+        tasks = [channel.task for channel in self._channels.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._channels.clear()
+
+    @staticmethod
+    def _message(key: ChannelKey, period: str, bars: List[Dict[str, Any]]) -> Dict[str, Any]:
+        symbol, interval = key
+        return {'type': 'bars', 'symbol': symbol, 'period': period, 'interval': interval, 'bars': bars}
+
+    def _publish(self, channel: _Channel, message: str, subscribers: Optional[List[LiveConnection]] = None):
+        for connection in subscribers if subscribers is not None else list(channel.subscribers):
+            if connection.offer(message):
+                self._counts['messages'] += 1
+            elif connection.close_reason == "slow consumer":
+                self._counts['slow_consumers'] += 1
+                logger.info(f"Dropping slow live-quote consumer with {len(connection.channels)} subscriptions")
+                # Stop queueing to it now; the endpoint disconnects it once closed
+                for key in list(connection.channels):
+                    self.unsubscribe(connection, key)
+
+    def _publish_bars(self, channel: _Channel, frame: pd.DataFrame, bars: List[Dict[str, Any]]):
+        """Send bars to each subscriber, trimmed to its period; one serialization per period."""
+        by_period: Dict[str, List[LiveConnection]] = {}
+        for connection in channel.subscribers:
+            by_period.setdefault(connection.channels[channel.key], []).append(connection)
+        for period, subscribers in by_period.items():
+            window = trim_to_period(frame, period)
+            if len(window) == 0:
+                continue
+            trimmed = [bar for bar in bars if pd.Timestamp(bar['time']) >= window.index[0]]
+            if trimmed:
+                self._publish(channel, json.dumps(self._message(channel.key, period, trimmed)), subscribers)
+
+    async def _poll(self, channel: _Channel):
+        symbol, interval = channel.key
+        fetch_info = ExtractedInfo(symbol=symbol, yfinance_period=_FETCH_PERIOD, yfinance_interval=interval)
+        # Indicators over everything fetched; periods are applied per subscriber
+        info = ExtractedInfo(symbol=symbol, yfinance_period='max', yfinance_interval=interval)
+        while True:
+            try:
+                df = await run_stage('history', StockService.fetch_history, fetch_info)
+                frame = await run_stage('indicators', StockService.compute_indicators, info, df)
+                bars = self._changed_bars(channel, frame)
+                self._counts['polls'] += 1
+                if bars:
+                    channel.snapshot = bars[-1]
+                    self._publish_bars(channel, frame, bars)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._counts['poll_errors'] += 1
+                logger.warning(f"Live poll for {symbol} ({interval}) failed: {str(e)}")
+                self._publish(channel, json.dumps({'type': 'error', 'symbol': symbol, 'detail': str(e)}))
+            await asyncio.sleep(self.poll_seconds)
+
+    def _changed_bars(self, channel: _Channel, frame: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Bars newer than the last pushed one, or revised since pushed; only the latest on the first poll."""
+        tail = frame.iloc[-self.max_delta_bars:]
+        columns = price_data_columns(tail)
+        bars = []
+        tracked = {}
+        for i, timestamp in enumerate(tail.index):
+            values = tuple(columns[field][i] for field in LIVE_FIELDS)
+            if i >= len(tail) - _TRACKED_BARS:
+                tracked[timestamp] = values
+            if channel.last is None:
+                changed = i == len(tail) - 1
+            else:
+                changed = timestamp > channel.last or channel.sent.get(timestamp, values) != values
+            if changed:
+                bars.append({'time': timestamp.isoformat(), **dict(zip(LIVE_FIELDS, values))})
+        channel.sent = tracked
+        channel.last = tail.index[-1]
+        return bars
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'connections': len(self._connections),
+            'channels': len(self._channels),
+            'subscriptions': sum(len(channel.subscribers) for channel in self._channels.values()),
+            **self._counts,
+        }
+
+
+live_hub = LiveQuoteHub(
+    poll_seconds=settings.LIVE_POLL_SECONDS,
+    send_queue_size=settings.LIVE_SEND_QUEUE_SIZE,
+    max_connections=settings.LIVE_MAX_CONNECTIONS,
+    max_symbols_per_connection=settings.LIVE_MAX_SYMBOLS_PER_CONNECTION,
+    max_delta_bars=settings.LIVE_MAX_DELTA_BARS
+)
@@ -0,0 +1,201 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+import dspy
+import numpy as np
+from dspy.clients.base_lm import BaseLM
+
+from .llm_scheduler import LLMScheduler, llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Latency samples a member needs before its own percentile sets the hedge delay
+_MIN_HEDGE_SAMPLES = 20
+# Consecutive errors that put a member on cooldown
+_MAX_CONSECUTIVE_ERRORS = 3
+
+
+class PoolMember:
+    """One provider's LM with its recent latencies and error state."""
+
+    def __init__(self, name: str, lm: BaseLM, weight: float = 1.0, window: int = 200):
+        self.name = name
+        self.lm = lm
+        self.weight = weight
+        self._latencies: deque = deque(maxlen=window)
+        self._ewma: Optional[float] = None
+        self._consecutive_errors = 0
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+        self.counts = {'calls': 0, 'errors': 0, 'wins': 0, 'hedges': 0, 'failovers': 0}
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+            self._ewma = latency if self._ewma is None else 0.8 * self._ewma + 0.2 * latency
+            self._consecutive_errors = 0
+            self.counts['calls'] += 1
+
+    def record_error(self, cooldown: float):
+        with self._lock:
+            self.counts['calls'] += 1
+            self.counts['errors'] += 1
+            self._consecutive_errors += 1
+            if self._consecutive_errors >= _MAX_CONSECUTIVE_ERRORS:
+                self._cooldown_until = time.monotonic() + cooldown
+
+    def count(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+    def available(self) -> bool:
+        return time.monotonic() >= self._cooldown_until
+
+    def latency(self) -> Optional[float]:
+        return self._ewma
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < _MIN_HEDGE_SAMPLES:
+                return None
+            return float(np.percentile(self._latencies, q))
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        with self._lock:
+            return {
+                **self.counts,
+                'latency_p50': round(p50, 3) if p50 is not None else None,
+                'latency_p95': round(p95, 3) if p95 is not None else None,
+                'cooling_down': int(time.monotonic() < self._cooldown_until),
+            }
+
+
+class LMPool(dspy.LM):
+    """A DSPy LM spreading calls over several providers' LMs.
+
+    Each call goes to one member, picked at random in proportion to its
+    weight (strategy 'weight') or its weight over its observed latency
+    (strategy 'latency'). If the call is still running after the member's
+    hedge_percentile latency, a duplicate goes to the next member and the
+    first answer wins. A failed call fails over to the next member. Members
+    failing repeatedly sit out for cooldown seconds.
+
+    Every member call, including hedges, takes budget from the scheduler
+    under the member's name, and hedges or failovers are only sent to
+    members with budget available.
+    """
+
+    def __init__(
+        self,
+        members: List[PoolMember],
+        strategy: str = 'latency',
+        hedge_percentile: float = 95,
+        hedge_delay: float = 8.0,
+        cooldown: float = 30.0,
+        max_workers: int = 64,
+        scheduler: LLMScheduler = llm_scheduler
+    ):
+        # A dspy.LM subclass, since DSPy modules only use the chat adapters
+        # for those; the LM's own request settings are never used
+        first = members[0].lm
+        super().__init__(model='pool', model_type=first.model_type, cache=first.cache)
+        self.kwargs = dict(first.kwargs)
+        self.members = members
+        self.strategy = strategy
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.cooldown = cooldown
+        self.scheduler = scheduler
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-pool")
+
+    def _score(self, member: PoolMember) -> float:
+        if self.strategy == 'latency':
+            # Unmeasured members are scored as fast, so they get sampled
+            return member.weight / max(member.latency() or 0.1, 0.1)
+        return member.weight
+
+    def _ranked(self) -> List[PoolMember]:
+        """Members in the order to try: one picked by score, the rest best first, cooling ones last."""
+        healthy = [member for member in self.members if member.available()]
+        cooling = [member for member in self.members if not member.available()]
+        if not healthy:
+            return cooling
+        scores = [self._score(member) for member in healthy]
+        first = random.choices(healthy, weights=scores)[0]
+        rest = sorted((member for member in healthy if member is not first), key=self._score, reverse=True)
+        return [first] + rest + cooling
+
+    def _hedge_after(self, member: PoolMember) -> float:
+        return member.percentile(self.hedge_percentile) or self.hedge_delay
+
+    def _call(self, member: PoolMember, prompt, messages, kwargs) -> List[Any]:
+        start = time.perf_counter()
+        try:
+            outputs = member.lm(prompt=prompt, messages=messages, **kwargs)
+        except Exception:
+            member.record_error(self.cooldown)
+            raise
+        member.record_success(time.perf_counter() - start)
+        return outputs
+
+    def _next_with_budget(self, candidates: List[PoolMember]) -> Optional[PoolMember]:
+        while candidates:
+            member = candidates.pop(0)
+            if self.scheduler.try_acquire(member.name):
+                return member
+        return None
+
+    def __call__(self, prompt=None, messages=None, **kwargs):
+        candidates = self._ranked()
+        primary = self._next_with_budget(list(candidates))
+        if primary is None:
+            # Nobody has budget now: queue for the first choice (may raise LLMBusyError)
+            primary = candidates[0]
+            self.scheduler.acquire(primary.name)
+        candidates = [member for member in candidates if member is not primary]
+
+        started = time.monotonic()
+        hedge_at = started + self._hedge_after(primary)
+        futures: Dict[Future, PoolMember] = {
+            self._executor.submit(self._call, primary, prompt, messages, kwargs): primary
+        }
+        hedged = False
+        last_error: Optional[Exception] = None
+        while futures:
+            timeout = None if hedged or not candidates else max(hedge_at - time.monotonic(), 0)
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                backup = self._next_with_budget(candidates)
+                if backup is not None:
+                    logger.debug(f"Hedging slow {primary.name} call to {backup.name}")
+                    backup.count('hedges')
+                    futures[self._executor.submit(self._call, backup, prompt, messages, kwargs)] = backup
+                continue
+
+            for future in done:
+                member = futures.pop(future)
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    logger.warning(f"LLM call to {member.name} failed: {str(e)}")
+                    last_error = e
+                    continue
+                member.count('wins')
+                return outputs
+
+            if not futures:
+                backup = self._next_with_budget(candidates)
+                if backup is not None:
+                    backup.count('failovers')
+                    futures[self._executor.submit(self._call, backup, prompt, messages, kwargs)] = backup
+        raise last_error
+
+    def stats(self) -> Dict[str, Any]:
+        return {member.name: member.stats() for member in self.members}
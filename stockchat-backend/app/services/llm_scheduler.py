@@ -0,0 +1,177 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator
+
+from app.core.config import settings
+from app.core.metrics import LLM_QUEUE_WAIT, LLM_REJECTED
+
+# Lanes in priority order: a waiter is only served once every lane ahead of
+# it is empty
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+LANES = (INTERACTIVE, BACKGROUND)
+
+_lane: ContextVar[str] = ContextVar('llm_lane', default=INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(lane: str) -> Iterator[None]:
+    """Run LLM calls made in the enclosed block (on this thread or context) in lane."""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class LLMBusyError(Exception):
+    """The provider's LLM budget is exhausted for longer than the caller may wait."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"LLM provider '{provider}' is at capacity, retry in {math.ceil(retry_after)}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class _ProviderQueue:
+    """Token bucket and per-lane FIFO of waiters for one provider."""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waiting: Dict[str, deque] = {lane: deque() for lane in LANES}
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ahead_of(self, lane: str) -> int:
+        """Waiters that will be served before a new arrival in lane."""
+        return sum(len(self.waiting[other]) for other in LANES[:LANES.index(lane) + 1])
+
+    def head(self) -> Any:
+        for lane in LANES:
+            if self.waiting[lane]:
+                return self.waiting[lane][0]
+        return None
+
+    def eta(self, position: int) -> float:
+        """Seconds until the waiter at position (0 = next) gets a token."""
+        return max(0.0, position + 1 - self.tokens) / self.rate
+
+
+class LLMScheduler:
+    """Admission control for LLM calls.
+
+    Each provider has a token bucket refilled at its requests-per-minute
+    rate. Callers wait in priority lanes, interactive ahead of background.
+    A caller whose lane is full, or whose estimated wait exceeds the lane's
+    limit, is rejected at once with LLMBusyError carrying a Retry-After
+    estimate instead of queueing indefinitely.
+    """
+
+    def __init__(
+        self,
+        rates_per_minute: Dict[str, float],
+        burst: int,
+        max_queue: Dict[str, int],
+        max_wait: Dict[str, float]
+    ):
+        self._rates = rates_per_minute
+        self._burst = burst
+        self._max_queue = max_queue
+        self._max_wait = max_wait
+        self._cond = threading.Condition()
+        self._providers: Dict[str, _ProviderQueue] = {}
+
+    def _queue(self, provider: str) -> _ProviderQueue:
+        queue = self._providers.get(provider)
+        if queue is None:
+            rate = self._rates.get(provider, self._rates.get('default', 15))
+            queue = self._providers[provider] = _ProviderQueue(rate, self._burst)
+        return queue
+
+    def _take(self, provider: str, lane: str, now: float) -> bool:
+        # Caller holds self._cond
+        queue = self._queue(provider)
+        queue.refill(now)
+        if queue.ahead_of(lane) == 0 and queue.tokens >= 1:
+            queue.tokens -= 1
+            LLM_QUEUE_WAIT.observe(0.0, provider, lane)
+            return True
+        return False
+
+    def try_acquire(self, provider: str) -> bool:
+        """Take budget for one call only if it is available now; never waits."""
+        with self._cond:
+            return self._take(provider, _lane.get(), time.monotonic())
+
+    def acquire(self, provider: str):
+        """Block until provider has budget for one LLM call in the current lane.
+
+        Raises LLMBusyError when the call cannot start within the lane's
+        wait limit.
+        """
+        lane = _lane.get()
+        start = time.monotonic()
+        with self._cond:
+            if self._take(provider, lane, start):
+                return
+
+            queue = self._queue(provider)
+            ahead = queue.ahead_of(lane)
+            estimate = queue.eta(ahead)
+            if len(queue.waiting[lane]) >= self._max_queue.get(lane, 0) or estimate > self._max_wait.get(lane, 0):
+                LLM_REJECTED.inc(1, provider, lane)
+                raise LLMBusyError(provider, estimate)
+
+            ticket = object()
+            queue.waiting[lane].append(ticket)
+            deadline = start + self._max_wait[lane]
+            try:
+                while True:
+                    now = time.monotonic()
+                    queue.refill(now)
+                    if queue.head() is ticket and queue.tokens >= 1:
+                        queue.tokens -= 1
+                        break
+                    if now >= deadline:
+                        # Overtaken by higher-priority waiters
+                        LLM_REJECTED.inc(1, provider, lane)
+                        raise LLMBusyError(provider, queue.eta(queue.ahead_of(lane)))
+                    timeout = deadline - now
+                    if queue.head() is ticket:
+                        timeout = min(timeout, queue.eta(0))
+                    self._cond.wait(timeout)
+            finally:
+                queue.waiting[lane].remove(ticket)
+                # The next waiter may now be at the head
+                self._cond.notify_all()
+        LLM_QUEUE_WAIT.observe(time.monotonic() - start, provider, lane)
+
+    def stats(self) -> Dict[str, Any]:
+        """Waiters per lane and available tokens, per provider."""
+        with self._cond:
+            now = time.monotonic()
+            result = {}
+            for provider, queue in self._providers.items():
+                queue.refill(now)
+                result[provider] = {
+                    **{lane: len(queue.waiting[lane]) for lane in LANES},
+                    'tokens': round(queue.tokens, 2),
+                }
+            return result
+
+
+llm_scheduler = LLMScheduler(
+    rates_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    burst=settings.LLM_BURST,
+    max_queue=settings.LLM_MAX_QUEUE_DEPTH,
+    max_wait=settings.LLM_MAX_WAIT_SECONDS
+)
@@ -0,0 +1,151 @@
+"""Warm-up planning: how much history the indicators need for a period.
+
+Indicator values inside the requested window only depend on a bounded
+number of earlier bars. Windowed indicators (SMA, Bollinger, MOM/ROC) need
+exactly their lookback. The EMA-based ones (MACD, Wilder RSI/ATR) depend on
+the whole series, but the influence of their seed decays as (1 - alpha)^n,
+so after enough bars the value matches the full-history value within a
+tolerance, measured as a fraction of the seed's initial error.
+
+OBV and AD are cumulative sums, so their levels depend on where the
+fetched range starts, which varies with what the bar store already holds.
+rebase_anchored() re-anchors them at the start of the requested window:
+the values are those of OBV and AD computed over the window alone, the
+same for a given (symbol, period, interval) whatever was fetched.
+"""
+import math
+import re
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from .indicator_engine import INDICATOR_COLUMNS
+
+# Cumulative indicators, re-anchored at the window start instead of warmed up
+ANCHORED_COLUMNS = ('OBV', 'AD')
+
+# Bars per regular trading session for each yfinance interval
+_SESSION_BARS = {
+    '1m': 390, '2m': 195, '5m': 78, '15m': 26, '30m': 13,
+    '60m': 7, '90m': 5, '1h': 7,
+    '1d': 1, '5d': 1 / 5, '1wk': 1 / 5, '1mo': 1 / 21, '3mo': 1 / 63,
+}
+
+# Calendar days per trading session, with a margin for market holidays
+_CALENDAR_DAYS_PER_SESSION = 7 / 5 * 1.1
+# Covers the gap between now and the last bar (weekends, long holidays)
+_SLACK_DAYS = 7
+
+_PERIOD_PATTERN = re.compile(r'^(\d+)(d|wk|mo|y)$')
+
+
+def ema_convergence_bars(alpha: float, tolerance: float) -> int:
+    """Bars until an EMA's seed weight (1 - alpha)^n drops below tolerance."""
+    return math.ceil(math.log(tolerance) / math.log(1 - alpha))
+
+
+def _indicator_warmup(column: str, tolerance: float) -> int:
+    """Bars needed before a window bar for column to match full history."""
+    wilder = 14 + ema_convergence_bars(1 / 14, tolerance)
+    # MACD(12, 26, 9): the signal line starts after 25 + 8 bars; both the
+    # slow EMA and the signal EMA then have to converge.
+    macd = 33 + ema_convergence_bars(2 / 27, tolerance) + ema_convergence_bars(2 / 10, tolerance)
+    return {
+        'Returns': 1,
+        'MA20': 19,
+        'MA50': 49,
+        'MA200': 199,
+        'RSI': wilder,
+        'MACD': macd,
+        'MACD_Signal': macd,
+        'MACD_Hist': macd,
+        'BB_Upper': 4,
+        'BB_Middle': 4,
+        'BB_Lower': 4,
+        'ATR': wilder,
+        'NATR': wilder,
+        'MOM': 10,
+        'ROC': 10,
+    }.get(column, 0)
+
+
+def warmup_bars(tolerance: float, columns: Iterable[str] = INDICATOR_COLUMNS) -> int:
+    """Minimum number of bars before the window for the given indicators."""
+    return max(
+        (_indicator_warmup(column, tolerance) for column in columns if column not in ANCHORED_COLUMNS),
+        default=0
+    )
+
+
+def _sessions_to_calendar_days(sessions: float) -> int:
+    return math.ceil(sessions * _CALENDAR_DAYS_PER_SESSION)
+
+
+def _period_calendar_days(period: str, now: pd.Timestamp) -> int:
+    """Upper bound on the calendar days a yfinance period spans."""
+    if period == 'ytd':
+        return now.dayofyear
+    match = _PERIOD_PATTERN.match(period)
+    if not match:
+        raise ValueError(f"Unsupported period format: {period}")
+    number, unit = int(match.group(1)), match.group(2)
+    if unit == 'd':
+        return _sessions_to_calendar_days(number)
+    return number * {'wk': 7, 'mo': 31, 'y': 366}[unit]
+
+
+def history_start(
+    period: str,
+    interval: str,
+    tolerance: float,
+    now: Optional[pd.Timestamp] = None
+) -> Optional[pd.Timestamp]:
+    """Earliest bar to fetch for period at interval, or None for full history.
+
+    Raises ValueError for periods or intervals it cannot plan.
+    """
+    if period == 'max':
+        return None
+    if interval not in _SESSION_BARS:
+        raise ValueError(f"Unsupported interval: {interval}")
+    now = now if now is not None else pd.Timestamp.now(tz='UTC')
+    warmup_sessions = warmup_bars(tolerance) / _SESSION_BARS[interval]
+    days = _period_calendar_days(period, now) + _sessions_to_calendar_days(warmup_sessions) + _SLACK_DAYS
+    return (now - pd.Timedelta(days=days)).floor('D')
+
+
+def trim_to_period(df: pd.DataFrame, period: str) -> pd.DataFrame:
+    """Keep the bars of df that fall inside period, counted back from the last bar.
+
+    Day periods count trading sessions; the others are calendar offsets.
+    """
+    if period == 'max' or len(df) == 0:
+        return df
+    last = df.index[-1]
+    if period == 'ytd':
+        return df[df.index >= last.normalize().replace(month=1, day=1)]
+    match = _PERIOD_PATTERN.match(period)
+    if not match:
+        raise ValueError(f"Unsupported period format: {period}")
+    number, unit = int(match.group(1)), match.group(2)
+    if unit == 'd':
+        sessions = df.index.normalize().unique()
+        return df[df.index >= sessions[-min(number, len(sessions))]]
+    offset = {'wk': pd.DateOffset(weeks=number), 'mo': pd.DateOffset(months=number), 'y': pd.DateOffset(years=number)}[unit]
+    return df[df.index > last - offset]
+
+
+def rebase_anchored(df: pd.DataFrame, window: pd.DataFrame) -> pd.DataFrame:
+    """window (a trailing slice of df) with OBV and AD as computed from its first bar.
+
+    OBV then starts at the first bar's volume and AD at the first bar's
+    money flow, as TA-Lib's OBV and AD do when run over the window.
+    """
+    if len(window) == 0 or not set(ANCHORED_COLUMNS) <= set(df.columns):
+        return window
+    position = len(df) - len(window)
+    window = window.copy()
+    window['OBV'] -= df['OBV'].iloc[position] - df['Volume'].iloc[position]
+    if position > 0:
+        window['AD'] -= df['AD'].iloc[position - 1]
+    return window
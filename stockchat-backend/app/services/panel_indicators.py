@@ -0,0 +1,199 @@
+"""Indicators over aligned 2D arrays of many symbols (symbols x bars).
+
+Each row holds one symbol's most recent bars, right-aligned so the last
+column is every symbol's last bar; shorter histories are padded with NaN
+on the left. The recurrences follow the seeding of indicator_engine (and
+so of TA-Lib) from each row's first bar, and step through the bars with
+every step vectorized across symbols. Given lookback.warmup_bars() bars,
+the last values match the full-history ones within the warm-up tolerance.
+
+Kept free of app imports: process pool workers import this module.
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+PANEL_COLUMNS = ['High', 'Low', 'Close', 'Volume']
+
+# Screenable fields, computed for the last two bars of each symbol
+PANEL_FIELDS = [
+    'close', 'change_pct', 'volume', 'rel_volume', 'roc', 'rsi',
+    'macd', 'macd_signal', 'macd_hist', 'ma20', 'ma50', 'ma200',
+    'bb_upper', 'bb_middle', 'bb_lower', 'bb_position', 'natr',
+]
+
+
+def first_valid(x: np.ndarray) -> np.ndarray:
+    """Column of each row's first non-NaN value (the row length if none)."""
+    valid = ~np.isnan(x)
+    return np.where(valid.any(axis=1), valid.argmax(axis=1), x.shape[1])
+
+
+def shift(x: np.ndarray, periods: int) -> np.ndarray:
+    """x moved `periods` bars right along each row, NaN-filled."""
+    out = np.full_like(x, np.nan)
+    out[:, periods:] = x[:, :-periods]
+    return out
+
+
+def rolling_mean(x: np.ndarray, period: int) -> np.ndarray:
+    """Mean of each row's last `period` values, NaN until the window is full."""
+    valid = ~np.isnan(x)
+    sums = np.cumsum(np.where(valid, x, 0.0), axis=1)
+    counts = np.cumsum(valid, axis=1)
+    out = np.full_like(x, np.nan)
+    window_sums = sums[:, period - 1:].copy()
+    window_sums[:, 1:] -= sums[:, :-period]
+    window_counts = counts[:, period - 1:].copy()
+    window_counts[:, 1:] -= counts[:, :-period]
+    out[:, period - 1:] = np.where(window_counts == period, window_sums / period, np.nan)
+    return out
+
+
+def _recurrence(x: np.ndarray, period: int, seed: Optional[np.ndarray], step) -> np.ndarray:
+    """Seed each row with the mean of the `period` values ending at its seed column, then apply step."""
+    if seed is None:
+        seed = first_valid(x) + period - 1
+    means = rolling_mean(x, period)
+    out = np.full_like(x, np.nan)
+    value = np.full(len(x), np.nan)
+    start = int(seed.min()) if len(x) else x.shape[1]
+    for t in range(max(start, 0), x.shape[1]):
+        # NaN until the seed, so step leaves rows that have not started alone
+        value = np.where(seed == t, means[:, t], step(value, x[:, t]))
+        out[:, t] = value
+    return out
+
+
+def ema(x: np.ndarray, period: int, seed: Optional[np.ndarray] = None) -> np.ndarray:
+    """EMA seeded with the SMA of its first `period` inputs (or those ending at seed)."""
+    k = 2.0 / (period + 1)
+    return _recurrence(x, period, seed, lambda value, current: ((current - value) * k) + value)
+
+
+def wilder(x: np.ndarray, period: int, seed: Optional[np.ndarray] = None) -> np.ndarray:
+    """Wilder smoothing, seeded like ema()."""
+    return _recurrence(x, period, seed, lambda value, current: (value * (period - 1) + current) / period)
+
+
+def _percent_change(x: np.ndarray, periods: int) -> np.ndarray:
+    previous = shift(x, periods)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(previous != 0.0, ((x / previous) - 1.0) * 100.0, 0.0)
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    change = close - shift(close, 1)
+    gain = np.where(change > 0, change, 0.0)
+    loss = np.where(change < 0, -change, 0.0)
+    gain[np.isnan(change)] = np.nan
+    loss[np.isnan(change)] = np.nan
+    seed = first_valid(close) + period
+    average_gain = wilder(gain, period, seed)
+    average_loss = wilder(loss, period, seed)
+    total = average_gain + average_loss
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(np.abs(total) < 0.00000001, 0.0, 100.0 * (average_gain / total))
+
+
+def macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD, signal and histogram, with both EMAs seeded at the first slow output as TA-Lib does."""
+    seed = first_valid(close) + slow - 1
+    line = ema(close, fast, seed) - ema(close, slow, seed)
+    signal_line = ema(line, signal)
+    line = np.where(np.isnan(signal_line), np.nan, line)
+    return line, signal_line, line - signal_line
+
+
+def bbands(close: np.ndarray, period: int = 5, nb_dev: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Bollinger Bands on an SMA with population standard deviation."""
+    middle = rolling_mean(close, period)
+    variance = rolling_mean(close * close, period) - middle * middle
+    std_dev = np.sqrt(np.where(variance > 0.00000001, variance, 0.0))
+    return middle + std_dev * nb_dev, middle, middle - std_dev * nb_dev
+
+
+def natr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    previous_close = shift(close, 1)
+    true_range = np.maximum(high - low, np.maximum(np.abs(previous_close - high), np.abs(low - previous_close)))
+    atr = wilder(true_range, period, first_valid(close) + period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(np.abs(close) < 0.00000001, 0.0, (atr / close) * 100.0)
+
+
+def panel_metrics(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray) -> Dict[str, np.ndarray]:
+    """PANEL_FIELDS for the last two bars of each row, as (symbols, 2) arrays [previous, latest]."""
+    macd_line, macd_signal, macd_hist = macd(close)
+    bb_upper, bb_middle, bb_lower = bbands(close)
+    average_volume = rolling_mean(volume, 20)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rel_volume = volume / average_volume
+        # Where the close sits in the bands, 0 at the lower and 100 at the upper band
+        bb_position = np.where(bb_upper > bb_lower, (close - bb_lower) / (bb_upper - bb_lower) * 100.0, np.nan)
+    fields = {
+        'close': close,
+        'change_pct': _percent_change(close, 1),
+        'volume': volume,
+        'rel_volume': rel_volume,
+        'roc': _percent_change(close, 10),
+        'rsi': rsi(close),
+        'macd': macd_line,
+        'macd_signal': macd_signal,
+        'macd_hist': macd_hist,
+        'ma20': rolling_mean(close, 20),
+        'ma50': rolling_mean(close, 50),
+        'ma200': rolling_mean(close, 200),
+        'bb_upper': bb_upper,
+        'bb_middle': bb_middle,
+        'bb_lower': bb_lower,
+        'bb_position': bb_position,
+        'natr': natr(high, low, close),
+    }
+    return {name: values[:, -2:] for name, values in fields.items()}
+
+
+def _read_tail(path: str, bars: int) -> Tuple[np.ndarray, Optional[pd.Timestamp]]:
+    """Last `bars` bars with a close, as a (bars, 4) array, and the last one's timestamp."""
+    parquet = pq.ParquetFile(path)
+    # Bar files keep the DatetimeIndex as a column
+    index_column = parquet.schema_arrow.pandas_metadata['index_columns'][0]
+    table = parquet.read(columns=PANEL_COLUMNS + [index_column])
+    values = np.column_stack([
+        table.column(column).to_numpy(zero_copy_only=False).astype(np.float64) for column in PANEL_COLUMNS
+    ])
+    positions = np.flatnonzero(~np.isnan(values[:, PANEL_COLUMNS.index('Close')]))[-bars:]
+    if len(positions) == 0:
+        return values[:0], None
+    return values[positions], pd.Timestamp(table.column(index_column)[int(positions[-1])].as_py())
+
+
+def load_panel(paths: List[str], bars: int) -> Tuple[np.ndarray, List[Optional[pd.Timestamp]]]:
+    """Last `bars` bars of each stored series as a (4, symbols, bars) array in PANEL_COLUMNS order.
+
+    Rows are right-aligned on each series' own last bar, whose timestamp is
+    returned alongside; unreadable or empty files give a NaN row and None.
+    Only the needed columns are read, with pyarrow rather than pandas.
+    """
+    panel = np.full((len(PANEL_COLUMNS), len(paths), bars), np.nan)
+    last = []
+    for row, path in enumerate(paths):
+        try:
+            values, timestamp = _read_tail(path, bars)
+        except Exception as e:
+            logger.warning(f"Skipping unreadable bar file {path}: {str(e)}")
+            last.append(None)
+            continue
+        panel[:, row, bars - len(values):] = values.T
+        last.append(timestamp)
+    return panel, last
+
+
+def screen_chunk(paths: List[str], bars: int) -> Tuple[List[Optional[pd.Timestamp]], Dict[str, np.ndarray]]:
+    """Load a chunk of series and compute their panel metrics; picklable for a process pool."""
+    panel, last = load_panel(paths, bars)
+    return last, panel_metrics(*panel)
@@ -0,0 +1,53 @@
+import math
+import threading
+import time
+from typing import Dict, List, Tuple
+
+# (symbol, yfinance_period, yfinance_interval)
+RequestKey = Tuple[str, str, str]
+
+
+class PopularityTracker:
+    """Exponentially decayed request counts per resolved (symbol, period, interval).
+
+    A request adds 1 to its key's score and scores halve every half_life
+    seconds, so the top keys follow current traffic. At most max_tracked
+    keys are kept; the lowest-scoring ones are dropped first.
+    """
+
+    def __init__(self, half_life: float, max_tracked: int):
+        self._decay = math.log(2) / half_life
+        self._max_tracked = max_tracked
+        self._scores: Dict[RequestKey, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def _score(self, entry: Tuple[float, float], now: float) -> float:
+        score, updated = entry
+        return score * math.exp(-self._decay * (now - updated))
+
+    def record(self, symbol: str, period: str, interval: str):
+        key = (symbol.upper(), period, interval)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._scores.get(key)
+            self._scores[key] = ((self._score(entry, now) if entry else 0.0) + 1.0, now)
+            if len(self._scores) > self._max_tracked:
+                self._prune(now)
+
+    def _prune(self, now: float):
+        # Drop the lowest-scoring tenth in one pass rather than one key per request
+        ranked = sorted(self._scores, key=lambda key: self._score(self._scores[key], now))
+        for key in ranked[:max(1, len(ranked) // 10)]:
+            del self._scores[key]
+
+    def top(self, k: int) -> List[Tuple[RequestKey, float]]:
+        """The k most requested keys with their current scores."""
+        now = time.monotonic()
+        with self._lock:
+            scored = [(key, self._score(entry, now)) for key, entry in self._scores.items()]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'tracked': len(self._scores)}
@@ -0,0 +1,52 @@
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional
+
+from cachetools import LRUCache
+
+# Bar length of intraday intervals
+_INTRADAY_SECONDS = {
+    '1m': 60, '2m': 120, '5m': 300, '15m': 900, '30m': 1800,
+    '60m': 3600, '90m': 5400, '1h': 3600,
+}
+
+
+class PreparedDataCache:
+    """Size-bounded cache of computed price columns and stats per (symbol, period, interval).
+
+    Entries expire after ttl seconds, or for intraday intervals after
+    intraday_ttl seconds (at most one bar), as their last bar keeps moving.
+    get() also misses when the series was updated after the entry's as_of
+    time, e.g. by a live-quote poll or another period of the symbol.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, intraday_ttl: float):
+        self.ttl = ttl
+        self.intraday_ttl = intraday_ttl
+        self._entries: LRUCache = LRUCache(maxsize=max_entries)
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'misses': 0}
+
+    def ttl_for(self, interval: str) -> float:
+        if interval not in _INTRADAY_SECONDS:
+            return self.ttl
+        return min(self.ttl, self.intraday_ttl, _INTRADAY_SECONDS[interval])
+
+    def get(self, key: Hashable, updated: Optional[float] = None) -> Optional[Any]:
+        """Cached value for key, unless expired or older than updated (a wall-clock time)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic() and (updated is None or updated <= entry[2]):
+                self._counts['hits'] += 1
+                return entry[0]
+            self._counts['misses'] += 1
+            return None
+
+    def put(self, key: Hashable, value: Any, interval: str, as_of: float):
+        """Store value, computed from the series as it was at as_of (a wall-clock time taken before reading it)."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_for(interval), as_of)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counts, 'size': len(self._entries)}
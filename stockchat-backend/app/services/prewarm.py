@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+from app.core.config import settings
+from app.core.concurrency import run_stage
+from .dspy_service import ExtractedInfo
+from .llm_scheduler import BACKGROUND, LLMBusyError
+from .stock_service import StockService
+
+logger = logging.getLogger(__name__)
+
+_MARKET_TIMEZONE = "America/New_York"
+
+
+class Prewarmer:
+    """Keeps the most requested symbols' data computed ahead of requests.
+
+    Each run takes the top_k (symbol, period, interval) keys from
+    StockService's popularity tracker and recomputes their bars,
+    indicators and stats into the prepared-data cache, so requests for
+    them are cache reads. Runs go through the same single-flight and stage
+    limiters as requests, at most concurrency keys at a time. With
+    analysis set, missing analyses are generated too, using at most
+    llm_budget LLM calls per run in the background lane; those are not
+    shared with requests, which would otherwise wait in that lane.
+    """
+
+    def __init__(self, top_k: int, concurrency: int, analysis: bool = False, llm_budget: int = 0):
+        self.top_k = top_k
+        self.concurrency = concurrency
+        self.analysis = analysis
+        self.llm_budget = llm_budget
+        self._scheduler: Optional[AsyncIOScheduler] = None
+        self._running = False
+        self._last_run: Dict[str, Any] = {}
+        self._runs = 0
+
+    def start(self, interval_minutes: float, market_open_cron: str):
+        """Schedule periodic runs on the running event loop."""
+        self._scheduler = AsyncIOScheduler(timezone=_MARKET_TIMEZONE)
+        job_options = dict(max_instances=1, coalesce=True, misfire_grace_time=60)
+        self._scheduler.add_job(
+            self.run, IntervalTrigger(minutes=interval_minutes), id="prewarm", **job_options
+        )
+        self._scheduler.add_job(
+            self.run,
+            CronTrigger.from_crontab(market_open_cron, timezone=_MARKET_TIMEZONE),
+            kwargs={'refresh_fundamentals': True},
+            id="prewarm-market-open",
+            **job_options
+        )
+        self._scheduler.start()
+        logger.info(f"Pre-warming top {self.top_k} symbols every {interval_minutes} min and at '{market_open_cron}'")
+
+    def shutdown(self):
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+
+    async def run(self, refresh_fundamentals: bool = False) -> Dict[str, Any]:
+        """Warm the current top keys once; returns a report of what was done."""
+        if self._running:
+            return {'skipped': 'already running'}
+        self._running = True
+        start = time.perf_counter()
+        try:
+            keys = StockService.popular_keys(self.top_k)
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def warm(key):
+                async with semaphore:
+                    return await self._warm_data(key, refresh_fundamentals)
+
+            results = await asyncio.gather(*(warm(key) for key in keys))
+            warmed = [key for key, stats in zip(keys, results) if stats is not None]
+            analyses = await self._warm_analyses([stats for stats in results if stats is not None])
+
+            report = {
+                'warmed': [list(key) for key in warmed],
+                'failed': [list(key) for key, stats in zip(keys, results) if stats is None],
+                'analyses': analyses,
+                'seconds': round(time.perf_counter() - start, 3),
+            }
+            self._last_run = report
+            self._runs += 1
+            logger.info(
+                f"Pre-warmed {len(warmed)}/{len(keys)} keys and {analyses} analyses in {report['seconds']}s"
+            )
+            return report
+        finally:
+            self._running = False
+
+    async def _warm_data(self, key, refresh_fundamentals: bool) -> Optional[Dict[str, Any]]:
+        symbol, period, interval = key
+        try:
+            if refresh_fundamentals:
+                await run_stage('fundamentals', StockService.refresh_fundamentals, symbol)
+            extracted_info = ExtractedInfo(symbol=symbol, yfinance_period=period, yfinance_interval=interval)
+            _, stats = await StockService.shared_stock_data(extracted_info, refresh=True)
+            return stats
+        except Exception as e:
+            logger.warning(f"Pre-warming {symbol} ({period}, {interval}) failed: {str(e)}")
+            return None
+
+    async def _warm_analyses(self, all_stats) -> int:
+        """Generate missing analyses in popularity order within the LLM budget."""
+        if not self.analysis:
+            return 0
+        generated = 0
+        for stats in all_stats:
+            if generated >= self.llm_budget:
+                break
+            if StockService.analysis_is_fresh(stats):
+                continue
+            try:
+                await StockService.shared_analysis(stats, lane=BACKGROUND)
+                generated += 1
+            except LLMBusyError:
+                # Requests need the budget more; try again next run
+                break
+            except Exception as e:
+                logger.warning(f"Pre-warming analysis for {stats['technical'].get('ticker')} failed: {str(e)}")
+        return generated
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'runs': self._runs,
+            'last_warmed': len(self._last_run.get('warmed', [])),
+            'last_failed': len(self._last_run.get('failed', [])),
+            'last_analyses': self._last_run.get('analyses', 0),
+            'last_seconds': self._last_run.get('seconds', 0),
+            **StockService.popularity_stats(),
+        }
+
+
+prewarmer = Prewarmer(
+    top_k=settings.PREWARM_TOP_K,
+    concurrency=settings.PREWARM_CONCURRENCY,
+    analysis=settings.PREWARM_ANALYSIS,
+    llm_budget=settings.PREWARM_LLM_BUDGET
+)
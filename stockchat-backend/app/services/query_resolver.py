@@ -0,0 +1,319 @@
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Company names (and common aliases) -> ticker
+COMPANY_TICKERS: Dict[str, str] = {
+    'apple': 'AAPL',
+    'microsoft': 'MSFT',
+    'nvidia': 'NVDA',
+    'tesla': 'TSLA',
+    'amazon': 'AMZN',
+    'alphabet': 'GOOGL',
+    'google': 'GOOGL',
+    'meta': 'META',
+    'meta platforms': 'META',
+    'facebook': 'META',
+    'netflix': 'NFLX',
+    'advanced micro devices': 'AMD',
+    'intel': 'INTC',
+    'ibm': 'IBM',
+    'oracle': 'ORCL',
+    'salesforce': 'CRM',
+    'adobe': 'ADBE',
+    'cisco': 'CSCO',
+    'qualcomm': 'QCOM',
+    'broadcom': 'AVGO',
+    'texas instruments': 'TXN',
+    'micron': 'MU',
+    'paypal': 'PYPL',
+    'shopify': 'SHOP',
+    'uber': 'UBER',
+    'airbnb': 'ABNB',
+    'spotify': 'SPOT',
+    'palantir': 'PLTR',
+    'coinbase': 'COIN',
+    'berkshire hathaway': 'BRK-B',
+    'berkshire': 'BRK-B',
+    'jpmorgan': 'JPM',
+    'jp morgan': 'JPM',
+    'jpmorgan chase': 'JPM',
+    'bank of america': 'BAC',
+    'wells fargo': 'WFC',
+    'goldman sachs': 'GS',
+    'goldman': 'GS',
+    'morgan stanley': 'MS',
+    'citigroup': 'C',
+    'citi': 'C',
+    'visa': 'V',
+    'mastercard': 'MA',
+    'american express': 'AXP',
+    'amex': 'AXP',
+    'johnson & johnson': 'JNJ',
+    'johnson and johnson': 'JNJ',
+    'pfizer': 'PFE',
+    'moderna': 'MRNA',
+    'merck': 'MRK',
+    'eli lilly': 'LLY',
+    'lilly': 'LLY',
+    'unitedhealth': 'UNH',
+    'abbvie': 'ABBV',
+    'walmart': 'WMT',
+    'costco': 'COST',
+    'target': 'TGT',
+    'home depot': 'HD',
+    'mcdonalds': 'MCD',
+    'mcdonald': 'MCD',
+    'starbucks': 'SBUX',
+    'nike': 'NKE',
+    'coca cola': 'KO',
+    'coca-cola': 'KO',
+    'coke': 'KO',
+    'pepsi': 'PEP',
+    'pepsico': 'PEP',
+    'procter & gamble': 'PG',
+    'procter and gamble': 'PG',
+    'disney': 'DIS',
+    'walt disney': 'DIS',
+    'exxon': 'XOM',
+    'exxonmobil': 'XOM',
+    'exxon mobil': 'XOM',
+    'chevron': 'CVX',
+    'boeing': 'BA',
+    'caterpillar': 'CAT',
+    'general electric': 'GE',
+    'ford': 'F',
+    'general motors': 'GM',
+    'at&t': 'T',
+    'verizon': 'VZ',
+    't-mobile': 'TMUS',
+    'comcast': 'CMCSA',
+    'alibaba': 'BABA',
+    'tsmc': 'TSM',
+    'taiwan semiconductor': 'TSM',
+    'sony': 'SONY',
+    'toyota': 'TM',
+    'asml': 'ASML',
+    's&p 500': 'SPY',
+    's&p': 'SPY',
+    'sp500': 'SPY',
+    'nasdaq 100': 'QQQ',
+    'dow jones': 'DIA',
+    'bitcoin': 'BTC-USD',
+    'ethereum': 'ETH-USD',
+}
+
+# All-caps words that look like tickers but are not
+_NON_TICKER_WORDS = {
+    'I', 'A', 'AI', 'US', 'USA', 'USD', 'CEO', 'CFO', 'ETF', 'IPO', 'PE', 'EPS', 'RSI',
+    'MACD', 'MA', 'ATR', 'OBV', 'YTD', 'EOD', 'ATH', 'NYSE', 'SEC', 'GDP', 'EU', 'UK',
+    'OK', 'TV', 'CPU', 'GPU', 'AND', 'OR', 'THE', 'FOR', 'VS', 'Q1', 'Q2', 'Q3', 'Q4',
+    'SHOW', 'ME', 'HOW', 'IS', 'OF', 'IN', 'ON', 'AT', 'TO', 'BUY', 'SELL', 'HOLD',
+}
+
+# Lowercase tokens that are also tickers; only accepted when they are not words
+_COMMON_WORDS = {
+    'all', 'now', 'cat', 'cost', 'spot', 'coin', 'shop', 'spy', 'dis', 'low', 'key',
+    'big', 'fast', 'well', 'one', 'run', 'are', 'it', 'on', 'a', 'c', 'f', 't', 'v',
+    'ma', 'ms', 'gs', 'ge', 'gm', 'hd', 'ko', 'pg', 'ba', 'mu', 'tm', 'dia', 'crm',
+}
+
+# Valid yfinance periods with their approximate length in days and the
+# interval used for them (matching the extractor's training examples)
+PERIODS: List[Tuple[str, int, str]] = [
+    ('1d', 1, '1m'),
+    ('5d', 5, '1h'),
+    ('1mo', 30, '1d'),
+    ('3mo', 90, '1d'),
+    ('6mo', 180, '1d'),
+    ('1y', 365, '1d'),
+    ('2y', 730, '1d'),
+    ('5y', 1825, '1wk'),
+    ('10y', 3650, '1wk'),
+]
+_PERIOD_INTERVALS = {period: interval for period, _, interval in PERIODS}
+_PERIOD_INTERVALS.update({'ytd': '1d', 'max': '1wk'})
+
+DEFAULT_PERIOD = '1y'
+
+_UNIT_DAYS = {
+    'day': 1, 'd': 1,
+    # A week of data is five trading days
+    'week': 5, 'wk': 5, 'w': 5,
+    'month': 30, 'mo': 30, 'mth': 30,
+    'quarter': 90,
+    'year': 365, 'yr': 365, 'y': 365,
+    'decade': 3650,
+}
+
+_NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'twelve': 12,
+}
+
+_UNIT_PATTERN = r'(day|week|wk|w|month|mo|mth|quarter|year|yr|y|decade|d)s?'
+_WORD_UNIT_PATTERN = r'(day|week|month|quarter|year|decade)s?'
+
+# Phrases mapped directly to a period, checked in order
+_FIXED_PHRASES: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r'\b(ytd|year[\s-]to[\s-]date|this year)\b'), 'ytd'),
+    (re.compile(r'\b(all[\s-]time|max(imum)?|entire history|full history|since (ipo|inception))\b'), 'max'),
+    (re.compile(r'\b(today|intraday|right now|this (morning|afternoon))\b'), '1d'),
+    (re.compile(r'\byesterday\b'), '5d'),
+    (re.compile(r'\bhalf[\s-](a[\s-])?year\b'), '6mo'),
+]
+
+# "6 months", "5d", "two years"; abbreviations only after digits so that
+# words like "and" are not read as "an d(ay)"
+_COUNT_PHRASE = re.compile(
+    r'\b(\d+)[\s-]*' + _UNIT_PATTERN + r'\b'
+    r'|\b(' + '|'.join(_NUMBER_WORDS) + r')[\s-]+' + _WORD_UNIT_PATTERN + r'\b'
+)
+_RELATIVE_PHRASE = re.compile(
+    r'\b(past|last|this|previous|recent|over the)\s+' + _UNIT_PATTERN + r'\b'
+)
+
+# Time expressions the resolver cannot map (explicit dates, ranges)
+_UNPARSED_TIME = re.compile(
+    r'\b(since|from|between|until|before|after|in)\s+(\d{4}|jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)'
+    r'|\b\d{4}-\d{2}-\d{2}\b'
+)
+
+_TOKEN = re.compile(r"[a-z0-9&\-]+")
+_UPPER_TICKER = re.compile(r'(?<![A-Za-z0-9])\$?[A-Z]{1,5}(?:[.-][A-Z]{1,2})?(?![A-Za-z0-9])')
+
+
+class ResolvedQuery(NamedTuple):
+    symbol: str
+    yfinance_period: str
+    yfinance_interval: str
+    confidence: float
+
+
+class ResolvedComparison(NamedTuple):
+    symbols: List[str]
+    yfinance_period: str
+    yfinance_interval: str
+    confidence: float
+
+
+def _tokenize(text: str) -> List[str]:
+    text = text.lower().replace("'s", "").replace("’s", "")
+    return _TOKEN.findall(text)
+
+
+def _period_for_days(days: int) -> str:
+    """Smallest valid yfinance period covering the requested number of days."""
+    for period, period_days, _ in PERIODS:
+        if days <= period_days:
+            return period
+    return 'max'
+
+
+class QueryResolver:
+    """Deterministic parser for common stock queries.
+
+    Tickers are found through a hash index of company-name token sequences
+    plus explicit ticker tokens; time phrases are mapped with regexes to a
+    valid yfinance (period, interval) pair. Each resolution carries a
+    confidence so callers can fall back to the LLM extractor when it is low.
+    """
+
+    def __init__(self, companies: Dict[str, str] = COMPANY_TICKERS):
+        self._names: Dict[Tuple[str, ...], str] = {}
+        for name, ticker in companies.items():
+            self._names[tuple(_tokenize(name))] = ticker
+        self._max_name_tokens = max(len(key) for key in self._names)
+        self._tickers = set(companies.values())
+
+    def _find_symbols(self, query: str) -> Dict[str, float]:
+        """Return candidate symbols with the confidence of each match."""
+        candidates: Dict[str, float] = {}
+
+        def add(symbol: str, confidence: float):
+            candidates[symbol] = max(candidates.get(symbol, 0.0), confidence)
+
+        # Company names, longest match first
+        tokens = _tokenize(query)
+        i = 0
+        while i < len(tokens):
+            for length in range(min(self._max_name_tokens, len(tokens) - i), 0, -1):
+                symbol = self._names.get(tuple(tokens[i:i + length]))
+                if symbol is not None:
+                    add(symbol, 0.95)
+                    i += length
+                    break
+            else:
+                token = tokens[i]
+                if token.upper() in self._tickers and token not in _COMMON_WORDS:
+                    add(token.upper(), 0.9)
+                i += 1
+
+        # Explicit tickers: $AAPL, or all-caps tokens
+        for match in _UPPER_TICKER.findall(query):
+            cashtag = match.startswith('$')
+            symbol = match.lstrip('$').replace('.', '-')
+            if cashtag or symbol in self._tickers:
+                add(symbol, 1.0)
+            elif symbol not in _NON_TICKER_WORDS and len(symbol) >= 2:
+                add(symbol, 0.6)
+        return candidates
+
+    @staticmethod
+    def _find_period(query: str) -> Tuple[str, float]:
+        """Return the yfinance period for the query and the match confidence."""
+        text = query.lower()
+        for pattern, period in _FIXED_PHRASES:
+            if pattern.search(text):
+                return period, 1.0
+
+        match = _COUNT_PHRASE.search(text)
+        if match:
+            if match.group(1):
+                count, unit = int(match.group(1)), match.group(2)
+            else:
+                count, unit = _NUMBER_WORDS[match.group(3)], match.group(4)
+            return _period_for_days(count * _UNIT_DAYS[unit]), 1.0
+
+        match = _RELATIVE_PHRASE.search(text)
+        if match:
+            return _period_for_days(_UNIT_DAYS[match.group(2)]), 1.0
+
+        if _UNPARSED_TIME.search(text):
+            return DEFAULT_PERIOD, 0.4
+        return DEFAULT_PERIOD, 0.9
+
+    def resolve(self, query: str) -> Optional[ResolvedQuery]:
+        """Resolve a query to (symbol, period, interval), or None if no symbol is found."""
+        candidates = self._find_symbols(query)
+        if not candidates:
+            return None
+
+        symbol, symbol_confidence = max(candidates.items(), key=lambda item: item[1])
+        if len(candidates) > 1:
+            # Several different symbols: likely a comparison or a false match
+            symbol_confidence = min(symbol_confidence, 0.3)
+
+        period, period_confidence = self._find_period(query)
+        return ResolvedQuery(
+            symbol=symbol,
+            yfinance_period=period,
+            yfinance_interval=_PERIOD_INTERVALS[period],
+            confidence=round(symbol_confidence * period_confidence, 3),
+        )
+
+    def resolve_comparison(self, query: str, min_symbol_confidence: float = 0.6) -> ResolvedComparison:
+        """Resolve a comparison query to its symbols and one shared (period, interval).
+
+        Symbols below min_symbol_confidence are dropped; the list may be
+        empty if none are found.
+        """
+        candidates = self._find_symbols(query)
+        symbols = [symbol for symbol, confidence in candidates.items() if confidence >= min_symbol_confidence]
+        symbol_confidence = min((candidates[symbol] for symbol in symbols), default=0.0)
+        period, period_confidence = self._find_period(query)
+        return ResolvedComparison(
+            symbols=symbols,
+            yfinance_period=period,
+            yfinance_interval=_PERIOD_INTERVALS[period],
+            confidence=round(symbol_confidence * period_confidence, 3),
+        )
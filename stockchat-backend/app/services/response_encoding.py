@@ -0,0 +1,142 @@
+import gzip
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+import orjson
+import pyarrow as pa
+
+from .serialization import rows_to_columns
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is not offered without the package
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    "application/vnd.apache.arrow.file": ARROW,
+}
+
+# Responses are compressed on the request path, so lower settings than the
+# share responses, which are compressed once when stored
+_GZIP_LEVEL = 5
+_BROTLI_QUALITY = 4
+
+
+class EncodedBody(NamedTuple):
+    content: bytes
+    media_type: str
+    encoding: Optional[str]
+
+
+def available_media_types() -> List[str]:
+    """Supported response media types, in the order preferred on ties."""
+    return [JSON] + ([MSGPACK] if msgpack is not None else []) + [ARROW]
+
+
+def _parse_accept(header: str) -> List[tuple]:
+    entries = []
+    for part in header.split(","):
+        media, *params = [item.strip() for item in part.split(";")]
+        if not media:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        entries.append((_ALIASES.get(media.lower(), media.lower()), q))
+    return entries
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """Best supported media type for an Accept header; JSON if none is acceptable."""
+    if not accept:
+        return JSON
+    entries = _parse_accept(accept)
+    best, best_rank = JSON, (0.0, 0)
+    for media_type in available_media_types():
+        exact = [q for media, q in entries if media == media_type]
+        wildcard = [q for media, q in entries if media in ("*/*", media_type.split("/")[0] + "/*")]
+        # An exact match outranks a wildcard with the same q
+        rank = (max(exact), 1) if exact else ((max(wildcard), 0) if wildcard else (0.0, 0))
+        if rank[0] > 0 and rank > best_rank:
+            best, best_rank = media_type, rank
+    return best
+
+
+def accepted_codings(accept_encoding: Optional[str]) -> Set[str]:
+    """Content codings an Accept-Encoding header allows (q=0 excluded)."""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def _arrow_stream(payload: Dict[str, Any]) -> bytes:
+    """stockData as an Arrow IPC stream (always columnar); other fields as JSON schema metadata."""
+    stock_data = payload["stockData"]
+    columns = rows_to_columns(stock_data) if isinstance(stock_data, list) else stock_data
+    arrays = {}
+    for name, values in columns.items():
+        if name == "date":
+            arrays[name] = pa.array(values, pa.string()).cast(pa.date32())
+        else:
+            arrays[name] = pa.array(values)
+    metadata = {key: orjson.dumps(value) for key, value in payload.items() if key != "stockData"}
+    table = pa.table(arrays).replace_schema_metadata(metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_body(payload: Dict[str, Any], media_type: str) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True, default=str)
+    if media_type == ARROW:
+        return _arrow_stream(payload)
+    # orjson writes NaN as null, where json.dumps would emit invalid JSON
+    return orjson.dumps(payload, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def compress_body(body: bytes, accept_encoding: Optional[str], min_bytes: int) -> tuple:
+    """(body, coding): brotli or gzip, as accepted, for bodies of at least min_bytes."""
+    if len(body) < min_bytes:
+        return body, None
+    accepted = accepted_codings(accept_encoding)
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return brotli.compress(body, quality=_BROTLI_QUALITY), "br"
+    if "gzip" in accepted or "*" in accepted:
+        return gzip.compress(body, compresslevel=_GZIP_LEVEL, mtime=0), "gzip"
+    return body, None
+
+
+def encode_response(
+    payload: Dict[str, Any],
+    accept: Optional[str],
+    accept_encoding: Optional[str],
+    min_compress_bytes: int
+) -> EncodedBody:
+    """Serialize payload in the negotiated media type, compressed if large and accepted.
+
+    Encodes plain dicts and lists directly, without building and validating
+    a response model first.
+    """
+    media_type = negotiate_media_type(accept)
+    content, encoding = compress_body(encode_body(payload, media_type), accept_encoding, min_compress_bytes)
+    return EncodedBody(content, media_type, encoding)
@@ -0,0 +1,295 @@
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.core.concurrency import process_pool
+from .bar_store import BarStore
+from .lookback import warmup_bars
+from .panel_indicators import PANEL_FIELDS, screen_chunk
+from .stock_service import StockService
+
+logger = logging.getLogger(__name__)
+
+COMPARISONS = {
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+CROSSES = ('crosses_above', 'crosses_below')
+
+_INTRADAY_INTERVALS = {'1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h'}
+# Bars before the previous one, so it gets its full warm-up too
+_EXTRA_BARS = 2
+
+
+class _Table:
+    """Latest and previous-bar fields of every loaded symbol for one interval."""
+
+    def __init__(
+        self,
+        latest: pd.DataFrame,
+        previous: pd.DataFrame,
+        mtimes: Dict[str, float],
+        checked: float
+    ):
+        # latest also holds 'as_of', 'last_bar' (UTC) and 'sector'
+        self.latest = latest
+        self.previous = previous
+        self.mtimes = mtimes
+        self.checked = checked
+
+    @classmethod
+    def empty(cls) -> "_Table":
+        latest = pd.DataFrame(columns=PANEL_FIELDS + ['as_of', 'last_bar', 'sector'], dtype=object)
+        return cls(latest, pd.DataFrame(columns=PANEL_FIELDS, dtype=float), {}, -math.inf)
+
+
+class Screener:
+    """Indicator filters and rankings across a universe of locally stored series.
+
+    The universe is every series in the bar store for an interval, or those
+    listed in universe_file when it exists. Each symbol's last bars are
+    loaded into symbols x bars arrays and the indicators computed on whole
+    chunks of symbols at once (panel_indicators), with chunks spread over
+    the process pool. The results for the last two bars are kept per
+    interval, and only files modified since are re-read, at most every
+    refresh_seconds; screens themselves are array comparisons over the
+    kept table. Screens never download bars: symbols get stored by
+    requests, pre-warming or bulk history fetches.
+    """
+
+    def __init__(
+        self,
+        bar_store: BarStore,
+        universe_file: str,
+        refresh_seconds: float,
+        chunk_size: int,
+        max_stale_days: float,
+        max_results: int,
+        tolerance: float
+    ):
+        self.bar_store = bar_store
+        self.universe_file = universe_file
+        self.refresh_seconds = refresh_seconds
+        self.chunk_size = chunk_size
+        self.max_stale_days = max_stale_days
+        self.max_results = max_results
+        self.bars = warmup_bars(tolerance) + _EXTRA_BARS
+        self._tables: Dict[str, _Table] = {}
+        self._universe: Optional[Tuple[float, Dict[str, Optional[str]]]] = None
+        self._lock = threading.Lock()
+        self._counts = {'screens': 0, 'refreshes': 0, 'symbols_loaded': 0, 'load_errors': 0}
+        self._last_refresh_seconds = 0.0
+
+    def _load_universe(self) -> Optional[Dict[str, Optional[str]]]:
+        """Sector by file symbol from the universe file, or None without one."""
+        try:
+            mtime = os.stat(self.universe_file).st_mtime
+        except FileNotFoundError:
+            return None
+        if self._universe is None or self._universe[0] != mtime:
+            df = pd.read_csv(self.universe_file, dtype=str)
+            df.columns = [column.strip().lower() for column in df.columns]
+            sectors = df['sector'] if 'sector' in df.columns else pd.Series(None, index=df.index, dtype=object)
+            self._universe = (mtime, {
+                BarStore.file_symbol(symbol.strip()): sector if isinstance(sector, str) else None
+                for symbol, sector in zip(df['symbol'], sectors)
+                if isinstance(symbol, str) and symbol.strip()
+            })
+            logger.info(f"Loaded screener universe of {len(self._universe[1])} symbols from {self.universe_file}")
+        return self._universe[1]
+
+    def _as_of(self, timestamp: pd.Timestamp, interval: str) -> str:
+        return timestamp.isoformat() if interval in _INTRADAY_INTERVALS else timestamp.strftime('%Y-%m-%d')
+
+    def _load(self, paths: Dict[str, str], interval: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Fields of the last two bars of each series, computed chunk by chunk."""
+        symbols = list(paths)
+        chunks = [symbols[i:i + self.chunk_size] for i in range(0, len(symbols), self.chunk_size)]
+        executor = process_pool() if len(chunks) > 1 else None
+        if executor is not None:
+            futures = [executor.submit(screen_chunk, [paths[symbol] for symbol in chunk], self.bars) for chunk in chunks]
+            results = [future.result() for future in futures]
+        else:
+            results = [screen_chunk([paths[symbol] for symbol in chunk], self.bars) for chunk in chunks]
+
+        last = [timestamp for chunk_last, _ in results for timestamp in chunk_last]
+        fields = {
+            name: np.concatenate([metrics[name] for _, metrics in results]) if results else np.empty((0, 2))
+            for name in PANEL_FIELDS
+        }
+        loaded = np.array([timestamp is not None for timestamp in last], dtype=bool)
+        index = pd.Index(symbols)[loaded]
+        latest = pd.DataFrame({name: values[loaded, 1] for name, values in fields.items()}, index=index)
+        previous = pd.DataFrame({name: values[loaded, 0] for name, values in fields.items()}, index=index)
+        stamps = [timestamp for timestamp in last if timestamp is not None]
+        latest['as_of'] = [self._as_of(timestamp, interval) for timestamp in stamps]
+        latest['last_bar'] = pd.DatetimeIndex(
+            [timestamp.tz_convert('UTC') if timestamp.tzinfo else timestamp.tz_localize('UTC') for timestamp in stamps],
+            dtype='datetime64[ns, UTC]'
+        )
+        self._counts['symbols_loaded'] += len(stamps)
+        self._counts['load_errors'] += len(symbols) - len(stamps)
+        return latest, previous
+
+    def refresh(self, interval: str, force: bool = False) -> _Table:
+        """The interval's table, re-reading series modified since the last refresh."""
+        with self._lock:
+            table = self._tables.get(interval) or _Table.empty()
+            now = time.monotonic()
+            if not force and now - table.checked < self.refresh_seconds:
+                return table
+
+            start = time.perf_counter()
+            stored = self.bar_store.stored_series(interval)
+            universe = self._load_universe()
+            if universe is not None:
+                stored = {symbol: entry for symbol, entry in stored.items() if symbol in universe}
+            changed = {symbol: path for symbol, (path, mtime) in stored.items() if table.mtimes.get(symbol) != mtime}
+            kept = [symbol for symbol in table.latest.index if symbol in stored and symbol not in changed]
+
+            if changed or len(kept) != len(table.latest):
+                latest, previous = self._load(changed, interval)
+                if kept:
+                    latest = pd.concat([table.latest.loc[kept].drop(columns='sector'), latest])
+                    previous = pd.concat([table.previous.loc[kept], previous])
+                latest = latest.sort_index()
+                previous = previous.loc[latest.index]
+            else:
+                latest, previous = table.latest.drop(columns='sector'), table.previous
+            latest['sector'] = [universe.get(symbol) for symbol in latest.index] if universe is not None else None
+
+            table = _Table(latest, previous, {symbol: mtime for symbol, (_, mtime) in stored.items()}, now)
+            self._tables[interval] = table
+            self._counts['refreshes'] += 1
+            self._last_refresh_seconds = time.perf_counter() - start
+            if changed:
+                logger.info(
+                    f"Screener loaded {len(changed)} {interval} series in {self._last_refresh_seconds:.2f}s "
+                    f"({len(latest)} symbols)"
+                )
+            return table
+
+    @staticmethod
+    def _operand(frame: pd.DataFrame, value: Any) -> Any:
+        return frame[value].to_numpy(dtype=np.float64) if isinstance(value, str) else float(value)
+
+    def _matches(self, table: _Table, condition: Dict[str, Any]) -> np.ndarray:
+        field, op, value = condition['field'], condition['op'], condition['value']
+        left = table.latest[field].to_numpy(dtype=np.float64)
+        right = self._operand(table.latest, value)
+        if op in COMPARISONS:
+            return COMPARISONS[op](left, right)
+        previous_left = table.previous[field].to_numpy(dtype=np.float64)
+        previous_right = self._operand(table.previous, value)
+        if op == 'crosses_above':
+            return (previous_left <= previous_right) & (left > right)
+        return (previous_left >= previous_right) & (left < right)
+
+    @staticmethod
+    def _validate(filters: List[Dict[str, Any]], sort_by: Optional[str]):
+        for condition in filters:
+            fields = [condition['field']] + ([condition['value']] if isinstance(condition['value'], str) else [])
+            for field in fields:
+                if field not in PANEL_FIELDS:
+                    raise ValueError(f"Unknown screener field '{field}'; expected one of {', '.join(PANEL_FIELDS)}")
+            if condition['op'] not in COMPARISONS and condition['op'] not in CROSSES:
+                raise ValueError(f"Unknown screener operator '{condition['op']}'")
+        if sort_by is not None and sort_by not in PANEL_FIELDS:
+            raise ValueError(f"Unknown sort field '{sort_by}'; expected one of {', '.join(PANEL_FIELDS)}")
+
+    @staticmethod
+    def _clean(field: str, value: float):
+        if math.isnan(value):
+            return None
+        return int(value) if field == 'volume' else round(float(value), 2)
+
+    def screen(
+        self,
+        interval: str,
+        filters: List[Dict[str, Any]],
+        symbols: Optional[List[str]] = None,
+        sectors: Optional[List[str]] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = True,
+        limit: int = 50
+    ) -> Dict[str, Any]:
+        """Symbols passing every filter, ranked by sort_by (by symbol without one).
+
+        A filter is {"field", "op", "value"}: value is a number or another
+        field, and op a comparison or crosses_above/crosses_below (between
+        the previous and the last bar). Raises ValueError for unknown fields.
+        """
+        self._validate(filters, sort_by)
+        table = self.refresh(interval)
+        self._counts['screens'] += 1
+        latest = table.latest
+
+        mask = np.ones(len(latest), dtype=bool)
+        as_of = None
+        if len(latest) > 0:
+            newest = latest['last_bar'].max()
+            mask &= (latest['last_bar'] >= newest - pd.Timedelta(days=self.max_stale_days)).to_numpy()
+            as_of = latest['as_of'].iloc[int(np.argmax(latest['last_bar'].to_numpy()))]
+        if symbols:
+            mask &= latest.index.isin([BarStore.file_symbol(symbol) for symbol in symbols])
+        if sectors:
+            wanted = {sector.lower() for sector in sectors}
+            mask &= np.array([isinstance(sector, str) and sector.lower() in wanted for sector in latest['sector']], dtype=bool)
+        screened = int(mask.sum())
+        for condition in filters:
+            mask &= self._matches(table, condition)
+
+        matched = np.flatnonzero(mask)
+        matched_count = len(matched)
+        if sort_by is not None:
+            values = latest[sort_by].to_numpy(dtype=np.float64)[matched]
+            # NaN sorts last either way
+            matched = matched[np.argsort(-values if descending else values, kind='stable')]
+        top = matched[:min(limit, self.max_results)]
+
+        rows = latest.iloc[top]
+        results = [
+            {
+                'symbol': symbol,
+                'sector': row['sector'],
+                'as_of': row['as_of'],
+                **{field: self._clean(field, row[field]) for field in PANEL_FIELDS},
+            }
+            for symbol, row in rows.iterrows()
+        ]
+        return {
+            'interval': interval,
+            'as_of': as_of,
+            'universe': screened,
+            'matched': matched_count,
+            'results': results,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counts,
+            'symbols': {interval: len(table.latest) for interval, table in self._tables.items()},
+            'last_refresh_seconds': round(self._last_refresh_seconds, 3),
+        }
+
+
+screener = Screener(
+    bar_store=StockService.get_bar_store(),
+    universe_file=settings.SCREENER_UNIVERSE_FILE,
+    refresh_seconds=settings.SCREENER_REFRESH_SECONDS,
+    chunk_size=settings.SCREENER_CHUNK_SIZE,
+    max_stale_days=settings.SCREENER_MAX_STALE_DAYS,
+    max_results=settings.SCREENER_MAX_RESULTS,
+    tolerance=settings.INDICATOR_WARMUP_TOLERANCE
+)
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import zlib
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Response field -> (source column, value used where the indicator is NaN).
+# A fill of None means the column is never NaN; 'Close' falls back to the
+# bar's close so overlays start on the price line.
+PRICE_FIELDS = {
+    "price": ('Close', None),
+    "open": ('Open', None),
+    "high": ('High', None),
+    "low": ('Low', None),
+    "volume": ('Volume', None),
+    "returns": ('Returns', 0),
+    "ma20": ('MA20', 'Close'),
+    "ma50": ('MA50', 'Close'),
+    "ma200": ('MA200', 'Close'),
+    "atr": ('ATR', 0),
+    "obv": ('OBV', 0),
+    "ad": ('AD', 0),
+    "momentum": ('MOM', 0),
+    "roc": ('ROC', 0),
+    "natr": ('NATR', 0),
+    "rsi": ('RSI', 50),
+    "macd": ('MACD', 0),
+    "macd_signal": ('MACD_Signal', 0),
+    "bb_upper": ('BB_Upper', 'Close'),
+    "bb_lower": ('BB_Lower', 'Close'),
+}
+
+# Fields serialized as integers (truncated like int()); the rest are rounded to 2 decimals
+INTEGER_FIELDS = {"volume", "obv", "ad"}
+
+
+def price_data_columns(df: pd.DataFrame) -> Dict[str, List[Any]]:
+    """Serialize the indicator frame to one list per field plus a date list.
+
+    NaN filling and rounding are done on whole columns instead of per cell in
+    a Python loop over rows.
+    """
+    close = df['Close'].to_numpy(dtype=np.float64)
+    # Wall-clock dates in the exchange timezone; much faster than strftime
+    index = df.index.tz_localize(None) if df.index.tz is not None else df.index
+    dates = np.datetime_as_string(index.to_numpy(dtype='datetime64[ns]'), unit='D')
+    columns: Dict[str, List[Any]] = {"date": dates.tolist()}
+
+    for field, (source, fill) in PRICE_FIELDS.items():
+        values = df[source].to_numpy(dtype=np.float64)
+        if fill is not None:
+            fill_values = close if fill == 'Close' else fill
+            values = np.where(np.isnan(values), fill_values, values)
+        if field in INTEGER_FIELDS:
+            columns[field] = values.astype(np.int64).tolist()
+        else:
+            columns[field] = np.round(values, 2).tolist()
+    return columns
+
+
+def columns_to_rows(columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Convert the columnar price data to the row-oriented response shape."""
+    keys = list(columns.keys())
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+
+def rows_to_columns(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Inverse of columns_to_rows."""
+    if not rows:
+        return {}
+    return {key: [row[key] for row in rows] for key in rows[0]}
+
+
+def pack_columns(price_data: Union[List[Dict[str, Any]], Dict[str, List[Any]]]) -> Tuple[str, bytes]:
+    """Encode price data as compressed columnar JSON.
+
+    Returns the SHA-256 of the canonical encoding along with the blob, so
+    identical series map to the same key whichever shape they came in.
+    """
+    columns = rows_to_columns(price_data) if isinstance(price_data, list) else price_data
+    encoded = json.dumps(columns, separators=(',', ':')).encode()
+    return hashlib.sha256(encoded).hexdigest(), zlib.compress(encoded, 6)
+
+
+def unpack_columns(blob: bytes) -> Dict[str, List[Any]]:
+    """Decode a blob written by pack_columns."""
+    return json.loads(zlib.decompress(blob))
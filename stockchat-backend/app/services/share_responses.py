@@ -0,0 +1,99 @@
+import gzip
+import hashlib
+import json
+import threading
+from typing import Any, Dict, NamedTuple, Optional
+
+from cachetools import LRUCache
+
+from .response_encoding import accepted_codings
+
+try:
+    import brotli
+except ImportError:  # Brotli variants are skipped without the package
+    brotli = None
+
+# Shared analyses never change once created
+SHARE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Compression runs on the first read of a share, before it is cached.
+# Higher levels cost several times the CPU for 2-3% smaller price payloads
+# (brotli 11 takes ~170ms on a one-year share), so both use mid-range
+# settings.
+_GZIP_LEVEL = 6
+_BROTLI_QUALITY = 5
+
+
+class PreparedResponse(NamedTuple):
+    """Final share response bytes in each stored encoding."""
+    etag: str  # Of the identity body
+    # Kept alongside the compressed bodies so identity reads never decompress
+    identity: bytes
+    gzip: bytes
+    brotli: Optional[bytes]
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """Strong ETag of the body in encoding; each coding is a different byte sequence."""
+        if encoding is None:
+            return self.etag
+        opaque = self.etag.strip('"')
+        return f'"{opaque}-{encoding}"'
+
+    def body(self, encoding: Optional[str]) -> bytes:
+        """The body in encoding ('br', 'gzip' or None for identity)."""
+        if encoding == 'br':
+            return self.brotli
+        if encoding == 'gzip':
+            return self.gzip
+        return self.identity
+
+
+def prepare_response(payload: Dict[str, Any]) -> PreparedResponse:
+    """Serialize a share response once and compress it with gzip and brotli."""
+    body = json.dumps(payload, separators=(',', ':'), default=str).encode()
+    return PreparedResponse(
+        etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        identity=body,
+        gzip=gzip.compress(body, compresslevel=_GZIP_LEVEL, mtime=0),
+        brotli=brotli.compress(body, quality=_BROTLI_QUALITY) if brotli is not None else None,
+    )
+
+
+def choose_encoding(accept_encoding: Optional[str], prepared: PreparedResponse) -> Optional[str]:
+    """Best stored encoding the client accepts: brotli, then gzip, else identity."""
+    accepted = accepted_codings(accept_encoding)
+    if prepared.brotli is not None and ("br" in accepted or "*" in accepted):
+        return 'br'
+    if "gzip" in accepted or "*" in accepted:
+        return 'gzip'
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+class ShareResponseCache:
+    """In-process LRU of prepared share responses for hot share IDs."""
+
+    def __init__(self, max_entries: int):
+        self._entries: LRUCache = LRUCache(maxsize=max_entries)
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'misses': 0}
+
+    def get(self, analysis_id: str) -> Optional[PreparedResponse]:
+        with self._lock:
+            prepared = self._entries.get(analysis_id)
+            self._counts['hits' if prepared is not None else 'misses'] += 1
+            return prepared
+
+    def put(self, analysis_id: str, prepared: PreparedResponse) -> None:
+        with self._lock:
+            self._entries[analysis_id] = prepared
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counts, 'size': len(self._entries)}
@@ -2,215 +2,386 @@ from datetime import datetime, timedelta
 import yfinance as yf
 import pandas as pd
 import talib
-from typing import Tuple, List, Dict, Any
+from typing import Tuple, List, Dict, Any, AsyncIterator, Optional, Union
 import numpy as np
 import time
 import logging
-from .dspy_service import DspyService
+import threading
+import asyncio
+from app.core.config import settings
+from app.core.concurrency import run_stage, process_pool
+from app.core.singleflight import SingleFlight
+from app.core.metrics import timed
+from .dspy_service import DspyService, ExtractedInfo, format_fundamental_factors
+from .query_resolver import ResolvedComparison
+from .bar_store import BarStore
+from .indicator_engine import IndicatorEngine
+from .serialization import price_data_columns, columns_to_rows
+from .downsampling import downsample_columns
+from .analysis_cache import AnalysisCache, stats_fingerprint
+from .fundamentals_cache import FundamentalsCache
+from .prepared_data_cache import PreparedDataCache
+from .popularity import PopularityTracker
+from .lookback import history_start, rebase_anchored, trim_to_period
+from .comparison import cross_sectional_metrics
+from .llm_scheduler import INTERACTIVE, LLMBusyError, llm_priority
 
 logger = logging.getLogger(__name__)
 
 class StockService:
-    _dspy_service = DspyService()
+    _dspy_service: DspyService = None
+    _dspy_service_lock = threading.Lock()
+    _bar_store = BarStore()
+    _indicator_engine = IndicatorEngine()
+    _single_flight = SingleFlight()
+    _fundamentals_cache = FundamentalsCache(
+        loader=lambda symbol: StockService._load_fundamentals(symbol),
+        ttl=settings.FUNDAMENTALS_CACHE_TTL_SECONDS,
+        max_entries=settings.FUNDAMENTALS_CACHE_MAX_ENTRIES,
+        warm_workers=settings.FUNDAMENTALS_WARM_WORKERS
+    )
+    _analysis_cache = AnalysisCache(
+        ttl=settings.ANALYSIS_CACHE_TTL_SECONDS,
+        max_entries=settings.ANALYSIS_CACHE_MAX_ENTRIES,
+        stale_ttl=settings.ANALYSIS_CACHE_STALE_SECONDS
+    )
+    _prepared_cache = PreparedDataCache(
+        ttl=settings.PREPARED_DATA_TTL_SECONDS,
+        max_entries=settings.PREPARED_DATA_MAX_ENTRIES,
+        intraday_ttl=settings.PREPARED_DATA_INTRADAY_TTL_SECONDS
+    )
+    _popularity = PopularityTracker(
+        half_life=settings.PREWARM_HALF_LIFE_HOURS * 3600,
+        max_tracked=settings.PREWARM_MAX_TRACKED
+    )
 
     @staticmethod
-    def _period_to_days(period: str) -> int:
-        """Convert yfinance period string to number of days."""
-        if period == 'max':
+    def get_dspy_service() -> DspyService:
+        """Return the shared DspyService, constructing it on first use."""
+        if StockService._dspy_service is None:
+            with StockService._dspy_service_lock:
+                if StockService._dspy_service is None:
+                    StockService._dspy_service = DspyService()
+        return StockService._dspy_service
+
+    @staticmethod
+    def extraction_stats() -> Dict[str, Any]:
+        """The DspyService's extraction counters, or zeros before it is built (never builds it)."""
+        dspy_service = StockService._dspy_service
+        if dspy_service is None:
+            return {'resolver': 0, 'llm': 0, 'total': 0, 'resolver_hit_rate': 0.0}
+        return dspy_service.extraction_stats()
+
+    @staticmethod
+    def cache_stats() -> Dict[str, Any]:
+        """Counters of the shared caches and single-flight."""
+        return {
+            "singleflight": StockService._single_flight.stats(),
+            "analysis_cache": StockService._analysis_cache.stats(),
+            "fundamentals_cache": StockService._fundamentals_cache.stats(),
+            "prepared_data_cache": StockService._prepared_cache.stats(),
+        }
+
+    @staticmethod
+    def get_bar_store() -> BarStore:
+        """Return the shared bar store."""
+        return StockService._bar_store
+
+    @staticmethod
+    def popular_keys(k: int) -> List[Tuple[str, str, str]]:
+        """The k most requested (symbol, period, interval) keys, most popular first."""
+        return [key for key, _ in StockService._popularity.top(k)]
+
+    @staticmethod
+    def popularity_stats() -> Dict[str, Any]:
+        return StockService._popularity.stats()
+
+    @staticmethod
+    def analysis_is_fresh(stats: Dict[str, Any]) -> bool:
+        """Whether a fresh analysis for stats is cached."""
+        return StockService._analysis_cache.is_fresh(stats)
+
+    @staticmethod
+    def refresh_fundamentals(symbol: str):
+        """Reload a symbol's cached fundamentals."""
+        return StockService._fundamentals_cache.refresh(symbol)
+
+    @staticmethod
+    def warm_fundamentals(symbols: List[str]) -> Dict[str, bool]:
+        """Refresh cached fundamentals for symbols in the warm pool; success by symbol."""
+        return StockService._fundamentals_cache.warm(symbols)
+
+    @staticmethod
+    def extract_stock_info(query: str) -> ExtractedInfo:
+        """Stage: resolve the query to a symbol and yfinance period/interval."""
+        return StockService.get_dspy_service().extract_stock_info(query)
+
+    @staticmethod
+    def fetch_history(extracted_info: ExtractedInfo) -> pd.DataFrame:
+        """Stage: load the price history the requested period and its indicators need."""
+        ticker = yf.Ticker(extracted_info.symbol)
+
+        # Fetch the window plus the indicator warm-up instead of the full
+        # history; the bar store only downloads bars newer than what it
+        # already holds
+        df = StockService._bar_store.get_history(
+            ticker,
+            interval=extracted_info.yfinance_interval,
+            start=StockService._history_start(extracted_info.yfinance_period, extracted_info.yfinance_interval)
+        )
+        StockService._validate_history(extracted_info.symbol, df)
+        return df
+
+    @staticmethod
+    def _history_start(period: str, interval: str) -> Optional[pd.Timestamp]:
+        """First bar to fetch for period, or None for the full history."""
+        if not settings.BOUNDED_HISTORY_FETCH:
+            return None
+        try:
+            return history_start(period, interval, settings.INDICATOR_WARMUP_TOLERANCE)
+        except ValueError as e:
+            logger.warning(f"{str(e)}. Fetching full history.")
             return None
+
+    @staticmethod
+    def _validate_history(symbol: str, df: pd.DataFrame) -> None:
+        if len(df) == 0:
+            logger.error(f"No data available for {symbol}")
+            raise ValueError(f"No data available for {symbol}")
+
+        if len(df) < 20:  # Minimum data needed for calculations
+            logger.warning(f"Insufficient data for {symbol}: only {len(df)} days available")
+            raise ValueError(f"Insufficient historical data for {symbol}")
+
+    @staticmethod
+    def fetch_fundamentals(symbol: str) -> Dict[str, Any]:
+        """Stage: fundamentals from ticker.info, served from the TTL cache."""
+        try:
+            return StockService._fundamentals_cache.get(symbol)
+        except Exception as e:
+            logger.warning(f"Failed to get ticker info: {str(e)}")
+            return StockService._fundamentals_from_info({})
+
+    @staticmethod
+    def _load_fundamentals(symbol: str) -> Dict[str, Any]:
+        with timed('ticker_info'):
+            info = yf.Ticker(symbol).info
+        logger.debug(f"Fetched ticker info for {symbol} ({len(info)} fields)")
+        return StockService._fundamentals_from_info(info)
+
+    @staticmethod
+    def _fundamentals_from_info(info: Dict[str, Any]) -> Dict[str, Any]:
+        """Pick the fundamental metrics used in stats from a ticker.info dict."""
+        return {
+            'marketCap': info.get('marketCap', None),
+            'sector': info.get('sector', 'N/A'),
+            'industry': info.get('industry', 'N/A'),
+            'trailingPE': info.get('trailingPE', None),
+            'forwardPE': info.get('forwardPE', None),
+            'priceToBook': info.get('priceToBook', None),
+            'beta': info.get('beta', None),
+            'dividendYield': info.get('dividendYield', 0) * 100 if info.get('dividendYield') else None,
+            'trailingEps': info.get('trailingEps', None),
+            'forwardEps': info.get('forwardEps', None),
+            'profitMargins': info.get('profitMargins', 0) * 100 if info.get('profitMargins') else None,
+            'operatingMargins': info.get('operatingMargins', 0) * 100 if info.get('operatingMargins') else None
+        }
+
+    @staticmethod
+    def compute_indicators(extracted_info: ExtractedInfo, df: pd.DataFrame) -> pd.DataFrame:
+        """Stage: add indicator columns and trim to the requested period."""
+        # Calculate all technical indicators on the fetched range. The engine
+        # keeps per-series state, so only newly arrived bars are computed;
+        # values match the TA-Lib batch functions (ROC, SMA, RSI, MACD,
+        # BBANDS, ATR, NATR, OBV, AD, MOM).
+        with timed('talib'):
+            indicators = StockService._indicator_engine.compute(
+                extracted_info.symbol,
+                extracted_info.yfinance_interval,
+                df
+            )
+        return StockService._trim_to_period(pd.concat([df, indicators], axis=1), extracted_info.yfinance_period)
+
+    @staticmethod
+    def _trim_to_period(df: pd.DataFrame, period: str) -> pd.DataFrame:
+        # Trim to the requested period after all calculations are done, with
+        # the cumulative indicators counted from the window start
+        try:
+            return rebase_anchored(df, trim_to_period(df, period))
+        except ValueError as e:
+            logger.warning(f"Invalid period format: {period}. Using all available data.")
+            return df
+
+    @staticmethod
+    def build_stats(
+        extracted_info: ExtractedInfo,
+        df: pd.DataFrame,
+        fundamentals: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Stage: summary statistics and trend from the trimmed indicator frame."""
+        # Calculate summary statistics
+        latest_data = df.iloc[-1]
+        prev_day_data = df.iloc[-2]
+
+        # Update technical metrics dictionary
+        stats = {
+            'technical': {
+                # Price metrics (from yfinance)
+                'current_price': round(latest_data['Close'], 2),
+                'daily_change': round(latest_data['Close'] - prev_day_data['Close'], 2),
+                
+                # Returns (TA-Lib ROC)
+                'daily_return': round(latest_data['Returns'], 2) if not pd.isna(latest_data['Returns']) else 0,
+                'yearly_return': round(latest_data['ROC'], 2) if not pd.isna(latest_data['ROC']) else 0,
+                
+                # Volume metrics (combination of yfinance and TA-Lib)
+                'daily_volume': int(latest_data['Volume']),
+                'obv': int(latest_data['OBV']),  # On Balance Volume
+                'ad_line': int(latest_data['AD']),  # Accumulation/Distribution Line
+                
+                # Volatility metrics (TA-Lib)
+                'atr': round(latest_data['ATR'], 2),  # Average True Range
+                'natr': round(latest_data['NATR'], 2),  # Normalized ATR
+                
+                # Momentum indicators (TA-Lib)
+                'momentum': round(latest_data['MOM'], 2),
+                'roc': round(latest_data['ROC'], 2),
+                'rsi': round(latest_data['RSI'], 2),
+                
+                # Moving Averages (TA-Lib)
+                'ma20': round(latest_data['MA20'], 2),
+                'ma50': round(latest_data['MA50'], 2),
+                'ma200': round(latest_data['MA200'], 2),
+                
+                # MACD (TA-Lib)
+                'macd': round(latest_data['MACD'], 2),
+                'macd_signal': round(latest_data['MACD_Signal'], 2),
+                'macd_hist': round(latest_data['MACD_Hist'], 2),
+                
+                # Bollinger Bands (TA-Lib)
+                'bb_upper': round(latest_data['BB_Upper'], 2),
+                'bb_middle': round(latest_data['BB_Middle'], 2),
+                'bb_lower': round(latest_data['BB_Lower'], 2),
+                
+                # Price extremes (from yfinance data)
+                'yearly_high': round(df['High'].max(), 2),
+                'yearly_low': round(df['Low'].min(), 2),
+                
+                # Metadata
+                'ticker': extracted_info.symbol,
+                'interval': extracted_info.yfinance_interval,
+                'as_of': df.index[-1].strftime('%Y-%m-%d'),
+            },
+            'fundamental': fundamentals
+        }
         
-        number = int(period[:-1])  # Get the number part
-        unit = period[-1]  # Get the unit (d, mo, y, etc)
+        # Determine trend based on multiple TA-Lib indicators
+        is_bullish = (
+            (latest_data['MA50'] > latest_data['MA200']) and  # Long-term trend
+            (latest_data['MACD'] > latest_data['MACD_Signal']) and  # Momentum
+            (latest_data['RSI'] > 50) and  # RSI above midpoint
+            (latest_data['Close'] > latest_data['BB_Middle'])  # Price above BB middle
+        )
         
-        if unit == 'd':
-            return number
-        elif unit == 'w':
-            return number * 7
-        elif unit == 'mo':
-            return number * 30
-        elif unit == 'y':
-            return number * 365
-        else:
-            raise ValueError(f"Unsupported period format: {period}")
+        # Calculate trend strength using multiple indicators
+        ma_trend_strength = abs(latest_data['MA50'] - latest_data['MA200']) / latest_data['MA200'] * 100
+        rsi_strength = abs(latest_data['RSI'] - 50)
+        macd_strength = abs(latest_data['MACD_Hist']) / latest_data['Close'] * 100
+        
+        trend_strength = (ma_trend_strength + rsi_strength + macd_strength) / 3
+
+        stats['technical'].update({
+            'trend': "bullish" if is_bullish else "bearish",
+            'trend_strength': round(trend_strength, 2),
+        })
+        return stats
+
+    @staticmethod
+    def format_price_data(
+        df: pd.DataFrame,
+        columnar: bool = False,
+        max_points: Optional[int] = None
+    ) -> Union[List[Dict[str, Any]], Dict[str, List[Any]]]:
+        """Stage: serialize the trimmed indicator frame for the response."""
+        with timed('serialize'):
+            price_columns = price_data_columns(df)
+        return StockService._shape_price_data(price_columns, columnar, max_points)
+
+    @staticmethod
+    def _shape_price_data(
+        price_columns: Dict[str, List[Any]],
+        columnar: bool,
+        max_points: Optional[int] = None
+    ) -> Union[List[Dict[str, Any]], Dict[str, List[Any]]]:
+        """Downsample columnar price data to max_points and convert it to rows unless columnar."""
+        with timed('serialize'):
+            if max_points:
+                price_columns = downsample_columns(price_columns, max_points)
+            if not columnar:
+                return columns_to_rows(price_columns)
+            return price_columns
 
     @staticmethod
-    def get_stock_data(query: str = "Show me Apple stock") -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-        # Extract stock info using DSPy
-        extracted_info = StockService._dspy_service.extract_stock_info(query)
+    def _prepare_response(
+        extracted_info: ExtractedInfo,
+        df: pd.DataFrame,
+        fundamentals: Dict[str, Any],
+        columnar: bool
+    ) -> Tuple[Union[List[Dict[str, Any]], Dict[str, List[Any]]], Dict[str, Any]]:
+        df = StockService.compute_indicators(extracted_info, df)
+        stats = StockService.build_stats(extracted_info, df, fundamentals)
+        return StockService.format_price_data(df, columnar), stats
+
+    @staticmethod
+    def get_stock_data(
+        query: str = "Show me Apple stock",
+        columnar: bool = False
+    ) -> Tuple[Union[List[Dict[str, Any]], Dict[str, List[Any]]], Dict[str, Any]]:
+        """Fetch price data and statistics for the stock named in the query.
+
+        Price data is returned as a list of row dicts, or as one list per
+        field (plus a 'date' list) when columnar is True. This runs every
+        stage on the calling thread; use get_stock_data_async from the API.
+        """
+        extracted_info = StockService.extract_stock_info(query)
         
         try:
-            # Create ticker instance with extracted symbol
-            ticker = yf.Ticker(extracted_info.symbol)
-            
-            # Always get max data for accurate calculations
-            df = ticker.history(
-                period='max',  # Always get max data
-                interval=extracted_info.yfinance_interval
+            df = StockService.fetch_history(extracted_info)
+            fundamentals = StockService.fetch_fundamentals(extracted_info.symbol)
+            return StockService._prepare_response(extracted_info, df, fundamentals, columnar)
+
+        except Exception as e:
+            logger.exception(f"Error fetching stock data: {str(e)}")
+            raise
+
+    @staticmethod
+    async def get_stock_data_async(
+        query: str = "Show me Apple stock",
+        columnar: bool = False
+    ) -> Tuple[Union[List[Dict[str, Any]], Dict[str, List[Any]]], Dict[str, Any]]:
+        """Non-blocking get_stock_data.
+
+        Each stage runs in a worker thread under its own concurrency limit,
+        and the history and fundamentals fetches run concurrently.
+        """
+        extracted_info = await run_stage('extract', StockService.extract_stock_info, query)
+        return await StockService._fetch_stock_data_async(extracted_info, columnar)
+
+    @staticmethod
+    async def _fetch_stock_data_async(
+        extracted_info: ExtractedInfo,
+        columnar: bool
+    ) -> Tuple[Union[List[Dict[str, Any]], Dict[str, List[Any]]], Dict[str, Any]]:
+        try:
+            df, fundamentals = await asyncio.gather(
+                run_stage('history', StockService.fetch_history, extracted_info),
+                run_stage('fundamentals', StockService.fetch_fundamentals, extracted_info.symbol)
             )
-            
-            if len(df) == 0:
-                logger.error(f"No data available for {extracted_info.symbol}")
-                raise ValueError(f"No data available for {extracted_info.symbol}")
-
-            if len(df) < 20:  # Minimum data needed for calculations
-                logger.warning(f"Insufficient data for {extracted_info.symbol}: only {len(df)} days available")
-                raise ValueError(f"Insufficient historical data for {extracted_info.symbol}")
-
-            # Calculate all technical indicators on full dataset
-            df['Returns'] = talib.ROC(df['Close'], timeperiod=1)
-            df['MA20'] = talib.SMA(df['Close'], timeperiod=20)
-            df['MA50'] = talib.SMA(df['Close'], timeperiod=50)
-            df['MA200'] = talib.SMA(df['Close'], timeperiod=200)
-            
-            # Additional TA-Lib indicators
-            df['RSI'] = talib.RSI(df['Close'], timeperiod=14)
-            df['MACD'], df['MACD_Signal'], df['MACD_Hist'] = talib.MACD(df['Close'])
-            df['BB_Upper'], df['BB_Middle'], df['BB_Lower'] = talib.BBANDS(df['Close'])
-            
-            # Volatility indicators
-            df['ATR'] = talib.ATR(df['High'], df['Low'], df['Close'], timeperiod=14)
-            df['NATR'] = talib.NATR(df['High'], df['Low'], df['Close'], timeperiod=14)
-            
-            # Volume indicators
-            df['OBV'] = talib.OBV(df['Close'], df['Volume'])
-            df['AD'] = talib.AD(df['High'], df['Low'], df['Close'], df['Volume'])
-            
-            # Momentum indicators
-            df['MOM'] = talib.MOM(df['Close'], timeperiod=10)
-            df['ROC'] = talib.ROC(df['Close'], timeperiod=10)
-
-            # Trim to the requested period after all calculations are done
-            if extracted_info.yfinance_period != 'max':
-                try:
-                    days = StockService._period_to_days(extracted_info.yfinance_period)
-                    if days is not None:  # Skip if period is 'max'
-                        df = df.tail(days)
-                except ValueError as e:
-                    logger.warning(f"Invalid period format: {extracted_info.yfinance_period}. Using all available data.")
-
-            # Calculate summary statistics
-            latest_data = df.iloc[-1]
-            prev_day_data = df.iloc[-2]
-            
-            # Get fundamental data with retry logic
-            try:
-                info = ticker.info
-                logger.info(f"Ticker info: {info}")
-            except Exception as e:
-                logger.warning(f"Failed to get ticker info: {str(e)}")
-                info = {}
-
-            # Update technical metrics dictionary
-            stats = {
-                'technical': {
-                    # Price metrics (from yfinance)
-                    'current_price': round(latest_data['Close'], 2),
-                    'daily_change': round(latest_data['Close'] - prev_day_data['Close'], 2),
-                    
-                    # Returns (TA-Lib ROC)
-                    'daily_return': round(latest_data['Returns'], 2) if not pd.isna(latest_data['Returns']) else 0,
-                    'yearly_return': round(latest_data['ROC'], 2) if not pd.isna(latest_data['ROC']) else 0,
-                    
-                    # Volume metrics (combination of yfinance and TA-Lib)
-                    'daily_volume': int(latest_data['Volume']),
-                    'obv': int(latest_data['OBV']),  # On Balance Volume
-                    'ad_line': int(latest_data['AD']),  # Accumulation/Distribution Line
-                    
-                    # Volatility metrics (TA-Lib)
-                    'atr': round(latest_data['ATR'], 2),  # Average True Range
-                    'natr': round(latest_data['NATR'], 2),  # Normalized ATR
-                    
-                    # Momentum indicators (TA-Lib)
-                    'momentum': round(latest_data['MOM'], 2),
-                    'roc': round(latest_data['ROC'], 2),
-                    'rsi': round(latest_data['RSI'], 2),
-                    
-                    # Moving Averages (TA-Lib)
-                    'ma20': round(latest_data['MA20'], 2),
-                    'ma50': round(latest_data['MA50'], 2),
-                    'ma200': round(latest_data['MA200'], 2),
-                    
-                    # MACD (TA-Lib)
-                    'macd': round(latest_data['MACD'], 2),
-                    'macd_signal': round(latest_data['MACD_Signal'], 2),
-                    'macd_hist': round(latest_data['MACD_Hist'], 2),
-                    
-                    # Bollinger Bands (TA-Lib)
-                    'bb_upper': round(latest_data['BB_Upper'], 2),
-                    'bb_middle': round(latest_data['BB_Middle'], 2),
-                    'bb_lower': round(latest_data['BB_Lower'], 2),
-                    
-                    # Price extremes (from yfinance data)
-                    'yearly_high': round(df['High'].max(), 2),
-                    'yearly_low': round(df['Low'].min(), 2),
-                    
-                    # Metadata
-                    'ticker': extracted_info.symbol,
-                },
-                'fundamental': {
-                    'marketCap': info.get('marketCap', None),
-                    'sector': info.get('sector', 'N/A'),
-                    'industry': info.get('industry', 'N/A'),
-                    'trailingPE': info.get('trailingPE', None),
-                    'forwardPE': info.get('forwardPE', None),
-                    'priceToBook': info.get('priceToBook', None),
-                    'beta': info.get('beta', None),
-                    'dividendYield': info.get('dividendYield', 0) * 100 if info.get('dividendYield') else None,
-                    'trailingEps': info.get('trailingEps', None),
-                    'forwardEps': info.get('forwardEps', None),
-                    'profitMargins': info.get('profitMargins', 0) * 100 if info.get('profitMargins') else None,
-                    'operatingMargins': info.get('operatingMargins', 0) * 100 if info.get('operatingMargins') else None
-                }
-            }
-            
-            # Determine trend based on multiple TA-Lib indicators
-            is_bullish = (
-                (latest_data['MA50'] > latest_data['MA200']) and  # Long-term trend
-                (latest_data['MACD'] > latest_data['MACD_Signal']) and  # Momentum
-                (latest_data['RSI'] > 50) and  # RSI above midpoint
-                (latest_data['Close'] > latest_data['BB_Middle'])  # Price above BB middle
+            return await run_stage(
+                'indicators',
+                StockService._prepare_response,
+                extracted_info, df, fundamentals, columnar
             )
-            
-            # Calculate trend strength using multiple indicators
-            ma_trend_strength = abs(latest_data['MA50'] - latest_data['MA200']) / latest_data['MA200'] * 100
-            rsi_strength = abs(latest_data['RSI'] - 50)
-            macd_strength = abs(latest_data['MACD_Hist']) / latest_data['Close'] * 100
-            
-            trend_strength = (ma_trend_strength + rsi_strength + macd_strength) / 3
-
-            stats['technical'].update({
-                'trend': "bullish" if is_bullish else "bearish",
-                'trend_strength': round(trend_strength, 2),
-            })
-            
-            # Format price data
-            price_data = []
-            for date, row in df.iterrows():
-                price_data.append({
-                    "date": date.strftime("%Y-%m-%d"),
-                    "price": round(float(row['Close']), 2),
-                    "open": round(float(row['Open']), 2),
-                    "high": round(float(row['High']), 2),
-                    "low": round(float(row['Low']), 2),
-                    "volume": int(row['Volume']),
-                    "returns": round(float(row['Returns']) if not pd.isna(row['Returns']) else 0, 2),
-                    "ma20": round(float(row['MA20']) if not pd.isna(row['MA20']) else row['Close'], 2),
-                    "ma50": round(float(row['MA50']) if not pd.isna(row['MA50']) else row['Close'], 2),
-                    "ma200": round(float(row['MA200']) if not pd.isna(row['MA200']) else row['Close'], 2),
-                    "atr": round(float(row['ATR']) if not pd.isna(row['ATR']) else 0, 2),
-                    "obv": int(row['OBV']) if not pd.isna(row['OBV']) else 0,
-                    "ad": int(row['AD']) if not pd.isna(row['AD']) else 0,
-                    "momentum": round(float(row['MOM']) if not pd.isna(row['MOM']) else 0, 2),
-                    "roc": round(float(row['ROC']) if not pd.isna(row['ROC']) else 0, 2),
-                    "natr": round(float(row['NATR']) if not pd.isna(row['NATR']) else 0, 2),
-                    "rsi": round(float(row['RSI']) if not pd.isna(row['RSI']) else 50, 2),
-                    "macd": round(float(row['MACD']) if not pd.isna(row['MACD']) else 0, 2),
-                    "macd_signal": round(float(row['MACD_Signal']) if not pd.isna(row['MACD_Signal']) else 0, 2),
-                    "bb_upper": round(float(row['BB_Upper']) if not pd.isna(row['BB_Upper']) else row['Close'], 2),
-                    "bb_lower": round(float(row['BB_Lower']) if not pd.isna(row['BB_Lower']) else row['Close'], 2),
-                })
-            
-            return price_data, stats
 
         except Exception as e:
             logger.exception(f"Error fetching stock data: {str(e)}")
@@ -237,9 +408,17 @@ class StockService:
 
     @staticmethod
     def generate_analysis_text(stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Analysis for stats, reusing a cached one for near-identical stats."""
+        return StockService._analysis_cache.get_or_generate(
+            stats,
+            StockService._generate_analysis_uncached
+        )
+
+    @staticmethod
+    def _generate_analysis_uncached(stats: Dict[str, Any]) -> Dict[str, Any]:
         try:
             # Generate analysis using DSPy
-            analysis = StockService._dspy_service.generate_analysis(stats)
+            analysis = StockService.get_dspy_service().generate_analysis(stats)
         
             return {
                 "summary": analysis.summary,
@@ -248,6 +427,228 @@ class StockService:
                 "outlook": analysis.outlook,
                 "timestamp": datetime.now().isoformat()
             } 
+        except LLMBusyError:
+            # Load shedding, not a failure
+            raise
         except Exception as e:
             logger.exception(f"Error generating analysis: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    @staticmethod
+    async def generate_analysis_text_async(stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Non-blocking generate_analysis_text (runs in the 'analysis' stage)."""
+        return await run_stage('analysis', StockService.generate_analysis_text, stats)
+
+    @staticmethod
+    async def shared_stock_data(
+        extracted_info: ExtractedInfo,
+        refresh: bool = False
+    ) -> Tuple[Dict[str, List[Any]], Dict[str, Any]]:
+        """Columnar price data and stats for extracted_info.
+
+        Served from the prepared-data cache (kept warm for popular symbols
+        by the pre-warmer) unless refresh is set or the stored bars changed
+        since; otherwise computed once for all concurrent identical requests
+        and cached.
+        """
+        key = (extracted_info.symbol, extracted_info.yfinance_period, extracted_info.yfinance_interval)
+        if not refresh:
+            updated = StockService._bar_store.updated(extracted_info.symbol, extracted_info.yfinance_interval)
+            cached = StockService._prepared_cache.get(key, updated)
+            if cached is not None:
+                return cached
+
+        async def compute():
+            # Stamped before the fetch, so bars written while computing make
+            # the entry stale (including the fetch's own, once)
+            as_of = time.time()
+            # Always computed columnar so waiters can pick either shape
+            result = await StockService._fetch_stock_data_async(extracted_info, True)
+            StockService._prepared_cache.put(key, result, extracted_info.yfinance_interval, as_of)
+            return result
+
+        return await StockService._single_flight.do(('data',) + key, compute)
+
+    @staticmethod
+    def _record_request(extracted_info: ExtractedInfo):
+        StockService._popularity.record(
+            extracted_info.symbol, extracted_info.yfinance_period, extracted_info.yfinance_interval
+        )
+
+    @staticmethod
+    async def shared_analysis(stats: Dict[str, Any], lane: str = INTERACTIVE) -> Dict[str, Any]:
+        """Generated analysis, shared by concurrent requests with equivalent stats.
+
+        Generations in other LLM lanes are shared under their own key, so a
+        request never waits on a pre-warm call queued in the background lane.
+        """
+        key = ('analysis', stats_fingerprint(stats))
+        if lane != INTERACTIVE:
+            key += (lane,)
+
+        async def generate():
+            with llm_priority(lane):
+                return await StockService.generate_analysis_text_async(stats)
+
+        return await StockService._single_flight.do(key, generate)
+
+    @staticmethod
+    async def analyze_async(
+        query: str = "Show me Apple stock",
+        columnar: bool = False,
+        max_points: Optional[int] = None
+    ) -> Tuple[Union[List[Dict[str, Any]], Dict[str, List[Any]]], Dict[str, Any], Dict[str, Any]]:
+        """Price data, stats and generated analysis for a query.
+
+        Concurrent requests that resolve to the same (symbol, period,
+        interval) share one history fetch, indicator run and LLM analysis.
+        With max_points the price data is downsampled for charting; stats
+        are always computed at full resolution.
+        """
+        extracted_info = await run_stage('extract', StockService.extract_stock_info, query)
+        StockService._record_request(extracted_info)
+        price_columns, stats = await StockService.shared_stock_data(extracted_info)
+        analysis = await StockService.shared_analysis(stats)
+        if columnar and not max_points:
+            return price_columns, stats, analysis
+        price_data = await run_stage('indicators', StockService._shape_price_data, price_columns, columnar, max_points)
+        return price_data, stats, analysis
+
+    @staticmethod
+    async def analyze_stream(
+        query: str = "Show me Apple stock",
+        columnar: bool = False,
+        max_points: Optional[int] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """analyze_async as a sequence of (event, data) parts, each yielded as soon as it is ready.
+
+        Events: 'symbol', 'stockData', 'stats', then 'analysis' twice: the
+        fundamental factors (formatted without the LLM) first, the LLM
+        fields once generated.
+        """
+        extracted_info = await run_stage('extract', StockService.extract_stock_info, query)
+        StockService._record_request(extracted_info)
+        yield 'symbol', {
+            'symbol': extracted_info.symbol,
+            'period': extracted_info.yfinance_period,
+            'interval': extracted_info.yfinance_interval
+        }
+
+        price_columns, stats = await StockService.shared_stock_data(extracted_info)
+        if columnar and not max_points:
+            yield 'stockData', price_columns
+        else:
+            yield 'stockData', await run_stage(
+                'indicators', StockService._shape_price_data, price_columns, columnar, max_points
+            )
+        yield 'stats', stats
+        yield 'analysis', {'fundamentalFactors': format_fundamental_factors(stats['fundamental'])}
+
+        analysis = await StockService.shared_analysis(stats)
+        yield 'analysis', {
+            'summary': analysis['summary'],
+            'technicalFactors': analysis['technicalFactors'],
+            'outlook': analysis['outlook'],
+            'timestamp': analysis['timestamp']
+        }
+
+    @staticmethod
+    def extract_comparison(query: str, symbols: Optional[List[str]] = None) -> ResolvedComparison:
+        """Stage: symbols and shared period of a comparison; explicit symbols override the query's."""
+        comparison = StockService.get_dspy_service().extract_comparison(query)
+        if symbols:
+            comparison = comparison._replace(symbols=list(dict.fromkeys(symbol.upper() for symbol in symbols)))
+        if len(comparison.symbols) < 2:
+            raise ValueError("A comparison needs at least two symbols")
+        if len(comparison.symbols) > settings.COMPARE_MAX_SYMBOLS:
+            raise ValueError(f"A comparison takes at most {settings.COMPARE_MAX_SYMBOLS} symbols")
+        return comparison
+
+    @staticmethod
+    def fetch_histories(comparison: ResolvedComparison) -> Dict[str, pd.DataFrame]:
+        """Stage: price histories for all compared symbols, downloaded in bulk."""
+        histories = StockService._bar_store.get_histories(
+            comparison.symbols,
+            interval=comparison.yfinance_interval,
+            start=StockService._history_start(comparison.yfinance_period, comparison.yfinance_interval)
+        )
+        for symbol, df in histories.items():
+            StockService._validate_history(symbol, df)
+        return histories
+
+    @staticmethod
+    def _prepare_comparison(
+        comparison: ResolvedComparison,
+        histories: Dict[str, pd.DataFrame],
+        fundamentals: Dict[str, Dict[str, Any]]
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+        """Stage: per-symbol stats and cross-sectional metrics.
+
+        Indicator rebuilds for the symbols run in parallel in the process pool.
+        """
+        indicators = StockService._indicator_engine.compute_many(
+            comparison.yfinance_interval,
+            histories,
+            executor=process_pool()
+        )
+        stocks = {}
+        closes = {}
+        for symbol, df in histories.items():
+            extracted_info = ExtractedInfo(
+                symbol=symbol,
+                yfinance_period=comparison.yfinance_period,
+                yfinance_interval=comparison.yfinance_interval
+            )
+            df = StockService._trim_to_period(pd.concat([df, indicators[symbol]], axis=1), comparison.yfinance_period)
+            stocks[symbol] = StockService.build_stats(extracted_info, df, fundamentals[symbol])
+            closes[symbol] = df['Close']
+        return stocks, cross_sectional_metrics(closes)
+
+    @staticmethod
+    def generate_comparison_text(stocks: Dict[str, Dict[str, Any]], metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """One LLM comparison across all symbols."""
+        try:
+            comparison = StockService.get_dspy_service().generate_comparison({
+                'stocks': stocks,
+                'comparison': metrics
+            })
+            return {
+                "summary": comparison.summary,
+                "comparisonFactors": comparison.comparison_factors,
+                "outlook": comparison.outlook,
+                "timestamp": datetime.now().isoformat()
+            }
+        except Exception as e:
+            logger.exception(f"Error generating comparison: {str(e)}")
+            raise
+
+    @staticmethod
+    async def compare_async(
+        query: str,
+        symbols: Optional[List[str]] = None
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any], Dict[str, Any]]:
+        """Per-symbol stats, cross-sectional metrics and one generated comparison.
+
+        Histories are fetched in one bulk download and fundamentals
+        concurrently; identical concurrent comparisons share the work.
+        """
+        comparison = await run_stage('extract', StockService.extract_comparison, query, symbols)
+        key = ('compare', tuple(comparison.symbols), comparison.yfinance_period, comparison.yfinance_interval)
+
+        async def compute():
+            histories, fundamentals = await asyncio.gather(
+                run_stage('history', StockService.fetch_histories, comparison),
+                asyncio.gather(*(
+                    run_stage('fundamentals', StockService.fetch_fundamentals, symbol)
+                    for symbol in comparison.symbols
+                ))
+            )
+            stocks, metrics = await run_stage(
+                'indicators',
+                StockService._prepare_comparison,
+                comparison, histories, dict(zip(comparison.symbols, fundamentals))
+            )
+            analysis = await run_stage('analysis', StockService.generate_comparison_text, stocks, metrics)
+            return stocks, metrics, analysis
+
+        return await StockService._single_flight.do(key, compute)
@@ -0,0 +1,108 @@
+"""Response encodings of a 'max' AAPL analysis: bytes on the wire and encode time.
+
+Compares the previous path (response model validation, then FastAPI's
+json.dumps) with the negotiated encodings of the analyze endpoint: orjson
+for rows and columns, MessagePack (when installed) and Arrow IPC, each
+uncompressed, gzip and brotli. Prices come from benchmarks.replay: the
+recorded AAPL fixture when there is one, else a synthetic series of the
+same length.
+
+Run from stockchat-backend:
+    python -m benchmarks.bench_encodings --repeats 20
+    python -m benchmarks.bench_encodings --interval 1d --rows 11000
+"""
+import argparse
+import json
+import time
+
+from benchmarks import replay
+
+# Settings are read at import
+replay.offline_environment()
+
+import numpy as np  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.api.models import StockAnalysisResponse  # noqa: E402
+from app.services.dspy_service import ExtractedInfo  # noqa: E402
+from app.services.response_encoding import (  # noqa: E402
+    ARROW, JSON, MSGPACK, available_media_types, compress_body, encode_body
+)
+from app.services.stock_service import StockService  # noqa: E402
+
+# Weekly bars since 1980, what the resolver's 'max' period returns for AAPL
+DEFAULT_ROWS = {'1wk': 2300, '1d': 11000}
+
+ANALYSIS = {
+    'summary': 'Apple has compounded strongly over its listed history with periodic deep drawdowns.',
+    'technicalFactors': ['Price above the 50 and 200 week averages', 'RSI near 60', 'MACD above signal'],
+    'fundamentalFactors': ['Market Cap: 3,400,000,000,000.00', 'P/E Ratio (Trailing): 33.10'],
+    'outlook': 'Constructive while the long-term uptrend holds.',
+    'timestamp': '2026-01-02T15:30:00',
+}
+
+
+def median_ms(func, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples)) * 1000, result
+
+
+def previous_encoding(payload) -> bytes:
+    """Validation through the response model, then FastAPI's JSONResponse rendering."""
+    adapter = TypeAdapter(StockAnalysisResponse)
+    content = adapter.dump_python(adapter.validate_python(payload), mode='json')
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':')).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbol', default='AAPL')
+    parser.add_argument('--interval', default='1wk')
+    parser.add_argument('--rows', type=int, help="synthetic series length when nothing is recorded")
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+
+    info = ExtractedInfo(symbol=args.symbol, yfinance_period='max', yfinance_interval=args.interval)
+    market = replay.MarketReplay(default_rows=args.rows or DEFAULT_ROWS.get(args.interval, 2300))
+    with market.install():
+        df = StockService.fetch_history(info)
+        fundamentals = StockService.fetch_fundamentals(args.symbol)
+    rows, _ = StockService._prepare_response(info, df, fundamentals, False)
+    columns, _ = StockService._prepare_response(info, df, fundamentals, True)
+    print(f"{args.symbol} max ({args.interval}): {len(rows)} bars, {market.sources().get(args.symbol)} data\n")
+
+    def payload(stock_data):
+        return {'stockData': stock_data, 'analysisText': ANALYSIS, 'shareId': '0b0c7f4e-6a55-4a9c-9a4e-2f1f3c6d8e11'}
+
+    cases = [
+        ('pydantic + json, rows (previous)', lambda: previous_encoding(payload(rows))),
+        ('orjson, rows', lambda: encode_body(payload(rows), JSON)),
+        ('orjson, columnar', lambda: encode_body(payload(columns), JSON)),
+    ]
+    if MSGPACK in available_media_types():
+        cases += [
+            ('msgpack, rows', lambda: encode_body(payload(rows), MSGPACK)),
+            ('msgpack, columnar', lambda: encode_body(payload(columns), MSGPACK)),
+        ]
+    else:
+        print("msgpack is not installed; skipping MessagePack\n")
+    cases.append(('arrow ipc, columnar', lambda: encode_body(payload(columns), ARROW)))
+
+    print(f"{'format':<34} {'encode ms':>10} {'bytes':>10} {'gzip':>10} {'gzip ms':>8} {'br':>10} {'br ms':>8}")
+    for name, encode in cases:
+        encode_ms, body = median_ms(encode, args.repeats)
+        gzip_ms, (gzipped, _) = median_ms(lambda: compress_body(body, 'gzip', 0), args.repeats)
+        br_ms, (brotlied, coding) = median_ms(lambda: compress_body(body, 'br', 0), args.repeats)
+        br_bytes = f"{len(brotlied):>10}" if coding == 'br' else f"{'n/a':>10}"
+        print(
+            f"{name:<34} {encode_ms:>10.2f} {len(body):>10} {len(gzipped):>10} {gzip_ms:>8.2f} "
+            f"{br_bytes} {br_ms:>8.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""LLM pool latency: one provider vs a pool, with and without hedging.
+
+Uses local stub LMs with injected delays instead of real providers. Each
+stub answers after a lognormal delay and sometimes stalls (tail latency)
+or fails, so the run shows what spreading, hedging and failover do to the
+latency distribution and the error rate.
+
+Then checks the pool's guarantees with fixture LMs (benchmarks.replay),
+exiting with status 1 if any fails: calls to a failing member fail over
+to the next one, no member takes more calls than its token bucket
+allows, and queued interactive calls are served before background ones.
+
+Run from stockchat-backend:
+    python -m benchmarks.bench_llm_pool --calls 400 --concurrency 16
+    python -m benchmarks.bench_llm_pool --checks-only
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+from dspy.clients.base_lm import BaseLM
+
+from app.services.llm_pool import LMPool, PoolMember
+from app.services.llm_scheduler import BACKGROUND, INTERACTIVE, LLMScheduler, llm_priority
+from benchmarks.replay import FixtureLM, Latency
+
+# name: (median seconds, stall probability, stall seconds, error probability)
+PROVIDERS = {
+    'fast': (0.08, 0.05, 1.0, 0.02),
+    'slow': (0.15, 0.02, 1.0, 0.02),
+    'flaky': (0.10, 0.10, 1.5, 0.10),
+}
+
+
+class StubLM(BaseLM):
+    """LM answering after an injected delay, sometimes stalling or failing."""
+
+    def __init__(self, name: str, median: float, stall_p: float, stall: float, error_p: float, seed: int):
+        super().__init__(model=f"stub/{name}")
+        self.median, self.stall_p, self.stall, self.error_p = median, stall_p, stall, error_p
+        self._random = random.Random(seed)
+
+    def __call__(self, prompt=None, messages=None, **kwargs):
+        delay = self.median * self._random.lognormvariate(0, 0.3)
+        if self._random.random() < self.stall_p:
+            delay += self.stall
+        time.sleep(delay)
+        if self._random.random() < self.error_p:
+            raise RuntimeError(f"{self.model} failed")
+        return ["ok"]
+
+
+def make_members(names):
+    return [PoolMember(name, StubLM(name, *PROVIDERS[name], seed=i)) for i, name in enumerate(names)]
+
+
+def run(label: str, lm, calls: int, concurrency: int):
+    def call(_):
+        start = time.perf_counter()
+        try:
+            lm(prompt="hi")
+            return time.perf_counter() - start, True
+        except Exception:
+            return time.perf_counter() - start, False
+
+    # Warm-up so hedge delays come from measured percentiles
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(call, range(min(calls, 100))))
+        results = list(pool.map(call, range(calls)))
+    latencies = np.array([latency for latency, ok in results]) * 1000
+    errors = sum(1 for _, ok in results if not ok)
+    print(
+        f"{label:>22}: p50 {np.percentile(latencies, 50):6.0f} ms  p95 {np.percentile(latencies, 95):6.0f} ms  "
+        f"p99 {np.percentile(latencies, 99):6.0f} ms  errors {100 * errors / calls:4.1f}%"
+    )
+    if isinstance(lm, LMPool):
+        for name, stats in lm.stats().items():
+            print(f"{'':>24}{name}: {stats}")
+
+
+def _unlimited() -> LLMScheduler:
+    return LLMScheduler({'default': 1e6}, burst=1000, max_queue={INTERACTIVE: 1000}, max_wait={INTERACTIVE: 60})
+
+
+def check_failover(calls: int) -> List[str]:
+    """Every call succeeds although one member always fails."""
+    broken = FixtureLM(latency=Latency(error_p=1.0))
+    healthy = FixtureLM()
+    pool = LMPool([PoolMember('broken', broken), PoolMember('healthy', healthy)], scheduler=_unlimited())
+    errors = 0
+    for _ in range(calls):
+        try:
+            pool(prompt="hi")
+        except Exception:
+            errors += 1
+    stats = pool.stats()
+    print(f"failover: {errors} errors in {calls} calls; {stats}")
+    failures = []
+    if errors:
+        failures.append(f"failover: {errors} of {calls} calls failed with a healthy member available")
+    if broken.calls and not stats['healthy']['failovers']:
+        failures.append("failover: calls to the failing member were not retried on the healthy one")
+    if healthy.calls != calls:
+        failures.append(f"failover: healthy member answered {healthy.calls} of {calls} calls")
+    return failures
+
+
+def check_budgets(calls: int, concurrency: int) -> List[str]:
+    """No member is called more often than its bucket refills, hedges included."""
+    rates = {'a': 600, 'b': 300}
+    burst = 2
+    scheduler = LLMScheduler(rates, burst=burst, max_queue={INTERACTIVE: 1000}, max_wait={INTERACTIVE: 60})
+    lms = {name: FixtureLM(latency=Latency(median=0.02, tail_p=0.2, tail=0.2, seed=i)) for i, name in enumerate(rates)}
+    pool = LMPool([PoolMember(name, lm) for name, lm in lms.items()], hedge_delay=0.05, scheduler=scheduler)
+    start = time.monotonic()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(lambda _: pool(prompt="hi"), range(calls)))
+    elapsed = time.monotonic() - start
+    failures = []
+    for name, lm in lms.items():
+        allowed = burst + rates[name] / 60 * elapsed
+        print(f"budgets: {name} took {lm.calls} calls, bucket allows {allowed:.1f} in {elapsed:.2f}s")
+        if lm.calls > allowed:
+            failures.append(f"budgets: {name} took {lm.calls} calls, over its {allowed:.1f}")
+    return failures
+
+
+def check_priority(per_lane: int) -> List[str]:
+    """Interactive calls queued behind background ones are served first."""
+    scheduler = LLMScheduler(
+        {'default': 600}, burst=1,
+        max_queue={INTERACTIVE: 100, BACKGROUND: 100}, max_wait={INTERACTIVE: 60, BACKGROUND: 60}
+    )
+    pool = LMPool([PoolMember('only', FixtureLM())], scheduler=scheduler)
+    served: List[str] = []
+    lock = threading.Lock()
+
+    def call(lane: str):
+        with llm_priority(lane):
+            pool(prompt="hi")
+        with lock:
+            served.append(lane)
+
+    threads = []
+    for lane in (BACKGROUND, INTERACTIVE):
+        for _ in range(per_lane):
+            thread = threading.Thread(target=call, args=(lane,))
+            thread.start()
+            threads.append(thread)
+        # Background callers are queued before the interactive ones arrive
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join()
+
+    print(f"priority: served {' '.join(lane[0] for lane in served)}")
+    # Background calls granted before the first interactive arrival may come first
+    first = served.index(INTERACTIVE)
+    after = served[first:]
+    last = len(after) - 1 - after[::-1].index(INTERACTIVE)
+    if BACKGROUND in after[:last]:
+        return ["priority: a background call was served while interactive calls were queued"]
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--checks-only', action='store_true', help="skip the latency runs")
+    args = parser.parse_args()
+
+    if not args.checks_only:
+        # Budgets are not what is measured here
+        scheduler = _unlimited()
+        names = list(PROVIDERS)
+
+        run('single provider', StubLM('fast', *PROVIDERS['fast'], seed=0), args.calls, args.concurrency)
+        run('pool, no hedging', LMPool(make_members(names), hedge_percentile=100, hedge_delay=1e9,
+                                       scheduler=scheduler), args.calls, args.concurrency)
+        run('pool, hedged at p95', LMPool(make_members(names), hedge_percentile=95,
+                                          scheduler=scheduler), args.calls, args.concurrency)
+        print()
+
+    failures = check_failover(50) + check_budgets(60, 8) + check_priority(6)
+    if failures:
+        sys.exit("LLM pool checks failed:\n" + "\n".join(failures))
+    print("All LLM pool checks passed")
+
+
+if __name__ == '__main__':
+    main()
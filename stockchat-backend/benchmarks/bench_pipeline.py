@@ -0,0 +1,226 @@
+"""Offline benchmark of the analysis pipeline's stages across frame sizes.
+
+Market data is replayed from recorded fixtures (synthesized where none
+are recorded) and DSPy runs against a deterministic local LM, so no
+network or API keys are needed (see benchmarks.replay). Per frame size,
+each stage of StockService.get_stock_data is timed on its own, followed
+by get_stock_data end to end (without query extraction), analysis
+generation, and the repository write of the result.
+
+Stages other than trim run on the full frame, i.e. a 'max' period
+request, so their cost scales with the size; trim cuts to --period.
+
+Results are written as JSON; --compare checks them against an earlier
+run and exits non-zero if a stage got slower than the tolerance allows.
+
+Run from stockchat-backend:
+    python -m benchmarks.bench_pipeline --sizes 100 1000 10000 50000 --output results.json
+    python -m benchmarks.bench_pipeline --compare results.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from benchmarks import replay
+
+# Settings are read at import
+replay.offline_environment()
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import talib  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db import models  # noqa: E402
+from app.db.database import set_sqlite_pragmas  # noqa: E402
+from app.repositories.analysis_repository import AnalysisRepository  # noqa: E402
+from app.services.dspy_service import ExtractedInfo, configure_dspy  # noqa: E402
+from app.services.indicator_engine import IndicatorEngine  # noqa: E402
+from app.services.stock_service import StockService  # noqa: E402
+
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+
+
+def summarize(samples) -> dict:
+    ms = np.array(samples) * 1000
+    return {
+        'median_ms': round(float(np.median(ms)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'min_ms': round(float(ms.min()), 3),
+    }
+
+
+def timeit(func, repeats: int) -> dict:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def repository_session(directory: str):
+    engine = create_engine(
+        f"sqlite:///{os.path.join(directory, 'bench.db')}",
+        connect_args={"check_same_thread": False}
+    )
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    models.Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def bench_size(rows: int, repeats: int, period: str, Session) -> dict:
+    symbol = f"BENCH{rows}"
+    replay_data = replay.MarketReplay(rows=rows)
+    info = ExtractedInfo(symbol=symbol, yfinance_period='max', yfinance_interval='1d')
+    results = {}
+
+    with replay_data.install():
+        raw = StockService.fetch_history(info)
+        fundamentals = StockService.fetch_fundamentals(symbol)
+
+        def indicators_cold():
+            indicators = IndicatorEngine().compute(symbol, '1d', raw)
+            return pd.concat([raw, indicators], axis=1)
+
+        engine = IndicatorEngine()
+        engine.compute(symbol, '1d', raw)
+        results['indicators'] = timeit(indicators_cold, repeats)
+        results['indicators_warm'] = timeit(lambda: engine.compute(symbol, '1d', raw), repeats)
+
+        frame = indicators_cold()
+        results['trim'] = timeit(lambda: StockService._trim_to_period(frame, period), repeats)
+        results['stats'] = timeit(lambda: StockService.build_stats(info, frame, fundamentals), repeats)
+        results['serialize_rows'] = timeit(lambda: StockService.format_price_data(frame), repeats)
+        results['serialize_columnar'] = timeit(lambda: StockService.format_price_data(frame, columnar=True), repeats)
+
+        def get_stock_data():
+            df = StockService.fetch_history(info)
+            return StockService._prepare_response(info, df, StockService.fetch_fundamentals(symbol), False)
+
+        results['get_stock_data'] = timeit(get_stock_data, repeats)
+
+    price_data, stats = StockService._prepare_response(info, raw, fundamentals, False)
+    # Uncached: DSPy prompt formatting and output parsing around a zero-latency LM
+    results['analysis'] = timeit(lambda: StockService._generate_analysis_uncached(stats), repeats)
+    StockService.generate_analysis_text(stats)
+    results['analysis_cached'] = timeit(lambda: StockService.generate_analysis_text(stats), repeats)
+
+    analysis = StockService._generate_analysis_uncached(stats)
+    written = [0]
+
+    def write():
+        # A new ticker each time, so the price series is inserted rather than deduplicated
+        written[0] += 1
+        db = Session()
+        try:
+            AnalysisRepository(db).create_analysis(
+                analysis_id=str(uuid.uuid4()),
+                stock_data=price_data,
+                technical_metrics={**stats['technical'], 'ticker': f"{symbol}-{written[0]}"},
+                fundamental_metrics=stats['fundamental'],
+                analysis_text=analysis
+            )
+        finally:
+            db.close()
+
+    results['db_write'] = timeit(write, repeats)
+    return {'source': replay_data.sources().get(symbol), 'stages': results}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> int:
+    """Print each stage's change against baseline; returns the number of regressions."""
+    regressions = 0
+    for size, result in current['results'].items():
+        previous = baseline['results'].get(size)
+        if previous is None:
+            continue
+        for stage, timing in result['stages'].items():
+            before = previous['stages'].get(stage)
+            if before is None or before['median_ms'] <= 0:
+                continue
+            ratio = timing['median_ms'] / before['median_ms']
+            flag = ''
+            if ratio > 1 + tolerance:
+                flag = '  REGRESSION'
+                regressions += 1
+            print(
+                f"{size:>7} {stage:<20} {before['median_ms']:10.3f} -> {timing['median_ms']:10.3f} ms "
+                f"({ratio:5.2f}x){flag}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--period', default='1y', help="period the trim stage cuts to")
+    parser.add_argument('--output', help="write results to this JSON file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed median slowdown before a stage counts as a regression")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    configure_dspy(replay.FixtureLM())
+
+    run = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'commit': git_commit(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'talib': talib.__version__,
+            'repeats': args.repeats,
+            'period': args.period,
+        },
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        engine, Session = repository_session(directory)
+        for rows in args.sizes:
+            result = bench_size(rows, args.repeats, args.period, Session)
+            run['results'][str(rows)] = result
+            print(f"{rows} rows ({result['source']})")
+            for stage, timing in result['stages'].items():
+                print(f"  {stage:<20} median {timing['median_ms']:10.3f} ms  p95 {timing['p95_ms']:10.3f} ms")
+        engine.dispose()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Against {args.compare} ({baseline['meta'].get('commit')}, {baseline['meta'].get('timestamp')}):")
+        regressions = compare(run, baseline, args.tolerance)
+        if regressions:
+            print(f"{regressions} stage(s) slower than {1 + args.tolerance:.2f}x the baseline")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Screener over a synthetic universe: load, screen and refresh times.
+
+Writes --symbols random-walk daily series (benchmarks.replay) into a temp
+bar store with a universe file of sectors, then times the first load of
+every series, a set of typical screens over the loaded table and a
+refresh after --touch series changed. A sample of symbols is checked
+against the streaming indicator engine run over their full history.
+
+Run from stockchat-backend:
+    python -m benchmarks.bench_screener --symbols 2000
+    python -m benchmarks.bench_screener --symbols 5000 --workers 4 --chunk-size 500
+"""
+import argparse
+import os
+import time
+
+from benchmarks import replay
+
+# Settings are read at import
+root = replay.offline_environment()
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+SECTORS = ['Technology', 'Healthcare', 'Financials', 'Energy', 'Industrials', 'Utilities']
+
+SCREENS = {
+    'oversold tech': dict(
+        filters=[{'field': 'rsi', 'op': '<', 'value': 30}],
+        sectors=['Technology'], sort_by='rsi', descending=False
+    ),
+    'golden cross': dict(filters=[{'field': 'ma50', 'op': 'crosses_above', 'value': 'ma200'}]),
+    'above ma200, macd up': dict(
+        filters=[
+            {'field': 'close', 'op': '>', 'value': 'ma200'},
+            {'field': 'macd', 'op': '>', 'value': 'macd_signal'},
+        ],
+        sort_by='roc'
+    ),
+    'below lower band, volatile': dict(
+        filters=[{'field': 'bb_position', 'op': '<', 'value': 0}, {'field': 'natr', 'op': '>', 'value': 2}],
+        sort_by='natr'
+    ),
+    'top volume, no filters': dict(filters=[], sort_by='rel_volume', limit=100),
+}
+
+# Screener fields against IndicatorEngine columns
+CHECKED = {
+    'rsi': 'RSI', 'macd': 'MACD', 'macd_signal': 'MACD_Signal', 'ma50': 'MA50', 'ma200': 'MA200',
+    'bb_upper': 'BB_Upper', 'bb_lower': 'BB_Lower', 'natr': 'NATR', 'roc': 'ROC',
+}
+
+
+def symbol_name(i: int) -> str:
+    letters = ''
+    for _ in range(4):
+        i, digit = divmod(i, 26)
+        letters = chr(ord('A') + digit) + letters
+    return letters
+
+
+def populate(bar_store, symbols: int, rows: int, stale: int) -> dict:
+    """Write the universe's series and universe file; return the frames by symbol."""
+    rng = np.random.default_rng(0)
+    frames = {}
+    for i in range(symbols):
+        symbol = symbol_name(i)
+        df = replay.synthetic_history(symbol, int(rng.integers(rows // 4, rows)))
+        if i < stale:
+            df = df.iloc[:-20]
+        bar_store._save(symbol, '1d', df, None)
+        frames[symbol] = df
+    pd.DataFrame({
+        'symbol': list(frames),
+        'sector': [SECTORS[i % len(SECTORS)] for i in range(symbols)],
+    }).to_csv(os.path.join(root, 'universe.csv'), index=False)
+    return frames
+
+
+def timed_ms(func, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples)) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=2000)
+    parser.add_argument('--rows', type=int, default=1500, help="longest series, in daily bars")
+    parser.add_argument('--stale', type=int, default=20, help="series whose last bar is weeks old")
+    parser.add_argument('--workers', type=int, default=0, help="process pool size (0 = one per core)")
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--touch', type=int, default=50, help="series rewritten before the refresh")
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--check', type=int, default=20, help="symbols compared with the indicator engine")
+    args = parser.parse_args()
+    os.environ['PROCESS_POOL_WORKERS'] = str(args.workers)
+
+    from app.core.concurrency import process_pool
+    from app.services.bar_store import BarStore
+    from app.services.indicator_engine import build_series
+    from app.services.screener import Screener
+
+    bar_store = BarStore(os.path.join(root, 'universe-bars'))
+    start = time.perf_counter()
+    frames = populate(bar_store, args.symbols, args.rows, args.stale)
+    print(f"wrote {args.symbols} series in {time.perf_counter() - start:.1f}s")
+
+    screener = Screener(
+        bar_store=bar_store,
+        universe_file=os.path.join(root, 'universe.csv'),
+        refresh_seconds=3600,
+        chunk_size=args.chunk_size,
+        max_stale_days=5,
+        max_results=500,
+        tolerance=1e-6
+    )
+    pool = process_pool()
+    if pool is not None:
+        # Spawn the workers outside the timed load
+        list(pool.map(abs, range(pool._max_workers)))
+    print(f"process pool: {pool._max_workers if pool is not None else 'none (inline)'}, "
+          f"{screener.bars} bars per symbol\n")
+
+    start = time.perf_counter()
+    table = screener.refresh('1d', force=True)
+    print(f"cold load: {len(table.latest)} symbols in {time.perf_counter() - start:.2f}s")
+
+    print(f"\n{'screen':<28} {'median ms':>10} {'matched':>8} {'of':>6}")
+    for name, screen in SCREENS.items():
+        elapsed, result = timed_ms(lambda: screener.screen('1d', **screen), args.repeats)
+        print(f"{name:<28} {elapsed:>10.2f} {result['matched']:>8} {result['universe']:>6}")
+
+    touched = list(frames)[-args.touch:]
+    for symbol in touched:
+        df = frames[symbol]
+        bar_store._save(symbol, '1d', df.iloc[:-1], None)
+    start = time.perf_counter()
+    table = screener.refresh('1d', force=True)
+    print(f"\nrefresh after {len(touched)} changed series: {time.perf_counter() - start:.3f}s")
+    for symbol in touched:
+        frames[symbol] = frames[symbol].iloc[:-1]
+
+    worst = 0.0
+    sample = [symbol for symbol in frames if symbol in table.latest.index][::max(1, len(frames) // args.check)]
+    for symbol in sample:
+        expected = build_series(frames[symbol]).frame(frames[symbol].index).iloc[-1]
+        for field, column in CHECKED.items():
+            value, reference = table.latest.at[symbol, field], expected[column]
+            if np.isnan(value) != np.isnan(reference):
+                raise SystemExit(f"{symbol} {field}: {value} vs {reference}")
+            if not np.isnan(value):
+                worst = max(worst, abs(value - reference) / max(1.0, abs(reference)))
+    print(f"max relative difference to full-history indicators ({len(sample)} symbols): {worst:.1e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark price_data serialization: legacy iterrows loop vs columnar path.
+
+Run from stockchat-backend:
+    python -m benchmarks.bench_serialization --rows 10000 --max-points 1000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.indicator_engine import IndicatorEngine
+from app.services.serialization import price_data_columns, columns_to_rows
+from app.services.downsampling import downsample_columns
+
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Random-walk OHLCV frame with the full indicator set attached."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, rows)))
+    df = pd.DataFrame(
+        {
+            'Open': close * (1 + rng.normal(0, 0.005, rows)),
+            'High': close * (1 + rng.uniform(0, 0.02, rows)),
+            'Low': close * (1 - rng.uniform(0, 0.02, rows)),
+            'Close': close,
+            'Volume': rng.integers(100_000, 10_000_000, rows),
+        },
+        index=pd.date_range('1980-01-01', periods=rows, freq='D', tz='America/New_York'),
+    )
+    indicators = IndicatorEngine().compute('BENCH', '1d', df)
+    return pd.concat([df, indicators], axis=1)
+
+
+def legacy_rows(df: pd.DataFrame) -> list:
+    """The original per-row serialization from StockService.get_stock_data."""
+    price_data = []
+    for date, row in df.iterrows():
+        price_data.append({
+            "date": date.strftime("%Y-%m-%d"),
+            "price": round(float(row['Close']), 2),
+            "open": round(float(row['Open']), 2),
+            "high": round(float(row['High']), 2),
+            "low": round(float(row['Low']), 2),
+            "volume": int(row['Volume']),
+            "returns": round(float(row['Returns']) if not pd.isna(row['Returns']) else 0, 2),
+            "ma20": round(float(row['MA20']) if not pd.isna(row['MA20']) else row['Close'], 2),
+            "ma50": round(float(row['MA50']) if not pd.isna(row['MA50']) else row['Close'], 2),
+            "ma200": round(float(row['MA200']) if not pd.isna(row['MA200']) else row['Close'], 2),
+            "atr": round(float(row['ATR']) if not pd.isna(row['ATR']) else 0, 2),
+            "obv": int(row['OBV']) if not pd.isna(row['OBV']) else 0,
+            "ad": int(row['AD']) if not pd.isna(row['AD']) else 0,
+            "momentum": round(float(row['MOM']) if not pd.isna(row['MOM']) else 0, 2),
+            "roc": round(float(row['ROC']) if not pd.isna(row['ROC']) else 0, 2),
+            "natr": round(float(row['NATR']) if not pd.isna(row['NATR']) else 0, 2),
+            "rsi": round(float(row['RSI']) if not pd.isna(row['RSI']) else 50, 2),
+            "macd": round(float(row['MACD']) if not pd.isna(row['MACD']) else 0, 2),
+            "macd_signal": round(float(row['MACD_Signal']) if not pd.isna(row['MACD_Signal']) else 0, 2),
+            "bb_upper": round(float(row['BB_Upper']) if not pd.isna(row['BB_Upper']) else row['Close'], 2),
+            "bb_lower": round(float(row['BB_Lower']) if not pd.isna(row['BB_Lower']) else row['Close'], 2),
+        })
+    return price_data
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-points', type=int, default=1000, help="downsampling target for the chart payload")
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+
+    legacy = best_of(lambda: legacy_rows(df), args.repeat)
+    columnar = best_of(lambda: price_data_columns(df), args.repeat)
+    rows = best_of(lambda: columns_to_rows(price_data_columns(df)), args.repeat)
+
+    # Python's round() and np.round() can disagree by one cent on exact ties
+    expected = legacy_rows(df)
+    actual = columns_to_rows(price_data_columns(df))
+    mismatches = sum(
+        1
+        for old, new in zip(expected, actual)
+        for key in old
+        if old[key] != new[key] and not (
+            isinstance(old[key], float) and abs(old[key] - new[key]) <= 0.0100001
+        )
+    )
+
+    print(f"rows:                    {args.rows}")
+    print(f"legacy iterrows:         {legacy * 1000:8.1f} ms")
+    print(f"columnar:                {columnar * 1000:8.1f} ms  ({legacy / columnar:5.1f}x)")
+    print(f"columnar -> row dicts:   {rows * 1000:8.1f} ms  ({legacy / rows:5.1f}x)")
+    print(f"value mismatches:        {mismatches}")
+
+    # Response encoding of the full series vs the downsampled chart payload
+    columns = price_data_columns(df)
+    full_json = best_of(lambda: json.dumps(columns_to_rows(columns)), args.repeat)
+    sampled_json = best_of(
+        lambda: json.dumps(columns_to_rows(downsample_columns(columns, args.max_points))),
+        args.repeat
+    )
+    full_bytes = len(json.dumps(columns_to_rows(columns)))
+    sampled_bytes = len(json.dumps(columns_to_rows(downsample_columns(columns, args.max_points))))
+    print(f"rows -> JSON:            {full_json * 1000:8.1f} ms  {full_bytes / 1e6:6.2f} MB")
+    print(f"max_points={args.max_points:<6} -> JSON: {sampled_json * 1000:8.1f} ms  {sampled_bytes / 1e6:6.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
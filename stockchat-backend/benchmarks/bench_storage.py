@@ -0,0 +1,144 @@
+"""Storage of shared analyses: inline JSON rows vs deduplicated series blobs.
+
+Builds a throwaway SQLite database of analyses stored the legacy way (the
+full stock_data row list on every analyses row), runs the migration to
+price_series and reports the database size before and after. The same
+traffic is then written through the current repository into a fresh
+database, with the bytes of every table and what pre-encoded share
+bodies would add if stored per analysis.
+
+The dataset mimics production traffic: each symbol/period pair is
+requested several times a day, and the window moves by one bar per day.
+
+Run from stockchat-backend:
+    python -m benchmarks.bench_storage --symbols 20 --days 10 --repeats 5
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.migrations import migrate_inline_stock_data
+from app.repositories.analysis_repository import AnalysisRepository
+from app.services.share_responses import prepare_response
+from app.services.serialization import price_data_columns, columns_to_rows
+from benchmarks.bench_serialization import make_frame
+
+# (period, bars in the window) for the daily periods users ask for most
+WINDOWS = [('1mo', 22), ('6mo', 126), ('1y', 252), ('2y', 504)]
+
+
+def populate(session: Session, symbols: int, days: int, repeats: int) -> int:
+    """Insert legacy analyses with inline stock_data; return how many."""
+    count = 0
+    for s in range(symbols):
+        symbol = f"SYM{s}"
+        frame = make_frame(600 + days, seed=s)
+        for day in range(days):
+            history = frame.iloc[:600 + day]
+            for period, bars in WINDOWS:
+                rows = columns_to_rows(price_data_columns(history.tail(bars)))
+                for _ in range(repeats):
+                    session.add(models.Analysis(
+                        id=str(uuid.uuid4()),
+                        stock_data=rows,
+                        technical_metrics={'ticker': symbol, 'interval': '1d', 'period': period},
+                        fundamental_metrics={},
+                        analysis_text={'summary': 'x' * 400},
+                    ))
+                    count += 1
+        session.commit()
+    return count
+
+
+def table_sizes(engine: Engine) -> Dict[str, int]:
+    """Bytes of pages used by each table and its indexes."""
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON s.name = m.name "
+            "GROUP BY m.tbl_name"
+        )).all()
+    return {table: size for table, size in rows}
+
+
+def populate_current(session: Session, symbols: int, days: int, repeats: int) -> int:
+    """Write the same traffic through AnalysisRepository; return the bytes of
+    the share bodies (gzip + brotli) had they been stored for every analysis."""
+    repository = AnalysisRepository(session)
+    share_bytes = 0
+    for s in range(symbols):
+        symbol = f"SYM{s}"
+        frame = make_frame(600 + days, seed=s)
+        for day in range(days):
+            history = frame.iloc[:600 + day]
+            for period, bars in WINDOWS:
+                columns = price_data_columns(history.tail(bars))
+                analysis_text = {'summary': 'x' * 400}
+                # Repeats differ only in analysis id and timestamp
+                prepared = prepare_response(repository.share_payload(analysis_text, datetime.now(), columns))
+                share_bytes += (len(prepared.gzip) + len(prepared.brotli or b'')) * repeats
+                for _ in range(repeats):
+                    repository.add_analysis(
+                        analysis_id=str(uuid.uuid4()),
+                        stock_data=columns,
+                        technical_metrics={'ticker': symbol, 'interval': '1d', 'period': period},
+                        fundamental_metrics={},
+                        analysis_text=analysis_text,
+                    )
+        session.commit()
+    return share_bytes
+
+
+def print_tables(sizes: Dict[str, int]):
+    for table in ('analyses', 'price_series'):
+        print(f"  {table + ':':<17} {sizes.get(table, 0) / 1e6:8.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--days', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=5, help="requests per symbol/period per day")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        models.Base.metadata.create_all(bind=engine)
+        with Session(engine) as session:
+            analyses = populate(session, args.symbols, args.days, args.repeats)
+
+        start = time.perf_counter()
+        report = migrate_inline_stock_data(engine)
+        elapsed = time.perf_counter() - start
+        migrated_tables = table_sizes(engine)
+
+        current_engine = create_engine(f"sqlite:///{os.path.join(directory, 'current.db')}")
+        models.Base.metadata.create_all(bind=current_engine)
+        with Session(current_engine) as session:
+            share_bytes = populate_current(session, args.symbols, args.days, args.repeats)
+        current_tables = table_sizes(current_engine)
+
+    print(f"analyses:          {analyses}")
+    print(f"unique series:     {report['series_referenced']}")
+    print(f"inline JSON rows:  {report['bytes_before'] / 1e6:8.2f} MB")
+    print(f"series blobs:      {report['bytes_after'] / 1e6:8.2f} MB  ({report['savings_pct']}% saved)")
+    print(f"migration time:    {elapsed:8.2f} s")
+    print("after migration, by table:")
+    print_tables(migrated_tables)
+    print("written by the current repository, by table:")
+    print_tables(current_tables)
+    print(f"  {'total:':<17} {sum(current_tables.values()) / 1e6:8.2f} MB")
+    print(f"share bodies stored per analysis would add {share_bytes / 1e6:.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Analysis write path: per-request commits vs WAL vs write-behind batching.
+
+Concurrent "requests" each store one analysis with a one-year price
+series. Reports the time a request waits until its analysis is committed
+(with write-behind, until its batch is) and the time for all of them.
+
+Run from stockchat-backend:
+    python -m benchmarks.bench_writes --requests 400 --threads 8
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.database import set_sqlite_pragmas
+from app.repositories.analysis_repository import AnalysisRepository
+from app.repositories.analysis_writer import AnalysisWriter
+from app.services.serialization import price_data_columns
+from benchmarks.bench_serialization import make_frame
+
+
+def make_records(count: int, symbols: int = 20):
+    frames = [price_data_columns(make_frame(252, seed=s)) for s in range(symbols)]
+    return [
+        dict(
+            analysis_id=str(uuid.uuid4()),
+            stock_data=frames[i % symbols],
+            technical_metrics={'ticker': f"SYM{i % symbols}", 'interval': '1d'},
+            fundamental_metrics={},
+            analysis_text={'summary': 'x' * 400},
+            timestamp=datetime.now(),
+        )
+        for i in range(count)
+    ]
+
+
+def run(mode: str, records, threads: int):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(directory, 'bench.db')}",
+            connect_args={"check_same_thread": False},
+            pool_size=threads,
+        )
+        if mode != 'default':
+            event.listen(engine, "connect", set_sqlite_pragmas)
+        models.Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        writer = AnalysisWriter(Session) if mode == 'write-behind' else None
+
+        def store(record):
+            start = time.perf_counter()
+            committed = writer.submit(record) if writer is not None else None
+            if committed is not None:
+                committed.result()
+            else:
+                db = Session()
+                try:
+                    AnalysisRepository(db).create_analysis(**record)
+                finally:
+                    db.close()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            latencies = np.array(list(pool.map(store, records))) * 1000
+        if writer is not None:
+            writer.close()
+        total = time.perf_counter() - start
+        engine.dispose()
+
+    print(
+        f"{mode:>12}: p50 {np.percentile(latencies, 50):7.2f} ms  "
+        f"p99 {np.percentile(latencies, 99):7.2f} ms  "
+        f"all committed {total:6.2f} s ({len(records) / total:6.0f}/s)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    records = make_records(args.requests)
+    for mode in ('default', 'wal', 'write-behind'):
+        run(mode, records, args.threads)
+
+
+if __name__ == '__main__':
+    main()
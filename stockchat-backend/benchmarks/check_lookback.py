@@ -0,0 +1,133 @@
+"""Check bounded-lookback indicators against full-history indicators.
+
+For every period/interval the query resolver produces, indicators computed
+on only the planned range (window + warm-up) are compared with the same
+indicators computed on the full series, inside the requested window.
+Deviations are reported relative to each column's scale in the window;
+any above the tolerance fails the check (exit status 1). OBV and AD are
+compared after re-anchoring at the window start, as the service does.
+
+By default every recorded fixture in benchmarks/fixtures (written by
+benchmarks.record_fixtures) is checked. Without recordings the check
+falls back to synthetic series and says so: the warm-up plan is then
+only verified on random walks, not on real gaps, splits and halts.
+
+Run from stockchat-backend:
+    python -m benchmarks.check_lookback
+    python -m benchmarks.check_lookback data/bars/AAPL_1d.parquet
+    python -m benchmarks.check_lookback --synthetic --rows 12000
+"""
+import argparse
+import glob
+import os
+import sys
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.indicator_engine import INDICATOR_COLUMNS, IndicatorEngine
+from app.services.lookback import history_start, rebase_anchored, trim_to_period
+from app.services.query_resolver import PERIODS
+from benchmarks.bench_serialization import make_frame
+from benchmarks.replay import FIXTURE_DIR
+
+
+def synthetic_index(rows: int, interval: str) -> pd.DatetimeIndex:
+    """Trading-calendar-like timestamps for a synthetic series."""
+    if interval == '1wk':
+        return pd.date_range('1980-01-07', periods=rows, freq='W-MON', tz='America/New_York')
+    bars_per_session = {'1d': 1, '1h': 7, '1m': 390}[interval]
+    step = pd.Timedelta(minutes=390 // bars_per_session)
+    sessions = pd.bdate_range(end='2024-12-31', periods=-(-rows // bars_per_session), tz='America/New_York')
+    offsets = [pd.Timedelta(hours=9, minutes=30) + i * step for i in range(bars_per_session)]
+    return pd.DatetimeIndex([session + offset for session in sessions for offset in offsets])[-rows:]
+
+
+def compare(df: pd.DataFrame, period: str, interval: str, tolerance: float) -> dict:
+    """Max scaled deviation per indicator column for one period."""
+    start = history_start(period, interval, tolerance, now=df.index[-1].tz_convert('UTC'))
+    full_df = pd.concat([df, IndicatorEngine().compute('FULL', interval, df)], axis=1)
+    full = rebase_anchored(full_df, trim_to_period(full_df, period))
+    bounded_df = df[df.index >= start] if start is not None else df
+    bounded_df = pd.concat([bounded_df, IndicatorEngine().compute('BOUNDED', interval, bounded_df)], axis=1)
+    bounded = rebase_anchored(bounded_df, trim_to_period(bounded_df, period))
+
+    deviations = {'bars_fetched': len(bounded_df), 'bars_full': len(df)}
+    for column in INDICATOR_COLUMNS:
+        expected = full[column].to_numpy()
+        actual = bounded[column].to_numpy()
+        if not np.array_equal(np.isnan(expected), np.isnan(actual)):
+            deviations[column] = float('inf')
+            continue
+        scale = np.nanmax(np.abs(expected)) if np.isfinite(expected).any() else 0.0
+        diff = np.nanmax(np.abs(actual - expected)) if np.isfinite(expected).any() else 0.0
+        deviations[column] = float(diff / scale) if scale else float(diff)
+    return deviations
+
+
+def recorded_series(paths: List[str]) -> List[Tuple[str, str, pd.DataFrame]]:
+    """(name, interval, bars) of bar files named {SYMBOL}_{interval}.parquet."""
+    series = []
+    for path in sorted(paths):
+        name = os.path.splitext(os.path.basename(path))[0]
+        series.append((name, name.rsplit('_', 1)[-1], pd.read_parquet(path)))
+    return series
+
+
+def synthetic_series(rows: int) -> List[Tuple[str, str, pd.DataFrame]]:
+    frame = make_frame(rows)[['Open', 'High', 'Low', 'Close', 'Volume']]
+    return [
+        ('synthetic', interval, frame.set_axis(synthetic_index(rows, interval)))
+        for interval in ('1m', '1h', '1d', '1wk')
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help="bar-store Parquet files holding full histories")
+    parser.add_argument('--synthetic', action='store_true', help="check synthetic series instead of fixtures")
+    parser.add_argument('--rows', type=int, default=12000, help="synthetic series length")
+    parser.add_argument('--tolerance', type=float, default=settings.INDICATOR_WARMUP_TOLERANCE)
+    args = parser.parse_args()
+
+    if args.files:
+        series = recorded_series(args.files)
+    elif args.synthetic:
+        series = synthetic_series(args.rows)
+    else:
+        series = recorded_series(glob.glob(os.path.join(FIXTURE_DIR, '*.parquet')))
+        if not series:
+            print(
+                f"No recorded fixtures in {FIXTURE_DIR}; checking synthetic series only. "
+                "Record some with `python -m benchmarks.record_fixtures AAPL MSFT --interval 1d`."
+            )
+            series = synthetic_series(args.rows)
+
+    failures = []
+    for name, interval, df in series:
+        for period, _, period_interval in PERIODS + [('ytd', 0, '1d')]:
+            if period_interval != interval:
+                continue
+            deviations = compare(df, period, interval, args.tolerance)
+            worst_column = max(
+                (column for column in deviations if column not in ('bars_fetched', 'bars_full')),
+                key=lambda column: deviations[column]
+            )
+            worst = deviations[worst_column]
+            ok = worst <= args.tolerance
+            if not ok:
+                failures.append(f"{name} {period}/{interval}: {worst_column} deviates by {worst:.2e}")
+            print(
+                f"{name:>12} {period:>4}/{interval:<3} "
+                f"fetched {deviations['bars_fetched']:>6} of {deviations['bars_full']:>6} bars, "
+                f"max deviation {worst:.2e} ({worst_column}) {'ok' if ok else 'FAIL'}"
+            )
+    if failures:
+        sys.exit("Bounded lookback deviates beyond tolerance:\n" + "\n".join(failures))
+    print(f"All {len(series)} series within {args.tolerance:.0e}")
+
+
+if __name__ == '__main__':
+    main()
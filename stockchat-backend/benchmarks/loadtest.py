@@ -0,0 +1,401 @@
+"""Load test of the API with local stand-ins for yfinance and the LLM.
+
+Starts the app under uvicorn in a subprocess, with yfinance and the LLM
+replaced by benchmarks.replay's stubs (configurable latency distribution,
+stalls and error rate), then drives an open-loop mixed workload at a
+target request rate:
+
+- hot:   POST /api/v1/stock for a few popular symbols (mostly cache hits)
+- cold:  POST /api/v1/stock for a new symbol every time (full pipeline and LLM call)
+- share: GET /api/v1/stock/share/{id} for analyses created during the run
+
+Arrivals follow the schedule whatever the server does, and latency counts
+from each request's scheduled start, so a stalled server shows up as
+latency instead of as a lower request rate. Reports per-kind throughput
+and latency percentiles, the server's event-loop lag, stage timings of
+database reads and writes, and the analysis writer's queue.
+
+Run from stockchat-backend:
+    python -m benchmarks.loadtest --rate 20 --duration 30 --mix hot=0.6,cold=0.1,share=0.3
+    python -m benchmarks.loadtest --rate 50 --llm-median 2 --llm-errors 0.02 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks import replay
+
+HOT_SYMBOLS = ['AAPL', 'MSFT', 'NVDA', 'AMZN', 'GOOGL']
+API = '/api/v1/stock'
+_STAGES = ('db', 'db_write', 'db_commit', 'db_read', 'history', 'analysis')
+_BUCKET_LINE = re.compile(r'^stockchat_stage_duration_seconds_bucket\{stage="([^"]+)",le="([^"]+)"\} (\S+)$')
+
+
+# Server side: runs in the subprocess
+
+def serve(config: Dict[str, Any]):
+    """Run the app with stubbed upstreams and an event-loop lag probe."""
+    root = replay.offline_environment(config['llm_rpm'])
+    # The database and app.log are relative to the working directory
+    os.chdir(root)
+
+    import logging
+
+    import uvicorn
+    from fastapi.responses import JSONResponse
+
+    from app.main import app
+    from app.services.dspy_service import configure_dspy
+
+    logging.getLogger().setLevel(logging.WARNING)
+    market = replay.MarketReplay(latency=replay.Latency(**config['market'], seed=1))
+    llm = replay.Latency(**config['llm'], seed=2)
+    configure_dspy(replay.FixtureLM(latency=llm))
+
+    lags: deque = deque(maxlen=1_000_000)
+
+    async def probe_event_loop(interval: float = 0.01):
+        # How late a timer fires is how long the loop was blocked
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - start - interval)
+
+    async def start_probe():
+        asyncio.get_running_loop().create_task(probe_event_loop())
+
+    def report():
+        samples = np.array(lags) * 1000 if lags else np.zeros(1)
+        return JSONResponse({
+            'loop_lag_ms': {
+                'p50': round(float(np.percentile(samples, 50)), 3),
+                'p99': round(float(np.percentile(samples, 99)), 3),
+                'max': round(float(samples.max()), 3),
+            },
+            'yfinance': market.latency.stats(),
+            'llm': llm.stats(),
+        })
+
+    def reset():
+        lags.clear()
+        market.latency.reset()
+        llm.reset()
+        return JSONResponse({})
+
+    app.add_event_handler('startup', start_probe)
+    app.add_api_route('/_loadtest', report, methods=['GET'], include_in_schema=False)
+    app.add_api_route('/_loadtest/reset', reset, methods=['POST'], include_in_schema=False)
+    with market.install():
+        uvicorn.run(app, host='127.0.0.1', port=config['port'], log_level='warning')
+
+
+# Client side
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(config: Dict[str, Any], log_path: str) -> subprocess.Popen:
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(log_path, 'w') as log:
+        return subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.loadtest', '--serve', json.dumps(config)],
+            cwd=cwd, stdout=log, stderr=subprocess.STDOUT
+        )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if (await client.get('/_loadtest')).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"Server not ready after {timeout}s")
+
+
+def stage_buckets(metrics_text: str) -> Dict[str, List[List[float]]]:
+    """Cumulative (upper bound, count) pairs per stage from /metrics."""
+    buckets: Dict[str, List[List[float]]] = defaultdict(list)
+    for line in metrics_text.splitlines():
+        match = _BUCKET_LINE.match(line)
+        if match:
+            buckets[match.group(1)].append([float(match.group(2)), float(match.group(3))])
+    return buckets
+
+
+def bucket_quantile(buckets: List[List[float]], q: float) -> Optional[float]:
+    """Quantile estimated from cumulative buckets, interpolating inside a bucket."""
+    total = buckets[-1][1] if buckets else 0
+    if total <= 0:
+        return None
+    rank = q * total
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float('inf'):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def stage_deltas(before: str, after: str) -> Dict[str, Dict[str, Any]]:
+    """Per-stage count and p50/p99 over the measured window."""
+    start, end = stage_buckets(before), stage_buckets(after)
+    result = {}
+    for stage in _STAGES:
+        if stage not in end:
+            continue
+        previous = {bound: count for bound, count in start.get(stage, [])}
+        delta = [[bound, count - previous.get(bound, 0)] for bound, count in end[stage]]
+        count = delta[-1][1]
+        if count <= 0:
+            continue
+        p50, p99 = bucket_quantile(delta, 0.5), bucket_quantile(delta, 0.99)
+        result[stage] = {
+            'count': int(count),
+            'p50_ms': round(p50 * 1000, 2),
+            'p99_ms': round(p99 * 1000, 2),
+        }
+    return result
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """'hot=0.6,cold=0.1,share=0.3' -> weights per request kind."""
+    weights = {}
+    for pair in mix.split(','):
+        kind, weight = pair.split('=')
+        if kind not in ('hot', 'cold', 'share'):
+            raise ValueError(f"Unknown request kind '{kind}' in --mix")
+        weights[kind] = float(weight)
+    return weights
+
+
+class Workload:
+    """Picks request kinds by weight and builds each request."""
+
+    def __init__(self, mix: Dict[str, float], hot_symbols: List[str], seed: int = 0):
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.hot_symbols = hot_symbols
+        self.share_ids: List[str] = []
+        self._random = random.Random(seed)
+        self._cold = 0
+        self._cold_offset = self._random.randrange(26 ** 4)
+
+    def _cold_symbol(self) -> str:
+        # A symbol not requested before: letters only, so it resolves as a cashtag
+        index = self._cold_offset + self._cold
+        self._cold += 1
+        letters = []
+        for _ in range(4):
+            index, digit = divmod(index, 26)
+            letters.append(string.ascii_uppercase[digit])
+        return 'Z' + ''.join(letters)
+
+    def next(self):
+        """(kind, method, path, json body) of the next request."""
+        kind = self._random.choices(self.kinds, weights=self.weights)[0]
+        if kind == 'share' and not self.share_ids:
+            kind = 'hot'
+        if kind == 'share':
+            return kind, 'GET', f"{API}/share/{self._random.choice(self.share_ids)}", None
+        symbol = self._random.choice(self.hot_symbols) if kind == 'hot' else self._cold_symbol()
+        # Cashtags resolve without the LLM extractor
+        return kind, 'POST', API, {'message': f"How has ${symbol} done over the past year?", 'max_points': 500}
+
+
+async def drive(client: httpx.AsyncClient, workload: Workload, rate: float, duration: float,
+                max_inflight: int, poisson: bool, seed: int = 0) -> Dict[str, Any]:
+    """Send requests at rate per second for duration seconds; returns raw results."""
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    dropped = 0
+    max_slip = 0.0
+    inflight = set()
+    arrivals = random.Random(seed)
+    loop = asyncio.get_running_loop()
+
+    async def send(kind: str, method: str, path: str, body, scheduled: float):
+        try:
+            response = await client.request(method, path, json=body)
+            status = str(response.status_code)
+            if kind != 'share' and response.status_code == 200:
+                workload.share_ids.append(response.json()['shareId'])
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        latencies[kind].append(loop.time() - scheduled)
+        statuses[kind][status] += 1
+
+    start = loop.time()
+    scheduled = start
+    while scheduled < start + duration:
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        max_slip = max(max_slip, loop.time() - scheduled)
+        kind, method, path, body = workload.next()
+        if len(inflight) >= max_inflight:
+            dropped += 1
+            statuses[kind]['dropped'] += 1
+        else:
+            task = asyncio.create_task(send(kind, method, path, body, scheduled))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+        scheduled += arrivals.expovariate(rate) if poisson else 1 / rate
+    if inflight:
+        await asyncio.gather(*inflight)
+    return {
+        'elapsed': loop.time() - start,
+        'latencies': latencies,
+        'statuses': statuses,
+        'dropped': dropped,
+        'max_schedule_slip_ms': round(max_slip * 1000, 2),
+    }
+
+
+def summarize(raw: Dict[str, Any]) -> Dict[str, Any]:
+    kinds = {}
+    for kind, samples in raw['latencies'].items():
+        ms = np.array(samples) * 1000
+        statuses = dict(raw['statuses'][kind])
+        kinds[kind] = {
+            'requests': len(samples),
+            'ok': statuses.get('200', 0),
+            'statuses': statuses,
+            'throughput_rps': round(statuses.get('200', 0) / raw['elapsed'], 2),
+            'p50_ms': round(float(np.percentile(ms, 50)), 2),
+            'p90_ms': round(float(np.percentile(ms, 90)), 2),
+            'p99_ms': round(float(np.percentile(ms, 99)), 2),
+            'max_ms': round(float(ms.max()), 2),
+        }
+    return kinds
+
+
+async def run(args) -> Dict[str, Any]:
+    market = dict(median=args.yf_median, tail_p=args.yf_tail_p, tail=args.yf_tail, error_p=args.yf_errors)
+    llm = dict(median=args.llm_median, tail_p=args.llm_tail_p, tail=args.llm_tail, error_p=args.llm_errors)
+    config = {'port': _free_port(), 'llm_rpm': args.llm_rpm, 'market': market, 'llm': llm}
+    log_path = os.path.join(tempfile.gettempdir(), f"stockchat-loadtest-{config['port']}.log")
+    server = start_server(config, log_path)
+    limits = httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{config['port']}", timeout=args.timeout, limits=limits
+        ) as client:
+            await wait_until_ready(client, server)
+            workload = Workload(parse_mix(args.mix), args.hot_symbols)
+
+            # Warm up: hot symbols cached and some share IDs to read
+            print(f"Warming up for {args.warmup}s...")
+            await drive(client, workload, args.rate, args.warmup, args.max_inflight, args.poisson, seed=1)
+            await client.post('/_loadtest/reset')
+            before = (await client.get('/metrics')).text
+
+            print(f"Driving {args.rate} req/s for {args.duration}s (mix {args.mix})...")
+            raw = await drive(client, workload, args.rate, args.duration, args.max_inflight, args.poisson)
+
+            after = (await client.get('/metrics')).text
+            server_report = (await client.get('/_loadtest')).json()
+            service = (await client.get(f"{API}/stats")).json()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    return {
+        'config': {**vars(args), 'server_log': log_path},
+        'requests': summarize(raw),
+        'dropped': raw['dropped'],
+        'client_max_schedule_slip_ms': raw['max_schedule_slip_ms'],
+        'server': {
+            **server_report,
+            'stages': stage_deltas(before, after),
+            'analysis_writer': service.get('analysis_writer'),
+            'share_cache': service.get('share_cache'),
+            'analysis_cache': service.get('analysis_cache'),
+        },
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{'kind':<6} {'reqs':>6} {'ok':>6} {'ok/s':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}  statuses")
+    for kind, s in sorted(report['requests'].items()):
+        print(
+            f"{kind:<6} {s['requests']:>6} {s['ok']:>6} {s['throughput_rps']:>7} {s['p50_ms']:>9} "
+            f"{s['p90_ms']:>9} {s['p99_ms']:>9} {s['max_ms']:>9}  {s['statuses']}"
+        )
+    server = report['server']
+    lag = server['loop_lag_ms']
+    print(f"\nEvent-loop lag: p50 {lag['p50']} ms, p99 {lag['p99']} ms, max {lag['max']} ms")
+    print(f"Stub calls: yfinance {server['yfinance']}, LLM {server['llm']}")
+    for stage, s in server['stages'].items():
+        print(f"Stage {stage:<10} {s['count']:>6} calls  p50 {s['p50_ms']:>8} ms  p99 {s['p99_ms']:>8} ms")
+    print(f"Analysis writer: {server['analysis_writer']}")
+    print(f"Dropped (over --max-inflight): {report['dropped']}; "
+          f"client schedule slip max {report['client_max_schedule_slip_ms']} ms")
+
+
+def _add_upstream_arguments(parser: argparse.ArgumentParser, prefix: str, name: str,
+                            median: float, tail_p: float, tail: float):
+    group = parser.add_argument_group(f"{name} stand-in")
+    group.add_argument(f"--{prefix}-median", type=float, default=median, help="median latency (s)")
+    group.add_argument(f"--{prefix}-tail-p", type=float, default=tail_p, help="probability of a stall")
+    group.add_argument(f"--{prefix}-tail", type=float, default=tail, help="stall length (s)")
+    group.add_argument(f"--{prefix}-errors", type=float, default=0.0, help="failure probability")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rate', type=float, default=20, help="target requests per second")
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--mix', default='hot=0.6,cold=0.1,share=0.3')
+    parser.add_argument('--hot-symbols', nargs='+', default=HOT_SYMBOLS)
+    parser.add_argument('--poisson', action='store_true', help="exponential inter-arrival times")
+    parser.add_argument('--max-inflight', type=int, default=256)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--llm-rpm', type=float, default=1e9,
+                        help="LLM scheduler budget for the stub provider (requests/minute)")
+    _add_upstream_arguments(parser, 'yf', 'yfinance', median=0.15, tail_p=0.01, tail=2.0)
+    _add_upstream_arguments(parser, 'llm', 'LLM', median=1.5, tail_p=0.02, tail=8.0)
+    parser.add_argument('--output', help="write the report to this JSON file")
+    parser.add_argument('--serve', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(json.loads(args.serve))
+        return
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
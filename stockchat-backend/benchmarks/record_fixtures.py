@@ -0,0 +1,48 @@
+"""Record yfinance history and ticker.info fixtures for offline benchmarks.
+
+Needs network access. Writes benchmarks/fixtures/SYMBOL_INTERVAL.parquet
+(the full history, as Ticker.history returns it) and SYMBOL_info.json,
+which benchmarks.replay serves in place of yfinance.
+
+Run from stockchat-backend:
+    python -m benchmarks.record_fixtures AAPL MSFT NVDA --interval 1d
+"""
+import argparse
+import json
+import os
+
+import yfinance as yf
+
+from benchmarks.replay import FIXTURE_DIR, HISTORY_COLUMNS, fixture_path
+
+
+def record(symbol: str, interval: str, period: str):
+    ticker = yf.Ticker(symbol)
+    df = ticker.history(period=period, interval=interval)
+    if len(df) == 0:
+        print(f"{symbol}: no data, skipped")
+        return
+    df = df[[column for column in HISTORY_COLUMNS if column in df.columns]]
+    df.to_parquet(fixture_path(symbol, interval))
+
+    # Keep only JSON-serializable fields; the rest are never read
+    info = {key: value for key, value in ticker.info.items() if isinstance(value, (str, int, float, bool, type(None)))}
+    with open(os.path.join(FIXTURE_DIR, f"{symbol.upper()}_info.json"), 'w') as f:
+        json.dump(info, f, indent=1, sort_keys=True)
+    print(f"{symbol}: {len(df)} {interval} bars from {df.index[0].date()}, {len(info)} info fields")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--interval', default='1d')
+    parser.add_argument('--period', default='max')
+    args = parser.parse_args()
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for symbol in args.symbols:
+        record(symbol, args.interval, args.period)
+
+
+if __name__ == '__main__':
+    main()
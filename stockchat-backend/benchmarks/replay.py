@@ -0,0 +1,338 @@
+"""Offline stand-ins for yfinance and the LLM, for benchmarks and load tests.
+
+Market data is replayed from fixtures recorded with
+`python -m benchmarks.record_fixtures` (benchmarks/fixtures/SYMBOL_INTERVAL.parquet
+and SYMBOL_info.json). Symbols without a recording, or sizes longer than
+the recording, get a seeded random walk with the same columns and
+timezone as Ticker.history, so runs are repeatable without network.
+
+The LM answers every DSPy signature with a fixed, well-formed response,
+so no API keys or paid calls are needed.
+
+Both take an optional Latency: a lognormal delay with an occasional
+stall and a failure rate, standing in for the network and the provider.
+
+Call offline_environment() before importing anything from app: settings
+are read at import.
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import random
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import dspy
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# LM model name; its provider prefix gets its own scheduler budget
+FIXTURE_MODEL = 'fixture/stub'
+
+HISTORY_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+_TIMEZONE = 'America/New_York'
+_PERIOD = re.compile(r'(\d+)(d|mo|y)')
+_FREQUENCIES = {'1d': 'B', '1h': 'h', '1wk': 'W-FRI', '1mo': 'MS'}
+
+DEFAULT_INFO = {
+    'marketCap': 2.5e12,
+    'sector': 'Technology',
+    'industry': 'Consumer Electronics',
+    'trailingPE': 29.5,
+    'forwardPE': 27.1,
+    'priceToBook': 45.2,
+    'beta': 1.2,
+    'dividendYield': 0.0052,
+    'trailingEps': 6.1,
+    'forwardEps': 6.7,
+    'profitMargins': 0.24,
+    'operatingMargins': 0.30,
+}
+
+
+def offline_environment(llm_rate_per_minute: float = 1e9) -> str:
+    """Point the app's on-disk state at a temp directory and lift the fixture LM's rate limit.
+
+    Returns the temp directory. Variables already set are left alone.
+    """
+    root = tempfile.mkdtemp(prefix='stockchat-bench-')
+    os.environ.setdefault('BAR_STORE_DIR', os.path.join(root, 'bars'))
+    os.environ.setdefault('DSPY_ARTIFACT_DIR', os.path.join(root, 'dspy'))
+    os.environ.setdefault('PREWARM_ENABLED', 'false')
+    # The fixture LM only answers the app's signatures, not the compile metrics
+    os.environ.setdefault('DSPY_COMPILE_ON_STARTUP', 'false')
+    os.environ.setdefault(
+        'LLM_REQUESTS_PER_MINUTE',
+        json.dumps({'default': 15, FIXTURE_MODEL.split('/')[0]: llm_rate_per_minute})
+    )
+    return root
+
+
+class StubError(ConnectionError):
+    """A failure injected by a Latency model."""
+
+
+class Latency:
+    """Injected latency and failures of a stand-in upstream.
+
+    Each call sleeps for a lognormal delay around median seconds; with
+    probability tail_p it stalls tail seconds more, and with probability
+    error_p it then fails with StubError. Sleeps block the calling thread,
+    as the real blocking clients do.
+    """
+
+    def __init__(
+        self,
+        median: float = 0.0,
+        sigma: float = 0.3,
+        tail_p: float = 0.0,
+        tail: float = 0.0,
+        error_p: float = 0.0,
+        seed: int = 0
+    ):
+        self.median = median
+        self.sigma = sigma
+        self.tail_p = tail_p
+        self.tail = tail
+        self.error_p = error_p
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def wait(self, name: str):
+        with self._lock:
+            self.calls += 1
+            delay = self.median * self._random.lognormvariate(0, self.sigma) if self.median else 0.0
+            if self._random.random() < self.tail_p:
+                delay += self.tail
+            fail = self._random.random() < self.error_p
+            if fail:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise StubError(f"Injected {name} failure")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'calls': self.calls, 'errors': self.errors}
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.errors = 0
+
+
+def _seed(symbol: str) -> int:
+    # Stable across processes, unlike hash()
+    return zlib.crc32(symbol.encode())
+
+
+def synthetic_history(symbol: str, rows: int, interval: str = '1d') -> pd.DataFrame:
+    """Seeded random-walk bars in Ticker.history's schema, ending today."""
+    rng = np.random.default_rng(_seed(symbol))
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, rows)))
+    open_ = close * (1 + rng.normal(0, 0.005, rows))
+    index = pd.date_range(
+        end=pd.Timestamp.now(tz=_TIMEZONE).normalize(),
+        periods=rows,
+        freq=_FREQUENCIES.get(interval, 'B'),
+        name='Date'
+    )
+    return pd.DataFrame(
+        {
+            'Open': open_,
+            'High': np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, rows)),
+            'Low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, rows)),
+            'Close': close,
+            'Volume': rng.integers(1_000_000, 50_000_000, rows),
+            'Dividends': 0.0,
+            'Stock Splits': 0.0,
+        },
+        index=index,
+    )
+
+
+def fixture_path(symbol: str, interval: str) -> str:
+    return os.path.join(FIXTURE_DIR, f"{symbol.upper()}_{interval}.parquet")
+
+
+def recorded_history(symbol: str, interval: str = '1d') -> Optional[pd.DataFrame]:
+    """The recorded bars for symbol, shifted by whole weeks so the last bar is recent."""
+    path = fixture_path(symbol, interval)
+    if not os.path.exists(path):
+        return None
+    df = pd.read_parquet(path)
+    # Whole weeks keep weekdays and sessions intact while letting the bar
+    # store treat the data as current
+    weeks = (pd.Timestamp.now(tz=df.index.tz) - df.index[-1]).days // 7
+    df.index = df.index + pd.Timedelta(weeks=weeks)
+    return df
+
+
+def recorded_info(symbol: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(FIXTURE_DIR, f"{symbol.upper()}_info.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+class MarketReplay:
+    """Serves history and info for symbols from fixtures, synthesizing the rest.
+
+    rows fixes the length of every series (the tail of a recording, or a
+    synthetic walk if the recording is shorter); by default recordings are
+    used whole and synthetic series get default_rows. latency, if set, is
+    applied to every history, info and download call.
+    """
+
+    def __init__(self, rows: Optional[int] = None, default_rows: int = 2520, latency: Optional[Latency] = None):
+        self.rows = rows
+        self.default_rows = default_rows
+        self.latency = latency
+        self._frames: Dict[tuple, pd.DataFrame] = {}
+        self._sources: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def history(self, symbol: str, interval: str = '1d') -> pd.DataFrame:
+        key = (symbol.upper(), interval)
+        with self._lock:
+            if key not in self._frames:
+                recorded = recorded_history(symbol, interval)
+                if recorded is not None and len(recorded) >= (self.rows or 0):
+                    frame = recorded if self.rows is None else recorded.iloc[-self.rows:]
+                    self._sources[key[0]] = 'recorded'
+                else:
+                    frame = synthetic_history(symbol, self.rows or self.default_rows, interval)
+                    self._sources[key[0]] = 'synthetic'
+                self._frames[key] = frame
+            return self._frames[key]
+
+    def info(self, symbol: str) -> Dict[str, Any]:
+        return recorded_info(symbol) or dict(DEFAULT_INFO)
+
+    def sources(self) -> Dict[str, str]:
+        """'recorded' or 'synthetic' per symbol served so far."""
+        with self._lock:
+            return dict(self._sources)
+
+    @staticmethod
+    def _window(df: pd.DataFrame, period: Optional[str], start) -> pd.DataFrame:
+        """The bars history(period=...) or history(start=...) would return."""
+        if start is not None:
+            start = pd.Timestamp(start)
+            if start.tzinfo is None:
+                start = start.tz_localize(df.index.tz)
+            return df[df.index >= start]
+        if period == 'ytd':
+            return df[df.index.year == df.index[-1].year]
+        match = _PERIOD.fullmatch(period or '')
+        if match is None:
+            return df
+        count, unit = int(match.group(1)), match.group(2)
+        offset = {'d': pd.DateOffset(days=count), 'mo': pd.DateOffset(months=count), 'y': pd.DateOffset(years=count)}[unit]
+        return df[df.index > df.index[-1] - offset]
+
+    def wait(self, name: str):
+        if self.latency is not None:
+            self.latency.wait(name)
+
+    def ticker(self, symbol: str) -> 'ReplayTicker':
+        return ReplayTicker(self, symbol)
+
+    def download(self, symbols, period: Optional[str] = None, start=None, interval: str = '1d', **kwargs) -> pd.DataFrame:
+        """yf.download(group_by='ticker') equivalent: one column level per symbol."""
+        self.wait('yfinance')
+        if isinstance(symbols, str):
+            symbols = symbols.split()
+        frames = {symbol: self._window(self.history(symbol, interval), period, start) for symbol in symbols}
+        return pd.concat(frames, axis=1)
+
+    @contextmanager
+    def install(self) -> Iterator['MarketReplay']:
+        """Replace yf.Ticker and yf.download with this replay for the enclosed block."""
+        original_ticker, original_download = yf.Ticker, yf.download
+        yf.Ticker = self.ticker
+        yf.download = self.download
+        try:
+            yield self
+        finally:
+            yf.Ticker, yf.download = original_ticker, original_download
+
+
+class ReplayTicker:
+    """The parts of yf.Ticker the app uses: .ticker, .history() and .info."""
+
+    def __init__(self, replay: MarketReplay, symbol: str):
+        self._replay = replay
+        self.ticker = symbol.upper()
+
+    def history(self, period: Optional[str] = None, interval: str = '1d', start=None, **kwargs) -> pd.DataFrame:
+        self._replay.wait('yfinance')
+        return self._replay._window(self._replay.history(self.ticker, interval), period, start).copy()
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        self._replay.wait('yfinance')
+        return self._replay.info(self.ticker)
+
+
+# One JSON object satisfying every output model the app's signatures use;
+# fields a signature does not declare are ignored by pydantic
+_ANALYSIS = {
+    'summary': 'The stock has trended higher with moderate volatility.',
+    'technical_factors': ['Price is above its 50 and 200 day moving averages', 'RSI is neutral'],
+    'fundamental_factors': ['Valuation is above the sector average', 'Margins are stable'],
+    'comparison_factors': ['Stronger momentum than its peers', 'Similar volatility'],
+    'outlook': 'Neutral to positive while price holds above the 50 day average.',
+}
+_SYMBOL = re.compile(r'\b[A-Z]{2,5}\b')
+
+
+class FixtureLM(dspy.LM):
+    """Deterministic local LM answering any of the app's DSPy signatures.
+
+    Replies in the chat adapter's field format. Stock info extraction gets
+    the first ticker-like word of the query (or AAPL) with a one-year daily
+    window; analysis and comparison calls get a fixed analysis. latency,
+    if set, stands in for the provider's.
+    """
+
+    def __init__(self, latency: Optional[Latency] = None):
+        super().__init__(model=FIXTURE_MODEL, cache=False)
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _output(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        query = messages[-1]['content'] if messages else ''
+        if 'yfinance_period' not in (messages[0]['content'] if messages else ''):
+            return _ANALYSIS
+        # The query is the last input field of the user message
+        text = query.rsplit('[[ ## input ## ]]', 1)[-1]
+        match = _SYMBOL.search(text)
+        return {
+            'symbol': match.group(0) if match else 'AAPL',
+            'yfinance_period': '1y',
+            'yfinance_interval': '1d',
+        }
+
+    def __call__(self, prompt=None, messages=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.latency is not None:
+            self.latency.wait('LLM')
+        messages = messages or [{'role': 'user', 'content': prompt or ''}]
+        output = json.dumps(self._output(messages))
+        return [
+            f"[[ ## reasoning ## ]]\nDeterministic fixture response.\n\n"
+            f"[[ ## output ## ]]\n{output}\n\n[[ ## completed ## ]]"
+        ]